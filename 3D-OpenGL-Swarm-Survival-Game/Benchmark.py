@@ -0,0 +1,259 @@
+import argparse
+import itertools
+import json
+import os
+import random
+import sys
+import time
+
+import numpy as np
+# pygame prints a banner on import, which would end up in front of the JSON on stdout
+os.environ.setdefault('PYGAME_HIDE_SUPPORT_PROMPT', '1')
+import pygame
+from pygame.locals import *
+
+import Camera as camera_module
+import Entity as entity_module
+import MeshCache as mesh_cache_module
+import MeshMap as mesh_map_module
+from Camera import Camera
+from Entity import Player, EnemyManager
+from GameLoop import KeyState, Simulation
+from MeshMap import MeshMap
+
+
+# Phases reported for every frame, in the order they run.
+PHASES = ('player_update', 'enemy_update', 'camera', 'chunk_generation', 'vbo_upload',
+          'terrain_draw', 'player_draw', 'enemy_draw', 'present', 'frame')
+
+
+def install_null_gl(*modules):
+    """
+    Replace every gl*/glu* function the game modules imported with a no-op.
+    This lets the benchmark measure the CPU side of the game without any GL context.
+    Draw phases then only measure the Python work done before each GL call.
+
+    :param modules: The game modules whose `from OpenGL.GL import *` names should be replaced.
+    """
+    buffer_ids = itertools.count(1)
+
+    def gen_buffers(n):
+        return next(buffer_ids) if n == 1 else [next(buffer_ids) for _ in range(n)]
+
+    def no_op(*args, **kwargs):
+        return None
+
+    for module in modules:
+        for name in dir(module):
+            if name.startswith('gl') and callable(getattr(module, name)):
+                setattr(module, name, gen_buffers if name == 'glGenBuffers' else no_op)
+
+
+def scripted_keys(tick: int) -> KeyState:
+    """
+    The scripted player path: always run forward, turn right for one second out
+    of every four so the player sweeps a large loop through fresh terrain, and
+    swing the melee attack twice a second.
+    """
+    pressed = [K_UP]
+    if tick % 240 < 60:
+        pressed.append(K_d)
+    if tick % 30 == 0:
+        pressed.append(K_m)
+    return KeyState(pressed)
+
+
+def percentiles(samples) -> dict:
+    """Summarize a list of seconds as millisecond percentiles."""
+    values = np.asarray(samples, dtype=np.float64) * 1000.0
+    return {
+        'mean_ms': float(values.mean()),
+        'p50_ms': float(np.percentile(values, 50)),
+        'p90_ms': float(np.percentile(values, 90)),
+        'p99_ms': float(np.percentile(values, 99)),
+        'max_ms': float(values.max())
+    }
+
+
+def run_benchmark(frames=1800, tick_rate=60, gl='null', seed=48, render_distance=10, chunk_width=10,
+                  generation_threads=1, upload_budget=256 * 1024, spawn_rate=2.0, group_spawn_size=4, display=(1500, 900)):
+    """
+    Run the game for a fixed number of frames with a scripted player and time every phase.
+    One simulation tick is run per frame and frames are not throttled, so the run is
+    as fast as the machine allows and the results are comparable between runs.
+
+    :param frames: Number of frames to run.
+    :param tick_rate: Simulation ticks per second used for dt.
+    :param gl: 'null' to replace GL with no-ops, or 'hidden' for a real context in a hidden window.
+    :param seed: Seed for the terrain and for enemy spawning.
+    :param upload_budget: Bytes of chunk vertex data uploaded per frame.
+    :param spawn_rate: Seconds of game time between enemy group spawns.
+    :param group_spawn_size: Average number of enemies per group.
+    :return: A dict of settings, totals and per-phase millisecond percentiles.
+    """
+    random.seed(seed)
+    np.random.seed(seed)
+
+    if gl == 'null':
+        install_null_gl(mesh_map_module, entity_module, mesh_cache_module, camera_module)
+    elif gl == 'hidden':
+        pygame.init()
+        pygame.display.set_mode(display, DOUBLEBUF | OPENGL | HIDDEN)
+    else:
+        raise ValueError(f"Unknown gl mode: {gl}")
+
+    start_placement = (0, 0, 0, 45)
+    setup_start = time.perf_counter()
+    mesh_map = MeshMap(
+        chunk_width=chunk_width,
+        render_distance=render_distance,
+        generation_threads=generation_threads,
+        seed=seed,
+        scale=0.003,
+        height_limit=1000,
+        initial_target=(start_placement[0], start_placement[2]),
+        upload_budget=upload_budget
+    )
+    setup_time = time.perf_counter() - setup_start
+    player = Player(
+        placement=start_placement,
+        max_speed=2,
+        max_acceleration=0.1,
+        friction_coefficient=0.7,
+        jump_power=0.7,
+        gravity=0.1,
+        max_fall_velocity=-1.5,
+        width=0.75,
+        max_attack_range=3.0,
+        attack_cooldown=1.0
+    )
+    camera = Camera(player, mesh_map, display, render_distance * chunk_width * 10)
+    enemy_manager = EnemyManager(
+        mesh_map=mesh_map,
+        spawn_radius=(render_distance * chunk_width),
+        spawn_rate=spawn_rate,
+        group_spawn_size=group_spawn_size,
+    )
+    simulation = Simulation(mesh_map, player, enemy_manager, camera)
+
+    dt = 1.0 / tick_rate
+    samples = {phase: [] for phase in PHASES}
+    peak_enemies = 0
+    chunks_uploaded = 0
+    bytes_uploaded = 0
+    for tick in range(frames):
+        frame_start = time.perf_counter()
+
+        simulation.step_player(scripted_keys(tick), dt)
+        player_done = time.perf_counter()
+        simulation.step_enemies(dt)
+        enemies_done = time.perf_counter()
+
+        player_pos = player.get_position()
+        camera.apply()
+        camera_done = time.perf_counter()
+        mesh_map.update((player_pos[0], player_pos[2]))
+        terrain_start = time.perf_counter()
+        mesh_map.render((player_pos[0], player_pos[2]))
+        terrain_done = time.perf_counter()
+        player.render()
+        player_drawn = time.perf_counter()
+        enemy_manager.render(player_pos, ((render_distance + 1) * chunk_width))
+        enemies_drawn = time.perf_counter()
+        if gl == 'hidden':
+            pygame.display.flip()
+        frame_done = time.perf_counter()
+
+        samples['player_update'].append(player_done - frame_start)
+        samples['enemy_update'].append(enemies_done - player_done)
+        samples['camera'].append(camera_done - enemies_done)
+        samples['chunk_generation'].append(mesh_map.frame_stats['chunk_generation'])
+        samples['vbo_upload'].append(mesh_map.frame_stats['vbo_upload'])
+        samples['terrain_draw'].append(terrain_done - terrain_start)
+        samples['player_draw'].append(player_drawn - terrain_done)
+        samples['enemy_draw'].append(enemies_drawn - player_drawn)
+        samples['present'].append(frame_done - enemies_drawn)
+        samples['frame'].append(frame_done - frame_start)
+        peak_enemies = max(peak_enemies, len(enemy_manager.swarm))
+        chunks_uploaded += mesh_map.frame_stats['chunks_uploaded']
+        bytes_uploaded += mesh_map.frame_stats['bytes_uploaded']
+
+    upload_stats = mesh_map.upload_stats()
+    mesh_map.cleanup()
+    enemy_manager.cleanup()
+    player.mesh_cache.cleanup()
+    if gl == 'hidden':
+        pygame.quit()
+
+    total_time = sum(samples['frame'])
+    return {
+        'settings': {
+            'frames': frames,
+            'tick_rate': tick_rate,
+            'gl': gl,
+            'seed': seed,
+            'render_distance': render_distance,
+            'chunk_width': chunk_width,
+            'generation_threads': generation_threads,
+            'upload_budget': upload_budget,
+            'spawn_rate': spawn_rate,
+            'group_spawn_size': group_spawn_size
+        },
+        'totals': {
+            'preload_seconds': setup_time,
+            'run_seconds': total_time,
+            'frames_per_second': frames / total_time if total_time > 0 else 0.0,
+            'chunks_uploaded': chunks_uploaded,
+            'bytes_uploaded': bytes_uploaded,
+            'upload_latency_p50_ms': upload_stats['latency_p50_ms'],
+            'upload_latency_p95_ms': upload_stats['latency_p95_ms'],
+            'upload_latency_max_ms': upload_stats['latency_max_ms'],
+            'peak_enemies': peak_enemies,
+            'final_enemies': len(enemy_manager.swarm)
+        },
+        'phases': {phase: percentiles(values) for phase, values in samples.items()}
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Headless benchmark for the 3D swarm game.")
+    parser.add_argument('--frames', type=int, default=1800, help="Frames to run (one simulation tick each).")
+    parser.add_argument('--tick-rate', type=int, default=60, help="Simulation ticks per second.")
+    parser.add_argument('--gl', choices=('null', 'hidden'), default='null',
+                        help="'null' for a no-op GL shim (CPU only), 'hidden' for a real context in a hidden window.")
+    parser.add_argument('--seed', type=int, default=48)
+    parser.add_argument('--render-distance', type=int, default=10)
+    parser.add_argument('--chunk-width', type=int, default=10)
+    parser.add_argument('--generation-threads', type=int, default=1, help="Threads generating chunks in the background.")
+    parser.add_argument('--upload-budget', type=int, default=256 * 1024, help="Bytes of chunk data uploaded per frame.")
+    parser.add_argument('--spawn-rate', type=float, default=2.0, help="Seconds between enemy group spawns.")
+    parser.add_argument('--group-spawn-size', type=int, default=4)
+    parser.add_argument('--output', help="Write the JSON results to this file instead of stdout.")
+    args = parser.parse_args(argv)
+
+    results = run_benchmark(
+        frames=args.frames,
+        tick_rate=args.tick_rate,
+        gl=args.gl,
+        seed=args.seed,
+        render_distance=args.render_distance,
+        chunk_width=args.chunk_width,
+        generation_threads=args.generation_threads,
+        upload_budget=args.upload_budget,
+        spawn_rate=args.spawn_rate,
+        group_spawn_size=args.group_spawn_size
+    )
+
+    # Human readable summary on stderr, machine readable JSON on stdout or to a file
+    for phase, stats in results['phases'].items():
+        print(f"{phase:>18}: p50 {stats['p50_ms']:8.3f} ms   p90 {stats['p90_ms']:8.3f} ms   p99 {stats['p99_ms']:8.3f} ms", file=sys.stderr)
+    if args.output:
+        with open(args.output, 'w') as file:
+            json.dump(results, file, indent=2)
+    else:
+        json.dump(results, sys.stdout, indent=2)
+        print()
+
+
+if __name__ == '__main__':
+    main()
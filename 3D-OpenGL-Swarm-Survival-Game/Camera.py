@@ -4,16 +4,22 @@ from OpenGL.GLU import gluLookAt, gluPerspective
 from Entity import Player
 from pygame.locals import *
 import math
+import numpy as np
 from MeshMap import MeshMap
 
 
 class Camera():
+    # (yaw, pitch) offsets in degrees of the terrain probe rays around the line from player to camera
+    PROBE_OFFSETS = ((0, 0), (-8, 0), (8, 0), (0, -8), (0, 8))
+
     def __init__(self, player:Player, mesh_map:MeshMap, display, far_plane, zoom_distance=20.0, elevation_angle=45.0):
         self.player = player
         self.mesh_map = mesh_map
         self.zoom_distance = zoom_distance
         self.user_zoom_distance = zoom_distance
         self.zoom_cooldown = 0
+        # How far the camera could go without meeting the terrain, as of the last frame drawn
+        self.clear_distance = zoom_distance
         self.elevation_angle = elevation_angle
         
         glEnable(GL_DEPTH_TEST)
@@ -25,34 +31,34 @@ class Camera():
         glMatrixMode(GL_MODELVIEW)
      
     # Use this to update the camera position and what it's looking at
-    def apply(self):
+    def apply(self, alpha=1.0):
         glClear(GL_COLOR_BUFFER_BIT | GL_DEPTH_BUFFER_BIT)
         glLoadIdentity()
 
-        player_position = self.player.get_position()
+        player_position = self.player.get_interpolated_position(alpha)
         player_height = self.player.get_height() * 5 / 6
 
-        # Compute initial camera position at the current zoom level
-        camera_x = player_position[0] - self.zoom_distance * math.sin(math.radians(player_position[3]))
-        camera_z = player_position[2] + self.zoom_distance * math.cos(math.radians(player_position[3]))
-        camera_y = player_position[1] + self.zoom_distance * math.sin(math.radians(self.elevation_angle)) + player_height
-
-        # Get terrain height at the camera's (x, z) position
-        terrain_height = self.mesh_map.get_tile_height((camera_x, camera_z)) + 1.0  
-
-        if camera_y < terrain_height:
-            # If colliding, zoom in
-            self.zoom_distance = max(1.0, self.zoom_distance - 1)
-            self.zoom_cooldown = 20  # Set cooldown to prevent immediate zoom-out
-        elif self.zoom_distance < self.user_zoom_distance:
-            if self.zoom_cooldown > 0:
-                self.zoom_cooldown -= 1  # Decrease cooldown timer
-            else:
-                # If no collision and cooldown expired, zoom out
-                self.zoom_distance = min(self.user_zoom_distance, self.zoom_distance + 1)
-        elif self.zoom_distance > self.user_zoom_distance:
-            self.zoom_distance = max(self.user_zoom_distance, self.zoom_distance - 1)
+        # Cast rays from the player's head back toward the camera, one down the middle and
+        # a few fanned out around it, and take the nearest place any of them meets the terrain
+        directions = []
+        for yaw, pitch in self.PROBE_OFFSETS:
+            yaw = math.radians(player_position[3] + yaw)
+            pitch = math.radians(self.elevation_angle + pitch)
+            directions.append((-math.sin(yaw), math.sin(pitch), math.cos(yaw)))
+        # The camera sits zoom_distance times these (not unit length) offsets from the head,
+        # so hits are divided by each offset's length to come back in zoom distance units
+        directions = np.array(directions, dtype=np.float64)
+        lengths = np.linalg.norm(directions, axis=1)
+        origin = (player_position[0], player_position[1] + player_height, player_position[2])
+        hits = self.mesh_map.terrain.raycast([origin] * len(directions), directions, self.user_zoom_distance * lengths.max())
+        hit_distance = float((hits / lengths).min())
+        # Keep the camera a unit clear of whatever it hit
+        self.clear_distance = max(1.0, hit_distance - 1.0)
 
+        if self.zoom_distance > self.clear_distance:
+            # If colliding, zoom in straight away rather than waiting for the next tick
+            self.zoom_distance = self.clear_distance
+            self.zoom_cooldown = 20  # Set cooldown (in ticks) to prevent immediate zoom-out
 
         # Recalculate camera position after zoom adjustments
         camera_x = player_position[0] - self.zoom_distance * math.sin(math.radians(player_position[3]))
@@ -64,8 +70,18 @@ class Camera():
                   player_position[0], player_position[1] + player_height, player_position[2],  
                   0, 1, 0)   
 
-    # Use this to update the camera position attributes with use controls
+    # Use this to update the camera position attributes with use controls, once per tick
     def update(self, keys):
+        # Easing back out runs per tick, so it takes as long at any frame rate
+        if self.zoom_distance < min(self.user_zoom_distance, self.clear_distance):
+            if self.zoom_cooldown > 0:
+                self.zoom_cooldown -= 1  # Decrease cooldown timer
+            else:
+                # If no collision and cooldown expired, zoom out
+                self.zoom_distance = min(self.user_zoom_distance, self.clear_distance, self.zoom_distance + 1)
+        elif self.zoom_distance > self.user_zoom_distance:
+            self.zoom_distance = max(self.user_zoom_distance, self.zoom_distance - 1)
+
         if keys[K_q]:
             self.user_zoom_distance = max(1.0, self.user_zoom_distance - 1)  # Prevent getting too close
         if keys[K_e]:
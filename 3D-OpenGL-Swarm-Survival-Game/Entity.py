@@ -5,6 +5,22 @@ from OpenGL.GL import *
 from OpenGL.GLU import *
 import random
 import math
+import ctypes
+from MeshCache import MeshCache
+
+def interpolate_placements(previous, current, alpha):
+    """
+    Blend (x, y, z, r) placements between two simulation ticks.
+    Works on a single (4,) placement or an (n, 4) array of them.
+    Rotation takes the shortest way around so 359 -> 1 doesn't spin backwards.
+    """
+    previous = np.asarray(previous, dtype=np.float32)
+    current = np.asarray(current, dtype=np.float32)
+    blended = previous + (current - previous) * alpha
+    turn = (current[..., 3] - previous[..., 3] + 180) % 360 - 180
+    blended[..., 3] = (previous[..., 3] + turn * alpha) % 360
+    return blended
+
 
 class Entity():
     def __init__(self, 
@@ -20,6 +36,7 @@ class Entity():
                 ):
         
         self.position = np.array(placement, dtype=np.float32)
+        self.previous_position = self.position.copy()  # Position at the previous simulation tick
         self.velocity = np.zeros(4, dtype=np.float32)
         self.max_speed = max_speed
         self.max_acceleration = max_acceleration
@@ -40,10 +57,17 @@ class Entity():
     
     def set_position(self, x, y, z, r):
         self.position = np.array([x, y, z, r], dtype=np.float32)
+        self.previous_position = self.position.copy()  # Teleport, don't interpolate
     
     def get_position(self):
         return tuple(self.position)
     
+    def snapshot(self):
+        self.previous_position = self.position.copy()
+    
+    def get_interpolated_position(self, alpha):
+        return tuple(interpolate_placements(self.previous_position, self.position, alpha))
+    
     def set_velocity(self, vx, vy, vz, vr):
         self.velocity = np.array([vx, vy, vz, vr], dtype=np.float32)
     
@@ -54,8 +78,8 @@ class Entity():
         self.velocity[0] *= self.friction_coefficient
         self.velocity[2] *= self.friction_coefficient
     
-    def apply_gravity(self):
-        if self.position[1] > 0:
+    def apply_gravity(self, ground_height=0.0):
+        if self.position[1] > ground_height:
             if self.velocity[1] > self.max_fall_velocity:
                 self.velocity[1] -= self.gravity
         else:
@@ -131,8 +155,9 @@ class Entity():
 
 
 class Player(Entity):
-    def __init__(self, placement, max_speed, max_acceleration, friction_coefficient, jump_power, gravity, max_fall_velocity, width, max_attack_range=3.0, attack_cooldown=1.0):
+    def __init__(self, placement, max_speed, max_acceleration, friction_coefficient, jump_power, gravity, max_fall_velocity, width, max_attack_range=3.0, attack_cooldown=1.0, mesh_cache=None, tessellation=50, step_height=None):
         super().__init__(placement, max_speed, max_acceleration, friction_coefficient, jump_power, gravity, max_fall_velocity, width)
+        self.step_height = step_height  # Tallest terrain rise the player can walk up (None climbs anything)
         self.is_attacking = False
         self.attack_timer = 0.0
         self.attack_duration = 0.2  # Attack lasts 0.2 seconds
@@ -142,8 +167,23 @@ class Player(Entity):
         self.attack_cooldown = attack_cooldown  # Cooldown time seconds
         self.cooldown_timer = 0.0  # Timer to track time until the next attack is allowed
 
-    def update(self, keys, map_height, dt):  
+        # Body, head and attack cone are tessellated once and reused every frame
+        self.mesh_cache = mesh_cache if mesh_cache is not None else MeshCache()
+        self.body_mesh = self.mesh_cache.cone(self.width / 2, 0, self.height * (2/3), tessellation, tessellation)
+        self.head_mesh = self.mesh_cache.sphere(self.width / 3, tessellation, tessellation)
+        # Unit length attack cone, stretched along z to the current tip distance when drawn
+        self.attack_mesh = self.mesh_cache.cone(self.width * 0.2, 0.0, 1.0, 20, 5)
+
+    def update(self, keys, terrain, dt):  
+        """
+        Advance the player one tick.
+
+        :param keys: Key state for this tick.
+        :param terrain: The TerrainQuery shared with the camera and enemies.
+        :param dt: Seconds per tick.
+        """
         direction_angle = np.radians(self.position[3])
+        map_height = terrain.height_at(self.position[0], self.position[2])
         
         if (self.position[1] - map_height) < self.width / 2:
             if keys[K_a]:
@@ -175,12 +215,14 @@ class Player(Entity):
                 self.jump()
         
         else:
-            self.apply_gravity()
+            self.apply_gravity(map_height)
             
+        # Sweep the move against the terrain so the ground is checked where the player ends up
+        start = self.position[:3].copy()
         self.position += self.velocity
-
-        if self.position[1] <= map_height:
-            self.position[1] = map_height
+        resolved, grounded, _ = terrain.sweep(start, self.position[:3], step_height=self.step_height)
+        self.position[:3] = resolved[0]
+        if grounded[0]:
             self.velocity[1] = 0
         
         # Handle cooldown before allowing another attack
@@ -197,14 +239,13 @@ class Player(Entity):
                 self.attack_timer = 0.0
         
 
-    def render(self):
+    def render(self, alpha=1.0):
+        x, y, z, r = self.get_interpolated_position(alpha)
         glPushMatrix()
-        glTranslatef(self.position[0], self.position[1], self.position[2])
-        glRotatef(-self.position[3], 0, 1, 0)
+        glTranslatef(x, y, z)
+        glRotatef(-r, 0, 1, 0)
         
-        quad = gluNewQuadric()
-        
-        theta = math.radians(self.position[3])
+        theta = math.radians(r)
         x_relative_velocity = self.velocity[0] * math.cos(theta) + self.velocity[2] * math.sin(theta)
         z_relative_velocity = -self.velocity[0] * math.sin(theta) + self.velocity[2] * math.cos(theta)
         
@@ -219,7 +260,7 @@ class Player(Entity):
         # Tilt, print, untilt to show directional movement
         glRotatef(z_tilt, 1, 0, 0)
         glRotatef(-x_tilt, 0, 1, 0)
-        gluCylinder(quad, self.width / 2, 0, self.height * (2/3), 50, 50)
+        self.mesh_cache.draw(self.body_mesh)
         glRotatef(-z_tilt, 1, 0, 0)
         glRotatef(x_tilt, 0, 1, 0)
 
@@ -229,12 +270,10 @@ class Player(Entity):
         glPushMatrix()
         glTranslatef(0, self.height * 5 / 6, 0)
         glColor3f(0.0, 0.0, 0.0)  # Black head
-        gluSphere(quad, self.width / 3, 50, 50)
+        self.mesh_cache.draw(self.head_mesh)
         
         glPopMatrix()
 
-        gluDeleteQuadric(quad)
-
         # Render the melee attack animation (a spinning cone) if active.
         if self.is_attacking:
             glPushMatrix()
@@ -257,10 +296,8 @@ class Player(Entity):
             glRotatef(spin_angle, 0, 1, 0)  # Spin the cone
             glTranslatef(0, 0, attack_offset)  # Move the cone out from the player
 
-            cone_base_radius = self.width * 0.2
-            quad = gluNewQuadric()
-            gluCylinder(quad, cone_base_radius, 0.0, tip_distance, 20, 5)  # cone's tip moves in/out smoothly
-            gluDeleteQuadric(quad)
+            glScalef(1, 1, tip_distance)  # cone's tip moves in/out smoothly
+            self.mesh_cache.draw(self.attack_mesh)
             glPopMatrix()
         glPopMatrix()
 
@@ -281,26 +318,291 @@ class Player(Entity):
         return center, attack_radius
 
 
-class Enemy(Entity):
-    def __init__(self, 
-                 placement: tuple, 
-                 max_speed: float, 
-                 max_acceleration: float, 
-                 friction_coefficient: int, 
-                 jump_power: float, 
-                 gravity: float, 
-                 max_fall_velocity: float, 
-                 width: float, 
-                 max_health: float):
-        super().__init__(placement, max_speed, max_acceleration, friction_coefficient, 
-                         jump_power, gravity, max_fall_velocity, width)
+class EnemySwarm:
+    """
+    Array-backed store for every enemy in the world. Each enemy is a row in
+    (n, k) float32 arrays so steering, terrain snapping, damage and removal
+    run as whole-array operations instead of per-enemy Python loops.
+    All enemies share the same movement and size parameters.
+    """
+    def __init__(self,
+                 max_speed: float,
+                 max_acceleration: float,
+                 friction_coefficient: float,
+                 jump_power: float,
+                 gravity: float,
+                 max_fall_velocity: float,
+                 width: float,
+                 max_health: float,
+                 capacity: int = 64):
+        self.max_speed = max_speed
+        self.max_acceleration = max_acceleration
+        self.friction_coefficient = friction_coefficient
+        self.jump_power = jump_power
+        self.gravity = gravity
+        self.max_fall_velocity = max_fall_velocity
+        self.width = width
+        self.height = width * 2
         self.max_health = max_health
-        self.health = max_health
+
+        self.count = 0
+        self.__positions = np.zeros((capacity, 4), dtype=np.float32)   # (x, y, z, r)
+        self.__previous_positions = np.zeros((capacity, 4), dtype=np.float32)  # positions at the previous tick
+        self.__velocities = np.zeros((capacity, 4), dtype=np.float32)  # (vx, vy, vz, vr)
+        self.__health = np.zeros((capacity, 1), dtype=np.float32)
+        self.__alive = np.zeros((capacity, 1), dtype=np.float32)      # 1.0 alive, 0.0 dead
+
+    # Views over the live rows only. These are numpy views, so writes go straight to the store.
+    @property
+    def positions(self):
+        return self.__positions[:self.count]
+
+    @property
+    def previous_positions(self):
+        return self.__previous_positions[:self.count]
+
+    @property
+    def velocities(self):
+        return self.__velocities[:self.count]
+
+    @property
+    def health(self):
+        return self.__health[:self.count, 0]
+
+    @property
+    def alive(self):
+        return self.__alive[:self.count, 0] > 0
+
+    def __len__(self):
+        return self.count
+
+    def __reserve(self, needed: int):
+        """Grow the backing arrays (doubling) so at least `needed` rows fit."""
+        capacity = max(len(self.__positions), 1)
+        if needed <= capacity:
+            return
+        while capacity < needed:
+            capacity *= 2
+
+        def grow(old):
+            grown = np.zeros((capacity, old.shape[1]), dtype=np.float32)
+            grown[:self.count] = old[:self.count]
+            return grown
+
+        self.__positions = grow(self.__positions)
+        self.__previous_positions = grow(self.__previous_positions)
+        self.__velocities = grow(self.__velocities)
+        self.__health = grow(self.__health)
+        self.__alive = grow(self.__alive)
+
+    def spawn(self, placements):
+        """
+        Append enemies at the given placements.
+
+        :param placements: An (n, 4) array-like of (x, y, z, r) rows.
+        """
+        placements = np.asarray(placements, dtype=np.float32).reshape(-1, 4)
+        n = len(placements)
+        self.__reserve(self.count + n)
+        rows = slice(self.count, self.count + n)
+        self.__positions[rows] = placements
+        self.__previous_positions[rows] = placements
+        self.__velocities[rows] = 0
+        self.__health[rows] = self.max_health
+        self.__alive[rows] = 1.0
+        self.count += n
+
+    def snapshot(self):
+        """Remember the current positions so rendering can interpolate between ticks."""
+        self.previous_positions[:] = self.positions
+
+    def seek(self, target, dt):
+        """Move every enemy straight toward the target (x, y, z) at max speed."""
+        if self.count == 0:
+            return
+        positions = self.positions
+        direction = np.asarray(target[:3], dtype=np.float32) - positions[:, :3]
+        distance = np.linalg.norm(direction, axis=1, keepdims=True)
+        # Enemies sitting exactly on the target stay put instead of dividing by zero.
+        np.divide(direction, distance, out=direction, where=distance > 0)
+        self.velocities[:, :3] = direction * self.max_speed
+        positions[:, :3] += self.velocities[:, :3] * dt
+
+    def snap_to_terrain(self, terrain):
+        """Set every enemy's y position to the terrain height below it in one batched TerrainQuery lookup."""
+        if self.count == 0:
+            return
+        positions = self.positions
+        positions[:, 1] = terrain.heights_at(positions[:, 0], positions[:, 2])
+
+    def apply_damage(self, center, radius, damage):
+        """
+        Damage every enemy whose (x, z) position is within radius of center.
+
+        :return: The number of enemies hit.
+        """
+        if self.count == 0:
+            return 0
+        positions = self.positions
+        offset = positions[:, (0, 2)] - np.asarray(center, dtype=np.float32)
+        hit = np.einsum('ij,ij->i', offset, offset) <= radius * radius
+        health = self.health
+        health[hit] = np.maximum(health[hit] - damage, 0)
+        self.__alive[:self.count, 0] = health > 0
+        return int(np.count_nonzero(hit))
+
+    def set_health(self, index, value):
+        """Set one enemy's health, clamped at zero, keeping its alive flag in step."""
+        value = max(value, 0)
+        self.__health[index, 0] = value
+        self.__alive[index, 0] = 1.0 if value > 0 else 0.0
+
+    def compact(self):
+        """Drop dead enemies, keeping the survivors packed at the front of the arrays."""
+        alive = self.alive
+        survivors = int(np.count_nonzero(alive))
+        if survivors == self.count:
+            return
+        for array in (self.__positions, self.__previous_positions, self.__velocities, self.__health, self.__alive):
+            array[:survivors] = array[:self.count][alive]
+        self.count = survivors
+
+    def within(self, center, distance):
+        """Return the indices of enemies whose (x, z) position is within distance of center."""
+        offset = self.positions[:, (0, 2)] - np.asarray((center[0], center[2]), dtype=np.float32)
+        return np.flatnonzero(np.einsum('ij,ij->i', offset, offset) <= distance * distance)
+
+
+class EnemyRenderer:
+    """
+    Draws every visible enemy's wireframe box in a single draw call.
+    Each frame the box model is transformed for all enemies at once with NumPy,
+    uploaded into one streaming VBO, and drawn with one glDrawArrays.
+    """
+    def __init__(self, width: float, height: float, color=(1.0, 1.0, 1.0)):
+        half_width = width / 2
+        vertices = np.array([
+            (half_width, 0, half_width),
+            (half_width, 0, -half_width),
+            (-half_width, 0, -half_width),
+            (-half_width, 0, half_width),
+            (half_width, height, half_width),
+            (half_width, height, -half_width),
+            (-half_width, height, -half_width),
+            (-half_width, height, half_width)
+        ], dtype=np.float32)
+        edges = np.array([
+            (0, 1), (1, 2), (2, 3), (3, 0),
+            (4, 5), (5, 6), (6, 7), (7, 4),
+            (0, 4), (1, 5), (2, 6), (3, 7)
+        ])
+        # (24, 3) line list shared by every enemy
+        self.model = vertices[edges.ravel()]
+        self.color = color
+        self.__vbo = None  # Created on first render so the renderer can exist without a GL context
+
+    def build_vertices(self, positions):
+        """
+        Transform the shared model by every (x, y, z, r) row at once.
+        Matches draw_entity_box: translate, then rotate by -r degrees around y.
+
+        :param positions: An (n, 4) array of enemy placements.
+        :return: An (n * 24, 3) float32 array of line vertices.
+        """
+        positions = np.asarray(positions, dtype=np.float32)
+        theta = np.radians(positions[:, 3])[:, None]
+        cos_t = np.cos(theta)
+        sin_t = np.sin(theta)
+        model_x = self.model[None, :, 0]
+        model_z = self.model[None, :, 2]
+        out = np.empty((len(positions), len(self.model), 3), dtype=np.float32)
+        out[:, :, 0] = model_x * cos_t - model_z * sin_t + positions[:, 0:1]
+        out[:, :, 1] = self.model[None, :, 1] + positions[:, 1:2]
+        out[:, :, 2] = model_x * sin_t + model_z * cos_t + positions[:, 2:3]
+        return out.reshape(-1, 3)
+
+    def render(self, positions):
+        """Draw boxes for all the given (n, 4) enemy placements."""
+        if len(positions) == 0:
+            return
+        vertices = self.build_vertices(positions)
+        if self.__vbo is None:
+            self.__vbo = glGenBuffers(1)
+
+        glBindBuffer(GL_ARRAY_BUFFER, self.__vbo)
+        # Re-specifying the whole store each frame orphans last frame's buffer instead of stalling on it.
+        glBufferData(GL_ARRAY_BUFFER, vertices.nbytes, vertices, GL_STREAM_DRAW)
+        glEnableClientState(GL_VERTEX_ARRAY)
+        glVertexPointer(3, GL_FLOAT, 0, ctypes.c_void_p(0))
+
+        glLineWidth(2.0)
+        glColor3f(*self.color)
+        glDrawArrays(GL_LINES, 0, len(vertices))
+        glLineWidth(1.0)
+
+        glDisableClientState(GL_VERTEX_ARRAY)
+        glBindBuffer(GL_ARRAY_BUFFER, 0)
+
+    def cleanup(self):
+        """Delete the streaming VBO."""
+        if self.__vbo is not None:
+            glDeleteBuffers(1, [self.__vbo])
+            self.__vbo = None
+
+
+class Enemy(Entity):
+    """
+    Thin view of one row of an EnemySwarm, kept so code written against single
+    Entity objects still works. Reads and writes go straight to the swarm arrays.
+    A view is only valid until the swarm is next compacted.
+    """
+    def __init__(self, swarm: EnemySwarm, index: int):
+        self.swarm = swarm
+        self.index = index
+        self.max_speed = swarm.max_speed
+        self.max_acceleration = swarm.max_acceleration
+        self.friction_coefficient = swarm.friction_coefficient
+        self.jump_power = swarm.jump_power
+        self.gravity = swarm.gravity
+        self.max_fall_velocity = swarm.max_fall_velocity
+        self.width = swarm.width
+        self.height = swarm.height
+        self.max_health = swarm.max_health
+
+    @property
+    def position(self):
+        return self.swarm.positions[self.index]
+
+    @position.setter
+    def position(self, value):
+        self.swarm.positions[self.index] = value
+
+    @property
+    def previous_position(self):
+        return self.swarm.previous_positions[self.index]
+
+    @previous_position.setter
+    def previous_position(self, value):
+        self.swarm.previous_positions[self.index] = value
+
+    @property
+    def velocity(self):
+        return self.swarm.velocities[self.index]
+
+    @velocity.setter
+    def velocity(self, value):
+        self.swarm.velocities[self.index] = value
+
+    @property
+    def health(self):
+        return float(self.swarm.health[self.index])
+
+    @health.setter
+    def health(self, value):
+        self.swarm.set_health(self.index, value)
 
     def take_damage(self, damage: float):
-        self.health -= damage
-        if self.health < 0:
-            self.health = 0
+        self.health = self.health - damage
 
     def is_alive(self):
         return self.health > 0
@@ -315,33 +617,42 @@ class EnemyManager:
         self.spawn_radius = spawn_radius    # Maximum distance from the player for spawning
         self.spawn_rate = spawn_rate        # Time (in seconds) between spawns
         self.group_spawn_size = group_spawn_size  # Average number of enemies per group
-        self.enemies = []                   # List to hold enemies
         self.time_since_last_spawn = 0      # Timer to track spawn intervals
 
+        # Array-backed store holding every enemy
+        self.swarm = EnemySwarm(
+            max_speed=2,
+            max_acceleration=0.1,
+            friction_coefficient=0.7,
+            jump_power=0.7,
+            gravity=0.1,
+            max_fall_velocity=-1.5,
+            width=0.75,
+            max_health=100
+        )
+
+        # Batched renderer drawing all visible enemies in one call
+        self.renderer = EnemyRenderer(self.swarm.width, self.swarm.height, color=(1.0, 1.0, 1.0))
+
         self.attack_damage = 20  # Damage dealt per hit when the player attacks (I'll move this to player later)
 
+    @property
+    def enemies(self):
+        """Per-enemy views over the swarm, for code that still wants a list of Enemy objects."""
+        return [Enemy(self.swarm, i) for i in range(len(self.swarm))]
+
     def spawn_enemy_group(self, player_position):
         """Spawn a group of enemies randomly within the spawn radius around the player."""
         group_size = int(self.group_spawn_size + random.uniform(-2, 2))
-        for _ in range(group_size):
-            spawn_distance = random.uniform(0, self.spawn_radius / 4) + self.spawn_radius
-            spawn_angle = random.uniform(0, 2 * np.pi)
-            x_offset = spawn_distance * np.cos(spawn_angle)
-            z_offset = spawn_distance * np.sin(spawn_angle)
-            spawn_position = (player_position[0] + x_offset, 0, player_position[2] + z_offset)
-            spawn_height = self.mesh_map.get_tile_height((spawn_position[0], spawn_position[2]))
-            enemy = Enemy(
-                placement=(spawn_position[0], spawn_height, spawn_position[2], 0),
-                max_speed=2,
-                max_acceleration=0.1,
-                friction_coefficient=0.7,
-                jump_power=0.7,
-                gravity=0.1,
-                max_fall_velocity=-1.5,
-                width=0.75,
-                max_health=100
-            )
-            self.enemies.append(enemy)
+        if group_size <= 0:
+            return
+        spawn_distance = np.random.uniform(0, self.spawn_radius / 4, group_size) + self.spawn_radius
+        spawn_angle = np.random.uniform(0, 2 * np.pi, group_size)
+        placements = np.zeros((group_size, 4), dtype=np.float32)
+        placements[:, 0] = player_position[0] + spawn_distance * np.cos(spawn_angle)
+        placements[:, 2] = player_position[2] + spawn_distance * np.sin(spawn_angle)
+        placements[:, 1] = self.mesh_map.terrain.heights_at(placements[:, 0], placements[:, 2])
+        self.swarm.spawn(placements)
 
     def update(self, player_position, dt):
         """Update enemy spawning and move all enemies toward the player.
@@ -352,43 +663,27 @@ class EnemyManager:
             self.spawn_enemy_group(player_position)
             self.time_since_last_spawn = 0
 
-        # Move each enemy toward the player and fix y-position.
-        for enemy in self.enemies:
-            target = np.array(player_position[:3])
-            enemy_pos = enemy.position[:3]
-            direction = target - enemy_pos
-            distance = np.linalg.norm(direction)
-            if distance > 0:
-                direction /= distance  # Normalize
-                velocity = direction * enemy.max_speed
-                enemy.position[:3] += velocity * dt
-
-            # Adjust enemy's y-coordinate based on the terrain.
-            tile_height = self.mesh_map.get_tile_height((enemy.position[0], enemy.position[2]))
-            enemy.position[1] = tile_height
+        # Move every enemy toward the player and fix y-positions in one batch.
+        self.swarm.seek(player_position, dt)
+        self.swarm.snap_to_terrain(self.mesh_map.terrain)
 
     def handle_player_attacks(self, attack_center, attack_radius):
         """
         Given the affected x,z coordinates of an attack and its effective radius,
         apply damage to any enemy within that area.
         """
-        attack_center = np.array(attack_center)
-        for enemy in self.enemies:
-            enemy_pos = np.array([enemy.position[0], enemy.position[2]])
-            distance = np.linalg.norm(attack_center - enemy_pos)
-            if distance <= attack_radius:
-                enemy.take_damage(self.attack_damage)
-                
+        self.swarm.apply_damage(attack_center, attack_radius, self.attack_damage)
         # Remove any enemies that have died.
-        self.enemies = [enemy for enemy in self.enemies if enemy.is_alive()]
-
-    def render(self, player_position, distance):
-        """Render all spawned enemies."""
-        for enemy in self.enemies:
-            position = enemy.get_position()
-            absolute_distance = math.sqrt((player_position[0] - position[0])**2 + (player_position[2] - position[2])**2)
-            if absolute_distance <= distance:
-                enemy.draw_entity_box(color=(1.0, 1.0, 1.0))
+        self.swarm.compact()
+
+    def render(self, player_position, distance, alpha=1.0):
+        """Render all spawned enemies, interpolated alpha of the way from the previous tick."""
+        visible = self.swarm.within(player_position, distance)
+        self.renderer.render(interpolate_placements(self.swarm.previous_positions[visible], self.swarm.positions[visible], alpha))
+
+    def cleanup(self):
+        """Release GL resources held by the enemy renderer."""
+        self.renderer.cleanup()
 
     
     
@@ -0,0 +1,112 @@
+from Profiler import PROFILER
+
+
+class KeyState:
+    def __init__(self, pressed=()):
+        """
+        Stand-in for pygame.key.get_pressed() used to drive the simulation
+        without a window, e.g. from a bot or a scripted benchmark path.
+
+        :param pressed: An iterable of pygame key constants that are held down.
+        """
+        self.pressed = set(pressed)
+
+    def __getitem__(self, key):
+        return key in self.pressed
+
+
+class FixedTimestep:
+    def __init__(self, tick_rate: int = 60, max_frame_time: float = 0.25):
+        """
+        Initialize the FixedTimestep accumulator.
+        Real frame time is accumulated and spent in whole simulation ticks of 1 / tick_rate
+        seconds, so gameplay speed no longer depends on how long a frame took to render.
+
+        :param tick_rate: Simulation ticks per second.
+        :param max_frame_time: Longest frame (in seconds) that is caught up on. Anything longer
+                               is dropped so one huge stall can't trigger an endless catch-up.
+        """
+        self.tick_rate = tick_rate
+        self.tick_dt = 1.0 / tick_rate
+        self.max_frame_time = max_frame_time
+        self.accumulator = 0.0
+        self.tick = 0
+
+    def advance(self, frame_time: float) -> int:
+        """
+        Add a frame's worth of real time.
+
+        :param frame_time: Seconds since the previous frame.
+        :return: The number of simulation ticks that should run this frame.
+        """
+        self.accumulator += min(frame_time, self.max_frame_time)
+        ticks = int(self.accumulator / self.tick_dt)
+        self.accumulator -= ticks * self.tick_dt
+        self.tick += ticks
+        return ticks
+
+    @property
+    def alpha(self) -> float:
+        """How far (0 to 1) the current frame sits between the last tick and the next one."""
+        return self.accumulator / self.tick_dt
+
+
+class Simulation:
+    def __init__(self, mesh_map, player, enemy_manager, camera=None):
+        """
+        Initialize the Simulation.
+        Holds everything advanced at the fixed tick rate. Nothing in step() touches OpenGL,
+        so with no camera and a MeshMap made without an initial_target the whole game
+        can run headless and as fast as the CPU allows.
+
+        :param mesh_map: The MeshMap whose terrain queries are shared by the player and enemies.
+        :param player: The Player.
+        :param enemy_manager: The EnemyManager.
+        :param camera: Optional Camera whose controls are read each tick.
+        """
+        self.mesh_map = mesh_map
+        self.player = player
+        self.enemy_manager = enemy_manager
+        self.camera = camera
+
+    def step(self, keys, dt: float):
+        """Advance the game by exactly one tick of dt seconds."""
+        self.step_player(keys, dt)
+        self.step_enemies(dt)
+
+    def step_player(self, keys, dt: float):
+        """The player and camera-control half of a tick."""
+        # Remember where the player was so rendering can interpolate toward the new state
+        self.player.snapshot()
+
+        # Update user control related items
+        with PROFILER.scope('Player.update'):
+            self.player.update(keys, self.mesh_map.terrain, dt)
+        if self.camera is not None:
+            self.camera.update(keys)
+
+    def step_enemies(self, dt: float):
+        """The enemy half of a tick. Runs after step_player so enemies chase the player's new position."""
+        self.enemy_manager.swarm.snapshot()
+
+        # Manage all enemy behaviors
+        with PROFILER.scope('EnemyManager.update'):
+            self.enemy_manager.update(self.player.get_position(), dt)
+        if self.player.is_attacking:
+            attack_center, attack_radius = self.player.get_attack_area()
+            self.enemy_manager.handle_player_attacks(attack_center, attack_radius)
+
+    def run_headless(self, ticks: int, tick_rate: int = 60, keys=None):
+        """
+        Run the simulation for a number of ticks without waiting on real time.
+
+        :param ticks: Number of ticks to simulate.
+        :param tick_rate: Simulation ticks per second used for dt.
+        :param keys: Either a key state used for every tick, or a function taking
+                     the tick index and returning that tick's key state.
+        """
+        dt = 1.0 / tick_rate
+        if keys is None:
+            keys = KeyState()
+        for tick in range(ticks):
+            self.step(keys(tick) if callable(keys) else keys, dt)
@@ -0,0 +1,134 @@
+import numpy as np
+from OpenGL.GL import *
+import ctypes
+
+
+def _grid_triangles(grid: np.ndarray) -> np.ndarray:
+    """
+    Turn a (rows, columns, 3) grid of points into a triangle list.
+    Every cell between neighbouring rows and columns becomes two triangles.
+
+    :param grid: A (rows, columns, 3) array of vertex positions.
+    :return: A ((rows - 1) * (columns - 1) * 6, 3) float32 array.
+    """
+    p1 = grid[:-1, :-1]
+    p2 = grid[1:, :-1]
+    p3 = grid[1:, 1:]
+    p4 = grid[:-1, 1:]
+    triangles = np.stack((p1, p2, p3, p1, p3, p4), axis=2)
+    return np.ascontiguousarray(triangles.reshape(-1, 3), dtype=np.float32)
+
+
+def build_cone(base_radius: float, top_radius: float, height: float, slices: int, stacks: int) -> np.ndarray:
+    """
+    Build the same surface as gluCylinder: a (possibly tapered) tube along +z
+    from z = 0 with base_radius to z = height with top_radius.
+
+    :return: A float32 triangle list of (x, y, z) vertices.
+    """
+    t = np.linspace(0, 1, stacks + 1, dtype=np.float32)[:, None]
+    angle = np.linspace(0, 2 * np.pi, slices + 1, dtype=np.float32)[None, :]
+    radius = base_radius + (top_radius - base_radius) * t
+    grid = np.empty((stacks + 1, slices + 1, 3), dtype=np.float32)
+    grid[:, :, 0] = radius * np.sin(angle)
+    grid[:, :, 1] = radius * np.cos(angle)
+    grid[:, :, 2] = height * t
+    return _grid_triangles(grid)
+
+
+def build_sphere(radius: float, slices: int, stacks: int) -> np.ndarray:
+    """
+    Build the same surface as gluSphere: a sphere centered on the origin with its poles on the z axis.
+
+    :return: A float32 triangle list of (x, y, z) vertices.
+    """
+    phi = np.linspace(0, np.pi, stacks + 1, dtype=np.float32)[:, None]
+    theta = np.linspace(0, 2 * np.pi, slices + 1, dtype=np.float32)[None, :]
+    grid = np.empty((stacks + 1, slices + 1, 3), dtype=np.float32)
+    grid[:, :, 0] = radius * np.sin(phi) * np.sin(theta)
+    grid[:, :, 1] = radius * np.sin(phi) * np.cos(theta)
+    grid[:, :, 2] = radius * np.cos(phi)
+    return _grid_triangles(grid)
+
+
+class MeshCache:
+    def __init__(self):
+        """
+        Initialize the MeshCache.
+        Meshes are tessellated once on the CPU when first requested and uploaded
+        to a VBO the first time they are drawn, so a cache can be created before
+        a GL context exists. Any number of entities can share one cache.
+        """
+        # Each key is a tuple describing the shape, e.g. ('cone', base, top, height, slices, stacks).
+        self.__meshes = {}
+
+    def __get(self, key: tuple, builder, *args):
+        if key not in self.__meshes:
+            vertices = builder(*args)
+            self.__meshes[key] = {
+                'vertices': vertices,
+                'vbo': None,
+                'vertex_count': len(vertices)
+            }
+        return key
+
+    def cone(self, base_radius: float, top_radius: float, height: float, slices: int, stacks: int) -> tuple:
+        """
+        Get the key of a cached cone, building it if needed.
+
+        :return: A key to pass to draw().
+        """
+        key = ('cone', base_radius, top_radius, height, slices, stacks)
+        return self.__get(key, build_cone, base_radius, top_radius, height, slices, stacks)
+
+    def sphere(self, radius: float, slices: int, stacks: int) -> tuple:
+        """
+        Get the key of a cached sphere, building it if needed.
+
+        :return: A key to pass to draw().
+        """
+        key = ('sphere', radius, slices, stacks)
+        return self.__get(key, build_sphere, radius, slices, stacks)
+
+    def add(self, key: tuple, vertices: np.ndarray) -> tuple:
+        """
+        Add a custom (n, 3) triangle list under the given key, e.g. an enemy model.
+
+        :return: The key.
+        """
+        return self.__get(key, np.ascontiguousarray, vertices, np.float32)
+
+    def vertices(self, key: tuple) -> np.ndarray:
+        """Return the CPU-side vertex array for a cached mesh."""
+        return self.__meshes[key]['vertices']
+
+    def draw(self, key: tuple):
+        """
+        Draw a cached mesh with the current transform and color.
+        This must run on the main thread.
+
+        :param key: A key returned by cone(), sphere() or add().
+        """
+        mesh = self.__meshes[key]
+        if mesh['vbo'] is None:
+            vertices = mesh['vertices']
+            mesh['vbo'] = glGenBuffers(1)
+            glBindBuffer(GL_ARRAY_BUFFER, mesh['vbo'])
+            glBufferData(GL_ARRAY_BUFFER, vertices.nbytes, vertices, GL_STATIC_DRAW)
+        else:
+            glBindBuffer(GL_ARRAY_BUFFER, mesh['vbo'])
+        glEnableClientState(GL_VERTEX_ARRAY)
+        glVertexPointer(3, GL_FLOAT, 0, ctypes.c_void_p(0))
+        glDrawArrays(GL_TRIANGLES, 0, mesh['vertex_count'])
+        glDisableClientState(GL_VERTEX_ARRAY)
+        glBindBuffer(GL_ARRAY_BUFFER, 0)
+
+    def cleanup(self):
+        """
+        Delete all uploaded VBOs. The CPU-side vertex arrays are kept,
+        so meshes are re-uploaded if drawn again.
+        """
+        for mesh in self.__meshes.values():
+            if mesh['vbo'] is not None:
+                glDeleteBuffers(1, [mesh['vbo']])
+                mesh['vbo'] = None
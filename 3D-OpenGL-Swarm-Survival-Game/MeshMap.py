@@ -10,32 +10,250 @@ import concurrent.futures
 import math
 import ctypes
 import colorsys
+import time
+import collections
+from WorldFile import WorldFile
+from TerrainQuery import TerrainQuery
+import Noise
+
+
+def terrain_height(x: float, z: float, seed: int, scale: float, height_limit: float) -> float:
+    """
+    Compute the terrain height at a world position from the noise parameters.
+    MeshMap and the offline world baker both use this so they always agree.
+    
+    :return: The height at (x, z), based on noise generation.
+    """
+    base_noise = noise.pnoise2(
+        x * scale,
+        z * scale,
+        octaves=4,
+        persistence=0.5,
+        lacunarity=2.0,
+        repeatx=1024,
+        repeaty=1024,
+        base=seed
+    )
+    # Normalize noise to [0, 1] then scale to height_limit.
+    normalized_noise = (base_noise + 1) / 2
+    y = (normalized_noise **5 ) * height_limit
+    return y
+
+
+def terrain_heights(xs, zs, seed: int, scale: float, height_limit: float) -> np.ndarray:
+    """
+    Vectorized terrain_height: compute the height of every (x, z) pair in one call
+    using the NumPy Perlin backend. Results match terrain_height exactly.
+    
+    :param xs: Array of world x coordinates.
+    :param zs: Array of world z coordinates, broadcastable with xs.
+    :return: A float32 array of heights.
+    """
+    # Scale in double precision then round to float32, the same as passing Python floats to the C extension.
+    sample_x = (np.asarray(xs, dtype=np.float64) * scale).astype(np.float32)
+    sample_z = (np.asarray(zs, dtype=np.float64) * scale).astype(np.float32)
+    base_noise = Noise.pnoise2(
+        sample_x,
+        sample_z,
+        octaves=4,
+        persistence=0.5,
+        lacunarity=2.0,
+        repeatx=1024,
+        repeaty=1024,
+        base=seed
+    ).astype(np.float64)
+    # Normalize noise to [0, 1] then scale to height_limit.
+    normalized_noise = (base_noise + 1) / 2
+    return ((normalized_noise ** 5) * height_limit).astype(np.float32)
+
+
+def height_to_color(height: float, height_limit: float):
+    """
+    Determine a color based on the height value.
+    
+    :param height: The y value or height.
+    :param height_limit: Maximum height of the terrain.
+    :return: A tuple (r, g, b) with values in the range [0, 1].
+    """
+    normalized = height / height_limit
+    r, g, b = colorsys.hsv_to_rgb(normalized, 1, 1)
+    return (r, g, b)
+
+
+def generate_chunk_heights(chunk_x: int, chunk_z: int, chunk_width: int, seed: int, scale: float, height_limit: float, noise_backend: str = 'numpy') -> np.ndarray:
+    """
+    Compute the height grid for a chunk, including a one tile border
+    so walls can be generated against neighboring chunks.
+    The tile at index [1,1] corresponds to the first tile in the chunk.
+    
+    :param noise_backend: 'numpy' to evaluate the whole grid in one vectorized call,
+                          or 'c' to call the noise C extension once per tile.
+    :return: A (chunk_width + 2, chunk_width + 2) float32 array.
+    """
+    grid_size = chunk_width + 2
+    start_x = chunk_x * chunk_width
+    start_z = chunk_z * chunk_width
+
+    if noise_backend == 'numpy':
+        # Row i is world x = start_x + (i - 1), column j is world z = start_z + (j - 1)
+        offsets = np.arange(-1, grid_size - 1)
+        return terrain_heights((start_x + offsets)[:, None], (start_z + offsets)[None, :], seed, scale, height_limit)
+    if noise_backend != 'c':
+        raise ValueError(f"Unknown noise backend: {noise_backend}")
+
+    heights = np.zeros((grid_size, grid_size), dtype=np.float32)
+    for i in range(grid_size):
+        for j in range(grid_size):
+            # Compute world coordinates
+            world_x = start_x + (i - 1)
+            world_z = start_z + (j - 1)
+            heights[i, j] = terrain_height(world_x, world_z, seed, scale, height_limit)
+    return heights
+
+
+def generate_chunk_heights_batch(coords, chunk_width: int, seed: int, scale: float, height_limit: float) -> np.ndarray:
+    """
+    Compute the height grids of many chunks in one vectorized noise call.
+    Each grid matches generate_chunk_heights for the same chunk.
+    
+    :param coords: A sequence of (chunk_x, chunk_z) coordinates.
+    :return: A (len(coords), chunk_width + 2, chunk_width + 2) float32 array.
+    """
+    coords = np.asarray(coords, dtype=np.int64).reshape(-1, 2)
+    offsets = np.arange(-1, chunk_width + 1)
+    xs = (coords[:, 0] * chunk_width)[:, None, None] + offsets[None, :, None]
+    zs = (coords[:, 1] * chunk_width)[:, None, None] + offsets[None, None, :]
+    return terrain_heights(xs, zs, seed, scale, height_limit)
+
+
+def build_chunk_mesh(heights: np.ndarray, chunk_x: int, chunk_z: int, chunk_width: int, height_limit: float):
+    """
+    Build the vertex data for a chunk from its height grid.
+    The data is interleaved as [x, y, z, r, g, b] per vertex.
+    In addition to the top faces of each tile, vertical walls are generated
+    to connect a tile's top to its lower neighbor.
+    
+    :param heights: The chunk's height grid from generate_chunk_heights.
+    :return: A tuple (vertex_array, vertex_count)
+    """
+    start_x = chunk_x * chunk_width
+    start_z = chunk_z * chunk_width
+
+    vertices = []  # Holds vertex (x,y,z) and color (r,g,b)
+
+    # Loop over each actual tile in the chunk.
+    for i in range(1, chunk_width+1):
+        for j in range(1, chunk_width+1):
+            tile_height = heights[i, j]
+            # World position of the tile's bottom-left corner.
+            world_x = start_x + (i - 1)
+            world_z = start_z + (j - 1)
+            # Get top-face color.
+            top_color = height_to_color(tile_height, height_limit)
+            
+            # Top face triangles
+            p1 = (world_x,       tile_height, world_z)
+            p2 = (world_x + 1,   tile_height, world_z)
+            p3 = (world_x + 1,   tile_height, world_z + 1)
+            p4 = (world_x,       tile_height, world_z + 1)
+            # Triangle 1: p1, p2, p3
+            vertices.extend(p1 + top_color)
+            vertices.extend(p2 + top_color)
+            vertices.extend(p3 + top_color)
+            # Triangle 2: p1, p3, p4
+            vertices.extend(p1 + top_color)
+            vertices.extend(p3 + top_color)
+            vertices.extend(p4 + top_color)
+
+            # For each of the four sides, check the neighbor height.
+            # Generate a wall if tile is higher than neighbor.
+            # Define neighbor offsets and corresponding edge vertex positions.
+            # (di, dj, (local top edge start), (local top edge end))
+            # Local coordinates: (0,0) is bottom-left of the tile; (1,1) is top-right.
+            sides = [
+                (0, 1,  ((0, 1), (1, 1))),  # North edge: top edge (p4 to p3)
+                (0, -1, ((0, 0), (1, 0))),  # South edge: bottom edge (p1 to p2)
+                (1, 0,  ((1, 0), (1, 1))),  # East edge: right edge (p2 to p3)
+                (-1, 0, ((0, 0), (0, 1)))   # West edge: left edge (p1 to p4)
+            ]
+            for di, dj, ((lx0, lz0), (lx1, lz1)) in sides:
+                neighbor_height = heights[i + di, j + dj]
+                # Only create a wall if there's a gap.
+                if tile_height > neighbor_height:
+                    # For wall color, darken the tile's top color.
+                    wall_color = tuple(c * 0.7 for c in top_color)
+                    # Compute the two top edge vertices in world space.
+                    # For a tile, local x and z positions: add to world_x and world_z.
+                    top_edge_start = (world_x + lx0, tile_height, world_z + lz0)
+                    top_edge_end   = (world_x + lx1, tile_height, world_z + lz1)
+                    # The bottom edge corresponds to the neighbor's height.
+                    bottom_edge_start = (world_x + lx0, neighbor_height, world_z + lz0)
+                    bottom_edge_end   = (world_x + lx1, neighbor_height, world_z + lz1)
+                    # Create two triangles for the vertical quad.
+                    # Triangle 1: top_edge_start, bottom_edge_start, bottom_edge_end
+                    vertices.extend(top_edge_start + wall_color)
+                    vertices.extend(bottom_edge_start + wall_color)
+                    vertices.extend(bottom_edge_end + wall_color)
+                    # Triangle 2: top_edge_start, bottom_edge_end, top_edge_end
+                    vertices.extend(top_edge_start + wall_color)
+                    vertices.extend(bottom_edge_end + wall_color)
+                    vertices.extend(top_edge_end + wall_color)
+
+    vertex_array = np.array(vertices, dtype=np.float32)
+    vertex_count = len(vertex_array) // 6  # 6 floats per vertex.
+    return vertex_array, vertex_count
+
 
 class MeshMap:
-    def __init__(self, chunk_width: int, render_distance: int, chunks_per_update: int, seed: int, scale: float, height_limit: int, initial_target: tuple = None):
+    def __init__(self, chunk_width: int, render_distance: int, generation_threads: int, seed: int, scale: float, height_limit: int, initial_target: tuple = None, world_file: str = None, noise_backend: str = 'numpy', upload_budget: int = 256 * 1024):
         """
         Initialize the MeshMap.
 
         :param chunk_width: Number of tiles per chunk side.
         :param render_distance: Number of chunks to render in each direction from the target.
-        :param chunks_per_update: Maximum number of chunks to complete (and create VBOs for) per update.
+        :param generation_threads: Number of worker threads generating chunks in the background.
         :param seed: Seed for the noise generator.
         :param scale: Scale for noise generation.
         :param height_limit: Maximum height of the generated terrain.
+        :param world_file: Optional world file from WorldBaker. Chunks baked into it are
+                           read from the memory-mapped file instead of generated.
+        :param noise_backend: 'numpy' for vectorized chunk and batch height generation,
+                              or 'c' to call the noise C extension point by point.
+        :param upload_budget: Maximum bytes of vertex data uploaded to the GPU per update.
+                              Chunks bigger than what's left are uploaded in pieces over several updates.
         """
         self.__chunk_width = chunk_width
         self.__render_distance = render_distance
-        self.__chunks_per_update = chunks_per_update
         self.__seed = seed
         self.__scale = scale
         self.__height_limit = height_limit
+        self.__noise_backend = noise_backend
+        self.__upload_budget = upload_budget
+
+        # Pregenerated chunks, memory-mapped so only the pages actually drawn get read.
+        self.__world = None
+        if world_file is not None:
+            self.__world = WorldFile(world_file)
+            if not self.__world.matches(chunk_width, seed, scale, height_limit):
+                raise ValueError(f"{world_file} was baked with different terrain settings")
 
         # Dictionary to store generated chunks. Each key is a (chunk_x, chunk_z) tuple.
         self.__chunks = {}
         # Dictionary to store futures for chunks currently being generated.
         self.__chunk_futures = {}
         # Thread pool executor for async chunk data generation.
-        self.__executor = concurrent.futures.ThreadPoolExecutor(max_workers=chunks_per_update)
+        self.__executor = concurrent.futures.ThreadPoolExecutor(max_workers=generation_threads)
+        # Finished chunks waiting for (or part way through) their upload.
+        self.__uploads = collections.OrderedDict()
+        # Chunk the target was last in, so uploads nearest the player go first.
+        self.__target_chunk = None
+        # Seconds from a chunk's data being ready to its VBO being fully uploaded, for the most recent chunks.
+        self.__upload_latencies = collections.deque(maxlen=256)
+        # Timings for the most recent update() call, in seconds.
+        # chunk_generation is worker time spent on the chunks that were staged this update.
+        self.frame_stats = {'chunk_generation': 0.0, 'vbo_upload': 0.0, 'chunks_uploaded': 0, 'bytes_uploaded': 0}
+        # Height queries for the player, camera and enemies, answered from the chunks' height grids.
+        self.terrain = TerrainQuery(chunk_width, self.__chunk_heights)
 
         if initial_target is not None:
             self.__preload_initial(initial_target)
@@ -58,148 +276,191 @@ class MeshMap:
             for dz in range(-initial_distance, initial_distance + 1):
                 required_chunks.add((current_chunk_x + dx, current_chunk_z + dz))
         # Schedule tasks for any required chunk not yet generated.
-        for coord in required_chunks:
-            if coord not in self.__chunks and coord not in self.__chunk_futures:
-                self.__chunk_futures[coord] = self.__executor.submit(
-                    self.__generate_chunk_data, coord[0], coord[1]
-                )
+        missing = [coord for coord in required_chunks
+                   if coord not in self.__chunks and coord not in self.__chunk_futures and coord not in self.__uploads]
+        # With the NumPy backend every missing chunk's heights come from one batched noise call.
+        batched_heights = {}
+        if self.__noise_backend == 'numpy':
+            to_generate = [coord for coord in missing if self.__world is None or not self.__world.has_chunk(coord)]
+            if to_generate:
+                batched_heights = dict(zip(to_generate, generate_chunk_heights_batch(
+                    to_generate, self.__chunk_width, self.__seed, self.__scale, self.__height_limit
+                )))
+                for coord, heights in batched_heights.items():
+                    self.terrain.add_chunk(coord, heights)
+        for coord in missing:
+            self.__chunk_futures[coord] = self.__executor.submit(
+                self.__timed_generate_chunk_data, coord[0], coord[1], batched_heights.get(coord)
+            )
         # Wait for all tasks to complete.
         concurrent.futures.wait(list(self.__chunk_futures.values()))
-        # Process all completed futures without breaking.
+        # Stage and upload everything now, with no byte budget.
         for coord, future in list(self.__chunk_futures.items()):
-            try:
-                vertex_array, vertex_count = future.result()
-                vbo = self.__create_vbo(vertex_array)
-                self.__chunks[coord] = {
-                    'vertices': vertex_array,
-                    'vbo': vbo,
-                    'vertex_count': vertex_count
-                }
-            except Exception as e:
-                print(f"Error preloading chunk {coord}: {e}")
-            del self.__chunk_futures[coord]
+            self.__stage(coord, future)
+        self.__process_uploads(None)
     
-    def __generate_chunk_data(self, chunk_x: int, chunk_z: int):
+    def __timed_generate_chunk_data(self, chunk_x: int, chunk_z: int, heights: np.ndarray = None):
+        """
+        Run __generate_chunk_data and measure how long it took on the worker thread.
+        
+        :return: A tuple (vertex_array, vertex_count, heights, seconds, finished_at)
+        """
+        start = time.perf_counter()
+        vertex_array, vertex_count, heights = self.__generate_chunk_data(chunk_x, chunk_z, heights)
+        finished_at = time.perf_counter()
+        return vertex_array, vertex_count, heights, finished_at - start, finished_at
+
+    def __generate_chunk_data(self, chunk_x: int, chunk_z: int, heights: np.ndarray = None):
         """
         Generate the vertex data for a chunk (without creating the VBO).
-        The data is interleaved as [x, y, z, r, g, b] per vertex.
-        In addition to the top faces of each tile, vertical walls are generated
-        to connect a tile's top to its lower neighbor.
         This function is executed asynchronously.
         
         :param chunk_x: Chunk coordinate in x.
         :param chunk_z: Chunk coordinate in z.
-        :return: A tuple (vertex_array, vertex_count)
+        :param heights: The chunk's height grid, if it was already computed in a batch.
+        :return: A tuple (vertex_array, vertex_count, heights)
         """
-        grid_size = self.__chunk_width + 2
-        heights = np.zeros((grid_size, grid_size), dtype=np.float32)
+        if self.__world is not None and self.__world.has_chunk((chunk_x, chunk_z)):
+            vertex_array = self.__world.vertices((chunk_x, chunk_z))
+            return vertex_array, len(vertex_array) // 6, self.__world.heights((chunk_x, chunk_z))
+        if heights is None:
+            heights = generate_chunk_heights(chunk_x, chunk_z, self.__chunk_width, self.__seed, self.__scale, self.__height_limit, self.__noise_backend)
+        vertex_array, vertex_count = build_chunk_mesh(heights, chunk_x, chunk_z, self.__chunk_width, self.__height_limit)
+        return vertex_array, vertex_count, heights
+
+    def __chunk_heights(self, coords):
+        """
+        Height grids for chunks the terrain queries reach before the map has generated them.
         
-        # Compute heights for grid cells.
-        # The tile at index [1,1] corresponds to the first tile in the chunk.
-        start_x = chunk_x * self.__chunk_width
-        start_z = chunk_z * self.__chunk_width
+        :param coords: A list of (chunk_x, chunk_z) coordinates.
+        :return: A sequence of (chunk_width + 2) square height grids, one per coordinate.
+        """
+        if self.__world is not None and all(self.__world.has_chunk(coord) for coord in coords):
+            return [self.__world.heights(coord) for coord in coords]
+        if self.__noise_backend == 'numpy':
+            return generate_chunk_heights_batch(coords, self.__chunk_width, self.__seed, self.__scale, self.__height_limit)
+        return [generate_chunk_heights(x, z, self.__chunk_width, self.__seed, self.__scale, self.__height_limit, self.__noise_backend) for x, z in coords]
+
+    def __stage(self, coord: tuple, future):
+        """
+        Move a finished generation task into the upload queue.
         
-        for i in range(grid_size):
-            for j in range(grid_size):
-                # Compute world coordinates
-                world_x = start_x + (i - 1)
-                world_z = start_z + (j - 1)
-                heights[i, j] = self.get_tile_height((world_x, world_z))
-
-        vertices = []  # Holds vertex (x,y,z) and color (r,g,b)
-
-        # Loop over each actual tile in the chunk.
-        for i in range(1, self.__chunk_width+1):
-            for j in range(1, self.__chunk_width+1):
-                tile_height = heights[i, j]
-                # World position of the tile's bottom-left corner.
-                world_x = start_x + (i - 1)
-                world_z = start_z + (j - 1)
-                # Get top-face color.
-                top_color = self.__get_color(tile_height)
-                
-                # Top face triangles
-                p1 = (world_x,       tile_height, world_z)
-                p2 = (world_x + 1,   tile_height, world_z)
-                p3 = (world_x + 1,   tile_height, world_z + 1)
-                p4 = (world_x,       tile_height, world_z + 1)
-                # Triangle 1: p1, p2, p3
-                vertices.extend(p1 + top_color)
-                vertices.extend(p2 + top_color)
-                vertices.extend(p3 + top_color)
-                # Triangle 2: p1, p3, p4
-                vertices.extend(p1 + top_color)
-                vertices.extend(p3 + top_color)
-                vertices.extend(p4 + top_color)
-
-                # For each of the four sides, check the neighbor height.
-                # Generate a wall if tile is higher than neighbor.
-                # Define neighbor offsets and corresponding edge vertex positions.
-                # (di, dj, (local top edge start), (local top edge end))
-                # Local coordinates: (0,0) is bottom-left of the tile; (1,1) is top-right.
-                sides = [
-                    (0, 1,  ((0, 1), (1, 1))),  # North edge: top edge (p4 to p3)
-                    (0, -1, ((0, 0), (1, 0))),  # South edge: bottom edge (p1 to p2)
-                    (1, 0,  ((1, 0), (1, 1))),  # East edge: right edge (p2 to p3)
-                    (-1, 0, ((0, 0), (0, 1)))   # West edge: left edge (p1 to p4)
-                ]
-                for di, dj, ((lx0, lz0), (lx1, lz1)) in sides:
-                    neighbor_height = heights[i + di, j + dj]
-                    # Only create a wall if there's a gap.
-                    if tile_height > neighbor_height:
-                        # For wall color, darken the tile's top color.
-                        wall_color = tuple(c * 0.7 for c in top_color)
-                        # Compute the two top edge vertices in world space.
-                        # For a tile, local x and z positions: add to world_x and world_z.
-                        top_edge_start = (world_x + lx0, tile_height, world_z + lz0)
-                        top_edge_end   = (world_x + lx1, tile_height, world_z + lz1)
-                        # The bottom edge corresponds to the neighbor's height.
-                        bottom_edge_start = (world_x + lx0, neighbor_height, world_z + lz0)
-                        bottom_edge_end   = (world_x + lx1, neighbor_height, world_z + lz1)
-                        # Create two triangles for the vertical quad.
-                        # Triangle 1: top_edge_start, bottom_edge_start, bottom_edge_end
-                        vertices.extend(top_edge_start + wall_color)
-                        vertices.extend(bottom_edge_start + wall_color)
-                        vertices.extend(bottom_edge_end + wall_color)
-                        # Triangle 2: top_edge_start, bottom_edge_end, top_edge_end
-                        vertices.extend(top_edge_start + wall_color)
-                        vertices.extend(bottom_edge_end + wall_color)
-                        vertices.extend(top_edge_end + wall_color)
-
-        vertex_array = np.array(vertices, dtype=np.float32)
-        vertex_count = len(vertex_array) // 6  # 6 floats per vertex.
-        return vertex_array, vertex_count
-
-    def __create_vbo(self, vertices: np.ndarray):
+        :param coord: The chunk coordinate.
+        :param future: The completed future from __timed_generate_chunk_data.
         """
-        Create an OpenGL VBO from vertex data.
+        try:
+            vertex_array, vertex_count, heights, generation_time, finished_at = future.result()
+            self.terrain.add_chunk(coord, heights)
+            self.__uploads[coord] = {
+                'vertices': vertex_array,
+                'bytes': vertex_array.view(np.uint8),
+                'vertex_count': vertex_count,
+                'vbo': None,
+                'uploaded': 0,
+                'ready_at': finished_at
+            }
+            self.frame_stats['chunk_generation'] += generation_time
+        except Exception as e:
+            print(f"Error generating chunk {coord}: {e}")
+        del self.__chunk_futures[coord]
+
+    def __process_uploads(self, budget):
+        """
+        Upload queued chunks, nearest the target chunk first, until the byte budget is spent.
+        Each chunk's buffer store is allocated once with no data, then filled with
+        glBufferSubData, so a large chunk can be spread over several updates and
+        nothing waits on the driver copying a whole chunk at once.
+        A chunk only becomes drawable once all of its bytes are uploaded.
         This must run on the main thread.
         
-        :param vertices: A numpy array of interleaved vertex and color data.
-        :return: The VBO id.
+        :param budget: Maximum bytes to upload, or None for no limit.
         """
-        vbo = glGenBuffers(1)
-        glBindBuffer(GL_ARRAY_BUFFER, vbo)
-        glBufferData(GL_ARRAY_BUFFER, vertices.nbytes, vertices, GL_STATIC_DRAW)
+        start = time.perf_counter()
+        spent = 0
+        while self.__uploads and (budget is None or spent < budget):
+            coord = self.__next_upload()
+            job = self.__uploads[coord]
+            data = job['bytes']
+            if job['vbo'] is None:
+                job['vbo'] = glGenBuffers(1)
+                glBindBuffer(GL_ARRAY_BUFFER, job['vbo'])
+                glBufferData(GL_ARRAY_BUFFER, data.nbytes, None, GL_STATIC_DRAW)
+            else:
+                glBindBuffer(GL_ARRAY_BUFFER, job['vbo'])
+
+            size = data.nbytes - job['uploaded']
+            if budget is not None:
+                size = min(size, budget - spent)
+            if size > 0:
+                glBufferSubData(GL_ARRAY_BUFFER, job['uploaded'], size, data[job['uploaded']:job['uploaded'] + size])
+                job['uploaded'] += size
+                spent += size
+
+            if job['uploaded'] >= data.nbytes:
+                self.__chunks[coord] = {
+                    'vertices': job['vertices'],
+                    'vbo': job['vbo'],
+                    'vertex_count': job['vertex_count']
+                }
+                del self.__uploads[coord]
+                self.__upload_latencies.append(time.perf_counter() - job['ready_at'])
+                self.frame_stats['chunks_uploaded'] += 1
         glBindBuffer(GL_ARRAY_BUFFER, 0)
-        return vbo
+        self.frame_stats['bytes_uploaded'] += spent
+        self.frame_stats['vbo_upload'] += time.perf_counter() - start
+
+    def __next_upload(self) -> tuple:
+        """
+        Pick the queued chunk to upload next: the nearest to the target chunk,
+        and of equally near ones, one already part way through, then the oldest.
+        
+        :return: The chunk coordinate.
+        """
+        if self.__target_chunk is None:
+            return next(iter(self.__uploads))
+        target_x, target_z = self.__target_chunk
+        return min(
+            self.__uploads,
+            key=lambda coord: ((coord[0] - target_x) ** 2 + (coord[1] - target_z) ** 2, self.__uploads[coord]['uploaded'] == 0)
+        )
+
+    def __drop_unneeded(self, required_chunks: set):
+        """
+        Forget queued uploads and pending generation for chunks that left the render range,
+        so the byte budget and worker threads go to the chunks around the target.
+        
+        :param required_chunks: Chunk coordinates within the render distance.
+        """
+        for coord in [coord for coord in self.__uploads if coord not in required_chunks]:
+            job = self.__uploads.pop(coord)
+            if job['vbo'] is not None:
+                glDeleteBuffers(1, [job['vbo']])
+        for coord in [coord for coord in self.__chunk_futures if coord not in required_chunks]:
+            # A task already running can't be cancelled; its result is thrown away once it's done.
+            self.__chunk_futures[coord].cancel()
+            if self.__chunk_futures[coord].cancelled():
+                del self.__chunk_futures[coord]
 
-    def __get_color(self, height: float):
+    def upload_stats(self) -> dict:
         """
-        Determine a color based on the height value.
+        Report the state of the upload pipeline.
         
-        :param height: The y value or height.
-        :return: A tuple (r, g, b) with values in the range [0, 1].
+        :return: Queue depth and upload latency percentiles (milliseconds) over recent chunks.
         """
-        normalized = height / self.__height_limit
-        r, g, b = colorsys.hsv_to_rgb(normalized, 1, 1)
-        return (r, g, b)
-     
+        latencies = np.array(self.__upload_latencies, dtype=np.float64) * 1000.0
+        return {
+            'queued_chunks': len(self.__uploads),
+            'queued_bytes': int(sum(job['bytes'].nbytes - job['uploaded'] for job in self.__uploads.values())),
+            'latency_p50_ms': float(np.percentile(latencies, 50)) if len(latencies) else 0.0,
+            'latency_p95_ms': float(np.percentile(latencies, 95)) if len(latencies) else 0.0,
+            'latency_max_ms': float(latencies.max()) if len(latencies) else 0.0
+        }
+
     def update(self, target):
         """
         Update the map given a target position. This method ensures that
         all chunks within the render distance are generated (or queued for generation)
-        and processes a limited number of completed asynchronous tasks per update cycle.
+        and uploads finished chunks to the GPU within the per-update byte budget.
         
         :param target: An (x, z) iterable indicating the center position.
         """
@@ -213,31 +474,28 @@ class MeshMap:
             for dz in range(-self.__render_distance, self.__render_distance + 1):
                 chunk_coord = (current_chunk_x + dx, current_chunk_z + dz)
                 required_chunks.add(chunk_coord)
-                if chunk_coord not in self.__chunks and chunk_coord not in self.__chunk_futures:
+                if chunk_coord not in self.__chunks and chunk_coord not in self.__chunk_futures and chunk_coord not in self.__uploads:
                     # Queue async gen of chunk data.
                     self.__chunk_futures[chunk_coord] = self.__executor.submit(
-                        self.__generate_chunk_data, chunk_coord[0], chunk_coord[1]
+                        self.__timed_generate_chunk_data, chunk_coord[0], chunk_coord[1]
                     )
 
-        # Process a limited number of async tasks.
-        processed = 0
+        if self.__target_chunk != (current_chunk_x, current_chunk_z):
+            # Keep heights over the preloaded area (twice the render distance), so crossing back and forth
+            # over a chunk border doesn't regenerate them.
+            self.terrain.drop_far((current_chunk_x, current_chunk_z), self.__render_distance * 2)
+        self.__target_chunk = (current_chunk_x, current_chunk_z)
+        self.__drop_unneeded(required_chunks)
+
+        # Stage every finished task still in range, then upload within this update's byte budget.
+        self.frame_stats = {'chunk_generation': 0.0, 'vbo_upload': 0.0, 'chunks_uploaded': 0, 'bytes_uploaded': 0}
         for coord, future in list(self.__chunk_futures.items()):
-            if processed >= self.__chunks_per_update:
-                break
             if future.done():
-                try:
-                    vertex_array, vertex_count = future.result()
-                    # Create the VBO on the main thread.
-                    vbo = self.__create_vbo(vertex_array)
-                    self.__chunks[coord] = {
-                        'vertices': vertex_array,
-                        'vbo': vbo,
-                        'vertex_count': vertex_count
-                    }
-                except Exception as e:
-                    print(f"Error generating chunk {coord}: {e}")
-                del self.__chunk_futures[coord]
-                processed += 1
+                if coord in required_chunks:
+                    self.__stage(coord, future)
+                else:
+                    del self.__chunk_futures[coord]
+        self.__process_uploads(self.__upload_budget)
 
     def render(self, target):
         """
@@ -281,6 +539,10 @@ class MeshMap:
         for chunk in self.__chunks.values():
             glDeleteBuffers(1, [chunk['vbo']])
         self.__chunks.clear()
+        for job in self.__uploads.values():
+            if job['vbo'] is not None:
+                glDeleteBuffers(1, [job['vbo']])
+        self.__uploads.clear()
         for future in self.__chunk_futures.values():
             future.cancel()
         self.__chunk_futures.clear()
@@ -288,25 +550,32 @@ class MeshMap:
     def get_tile_height(self, pos: tuple) -> float:
         """
         Public method: Given a tuple (x, z), compute and return the height of the tile at that position.
+        This evaluates the noise directly; gameplay queries go through self.terrain instead.
         
         :param pos: A tuple (x, z) representing world coordinates.
         :return: The height at that tile, based on noise generation.
         """
         x, z = pos
-        base_noise = noise.pnoise2(
-            x * self.__scale,
-            z * self.__scale,
-            octaves=4,
-            persistence=0.5,
-            lacunarity=2.0,
-            repeatx=1024,
-            repeaty=1024,
-            base=self.__seed
+        return terrain_height(x, z, self.__seed, self.__scale, self.__height_limit)
+
+    def get_tile_heights(self, xs, zs) -> np.ndarray:
+        """
+        Public method: Batched version of get_tile_height for many positions at once.
+        
+        :param xs: An array of world x coordinates.
+        :param zs: An array of world z coordinates, the same shape as xs.
+        :return: A float32 array of heights with the same shape as xs.
+        """
+        if self.__noise_backend == 'numpy':
+            return terrain_heights(xs, zs, self.__seed, self.__scale, self.__height_limit)
+        xs = np.asarray(xs, dtype=np.float32)
+        zs = np.asarray(zs, dtype=np.float32)
+        heights = np.fromiter(
+            (self.get_tile_height((x, z)) for x, z in zip(xs.ravel(), zs.ravel())),
+            dtype=np.float32,
+            count=xs.size
         )
-        # Normalize noise to [0, 1] then scale to height_limit.
-        normalized_noise = (base_noise + 1) / 2
-        y = (normalized_noise **5 ) * self.__height_limit
-        return y
+        return heights.reshape(xs.shape)
 
 
 
@@ -347,7 +616,7 @@ if __name__ == '__main__':
     # Create an instance of MeshMap.
     max_height = 1000
     rendering = 30
-    mesh_map = MeshMap(chunk_width=16, render_distance=rendering, chunks_per_update=6, seed=42, scale=0.005, height_limit=max_height, initial_target=(0, 0))
+    mesh_map = MeshMap(chunk_width=16, render_distance=rendering, generation_threads=6, seed=42, scale=0.005, height_limit=max_height, initial_target=(0, 0))
 
     # Starting target position (x, z). We'll update this with arrow keys.
     target = [0.0, 0.0]
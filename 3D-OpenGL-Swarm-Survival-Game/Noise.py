@@ -0,0 +1,126 @@
+import numpy as np
+
+
+# Ken Perlin's reference permutation, doubled so lookups don't need to wrap.
+_PERMUTATION = (151,160,137,91,90,15,
+    131,13,201,95,96,53,194,233,7,225,140,36,103,30,69,142,8,99,37,240,21,10,23,
+    190,6,148,247,120,234,75,0,26,197,62,94,252,219,203,117,35,11,32,57,177,33,
+    88,237,149,56,87,174,20,125,136,171,168,68,175,74,165,71,134,139,48,27,166,
+    77,146,158,231,83,111,229,122,60,211,133,230,220,105,92,41,55,46,245,40,244,
+    102,143,54,65,25,63,161,1,216,80,73,209,76,132,187,208,89,18,169,200,196,
+    135,130,116,188,159,86,164,100,109,198,173,186,3,64,52,217,226,250,124,123,
+    5,202,38,147,118,126,255,82,85,212,207,206,59,227,47,16,58,17,182,189,28,42,
+    223,183,170,213,119,248,152,2,44,154,163,70,221,153,101,155,167,43,172,9,
+    129,22,39,253,19,98,108,110,79,113,224,232,178,185,112,104,218,246,97,228,
+    251,34,242,193,238,210,144,12,191,179,162,241, 81,51,145,235,249,14,239,107,
+    49,192,214,31,181,199,106,157,184,84,204,176,115,121,50,45,127,4,150,254,
+    138,236,205,93,222,114,67,29,24,72,243,141,128,195,78,66,215,61,156,180)
+
+# 4D gradients from the noise library, in the order its C extension stores them.
+_GRAD4 = ((0,1,1,1), (0,1,1,-1), (0,1,-1,1), (0,1,-1,-1),
+    (0,-1,1,1), (0,-1,1,-1), (0,-1,-1,1), (0,-1,-1,-1),
+    (1,0,1,1), (1,0,1,-1), (1,0,-1,1), (1,0,-1,-1),
+    (-1,0,1,1), (-1,0,1,-1), (-1,0,-1,1), (-1,0,-1,-1),
+    (1,1,0,1), (1,1,0,-1), (1,-1,0,1), (1,-1,0,-1),
+    (-1,1,0,1), (-1,1,0,-1), (-1,-1,0,1), (-1,-1,0,-1),
+    (1,1,1,0), (1,1,-1,0), (1,-1,1,0), (1,-1,-1,0),
+    (-1,1,1,0), (-1,1,-1,0), (-1,-1,1,0), (-1,-1,-1,0))
+
+# With base > 0, noise.pnoise2 indexes up to 255 + 2 * base into its 512 entry
+# permutation table, reading on into the 4D gradient table stored right after it.
+# Appending those same bytes makes this implementation agree for any base up to 255.
+_PERM = np.concatenate((
+    np.array(_PERMUTATION * 2, dtype=np.uint8),
+    np.frombuffer(np.array(_GRAD4, dtype='<f4').tobytes(), dtype=np.uint8)
+)).astype(np.int32)
+
+# 2D noise uses the first two components of these 3D gradients.
+_GRAD3 = np.array((
+    (1,1,0),(-1,1,0),(1,-1,0),(-1,-1,0),
+    (1,0,1),(-1,0,1),(1,0,-1),(-1,0,-1),
+    (0,1,1),(0,-1,1),(0,1,-1),(0,-1,-1),
+    (1,0,-1),(-1,0,-1),(0,-1,1),(0,1,1)), dtype=np.float32)
+
+
+def _grad2(hash_value: np.ndarray, x: np.ndarray, y: np.ndarray) -> np.ndarray:
+    h = hash_value & 15
+    return x * _GRAD3[h, 0] + y * _GRAD3[h, 1]
+
+
+def _lerp(t, a, b):
+    return a + t * (b - a)
+
+
+def _noise2(x: np.ndarray, y: np.ndarray, repeatx: np.float32, repeaty: np.float32, base: int) -> np.ndarray:
+    """One octave of 2D Perlin noise over float32 arrays, step for step like the C extension."""
+    i = np.floor(np.fmod(x, repeatx)).astype(np.int32)
+    j = np.floor(np.fmod(y, repeaty)).astype(np.int32)
+    ii = np.fmod((i + 1).astype(np.float32), repeatx).astype(np.int32)
+    jj = np.fmod((j + 1).astype(np.float32), repeaty).astype(np.int32)
+    i = (i & 255) + base
+    j = (j & 255) + base
+    ii = (ii & 255) + base
+    jj = (jj & 255) + base
+
+    x = x - np.floor(x)
+    y = y - np.floor(y)
+    fx = x * x * x * (x * (x * np.float32(6) - np.float32(15)) + np.float32(10))
+    fy = y * y * y * (y * (y * np.float32(6) - np.float32(15)) + np.float32(10))
+
+    A = _PERM[i]
+    AA = _PERM[A + j]
+    AB = _PERM[A + jj]
+    B = _PERM[ii]
+    BA = _PERM[B + j]
+    BB = _PERM[B + jj]
+
+    one = np.float32(1)
+    return _lerp(fy, _lerp(fx, _grad2(_PERM[AA], x, y),
+                               _grad2(_PERM[BA], x - one, y)),
+                     _lerp(fx, _grad2(_PERM[AB], x, y - one),
+                               _grad2(_PERM[BB], x - one, y - one)))
+
+
+def pnoise2(x, y, octaves: int = 1, persistence: float = 0.5, lacunarity: float = 2.0,
+            repeatx: float = 1024, repeaty: float = 1024, base: int = 0) -> np.ndarray:
+    """
+    Vectorized drop-in for noise.pnoise2: fractal (fBm) 2D Perlin noise
+    evaluated for every point of x and y in one call.
+
+    :param x: Array of x coordinates (anything broadcastable with y).
+    :param y: Array of y coordinates.
+    :param octaves: Number of noise layers summed together.
+    :param persistence: Amplitude multiplier per octave.
+    :param lacunarity: Frequency multiplier per octave.
+    :param repeatx: Period of the noise in x.
+    :param repeaty: Period of the noise in y.
+    :param base: Offset into the permutation table, used as a seed (0 to 255).
+    :return: A float32 array of noise values in about [-1, 1].
+    """
+    if not 0 <= base <= 255:
+        raise ValueError("base must be between 0 and 255")
+    x, y = np.broadcast_arrays(np.asarray(x, dtype=np.float32), np.asarray(y, dtype=np.float32))
+    if octaves == 1:
+        return _noise2(x, y, np.float32(repeatx), np.float32(repeaty), base)
+
+    # Evaluate every octave in one vectorized pass over an (octaves, ...) stack
+    freq = np.float32(1)
+    amp = np.float32(1)
+    freqs = []
+    amps = []
+    for _ in range(octaves):
+        freqs.append(freq)
+        amps.append(amp)
+        freq *= np.float32(lacunarity)
+        amp *= np.float32(persistence)
+    freqs = np.array(freqs, dtype=np.float32).reshape((octaves,) + (1,) * x.ndim)
+    layers = _noise2(x[None] * freqs, y[None] * freqs, np.float32(repeatx) * freqs, np.float32(repeaty) * freqs, base)
+
+    # The C extension accumulates octave by octave in float32, so this does too.
+    total = np.zeros(x.shape, dtype=np.float32)
+    max_amp = np.float32(0)
+    for layer, amp in zip(layers, amps):
+        total += layer * amp
+        max_amp += amp
+    return total / max_amp
+
@@ -0,0 +1,191 @@
+import contextlib
+import json
+import time
+
+import numpy as np
+from OpenGL.GL import *
+
+
+class _Scope:
+    __slots__ = ('profiler', 'name_id', 'start')
+
+    def __init__(self, profiler, name_id):
+        self.profiler = profiler
+        self.name_id = name_id
+        self.start = 0
+
+    def __enter__(self):
+        self.start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, *exc):
+        self.profiler.record(self.name_id, self.start, time.perf_counter_ns() - self.start)
+        return False
+
+
+class FrameProfiler:
+    def __init__(self, enabled: bool = False, event_capacity: int = 65536, frame_capacity: int = 600):
+        """
+        Initialize the FrameProfiler.
+        Scoped timers write (name, start, duration, frame) rows into fixed-size ring buffers,
+        so memory stays constant no matter how long the game runs. When disabled, scope()
+        hands back one shared no-op context manager, so the timers can stay in the code.
+
+        :param enabled: Whether timers record anything.
+        :param event_capacity: Number of timed scopes kept before the oldest are overwritten.
+        :param frame_capacity: Number of whole-frame times kept for the overlay graph.
+        """
+        self.enabled = enabled
+        self.__null_scope = contextlib.nullcontext()
+
+        # Scope names are stored once and referenced by index in the ring buffer
+        self.__names = []
+        self.__name_ids = {}
+
+        self.__event_names = np.zeros(event_capacity, dtype=np.int32)
+        self.__event_starts = np.zeros(event_capacity, dtype=np.int64)
+        self.__event_durations = np.zeros(event_capacity, dtype=np.int64)
+        self.__event_frames = np.zeros(event_capacity, dtype=np.int64)
+        self.__event_count = 0  # total ever recorded; the write slot is count % capacity
+
+        self.__frame_times = np.zeros(frame_capacity, dtype=np.float32)  # milliseconds
+        self.__frame_count = 0
+        self.__frame_start = None
+        self.frame = 0
+
+        self.__origin = time.perf_counter_ns()
+
+    def __name_id(self, name: str) -> int:
+        name_id = self.__name_ids.get(name)
+        if name_id is None:
+            name_id = len(self.__names)
+            self.__names.append(name)
+            self.__name_ids[name] = name_id
+        return name_id
+
+    def scope(self, name: str):
+        """
+        Time a block of code.
+
+            with profiler.scope('MeshMap.update'):
+                mesh_map.update(target)
+        """
+        if not self.enabled:
+            return self.__null_scope
+        return _Scope(self, self.__name_id(name))
+
+    def record(self, name_id: int, start: int, duration: int):
+        """Write one timed scope (nanoseconds) into the ring buffer."""
+        slot = self.__event_count % len(self.__event_names)
+        self.__event_names[slot] = name_id
+        self.__event_starts[slot] = start
+        self.__event_durations[slot] = duration
+        self.__event_frames[slot] = self.frame
+        self.__event_count += 1
+
+    def begin_frame(self):
+        if self.enabled:
+            self.__frame_start = time.perf_counter_ns()
+
+    def end_frame(self):
+        if self.enabled and self.__frame_start is not None:
+            duration = time.perf_counter_ns() - self.__frame_start
+            self.record(self.__name_id('frame'), self.__frame_start, duration)
+            self.__frame_times[self.__frame_count % len(self.__frame_times)] = duration / 1e6
+            self.__frame_count += 1
+            self.__frame_start = None
+        self.frame += 1
+
+    def frame_times(self) -> np.ndarray:
+        """Return the buffered frame times in milliseconds, oldest first."""
+        capacity = len(self.__frame_times)
+        if self.__frame_count <= capacity:
+            return self.__frame_times[:self.__frame_count].copy()
+        split = self.__frame_count % capacity
+        return np.concatenate((self.__frame_times[split:], self.__frame_times[:split]))
+
+    def events(self) -> list:
+        """Return the buffered scopes, oldest first, as (name, start_ns, duration_ns, frame) tuples."""
+        capacity = len(self.__event_names)
+        count = min(self.__event_count, capacity)
+        first = self.__event_count - count
+        order = (np.arange(first, first + count) % capacity)
+        return [
+            (self.__names[self.__event_names[i]], int(self.__event_starts[i]), int(self.__event_durations[i]), int(self.__event_frames[i]))
+            for i in order
+        ]
+
+    def export_chrome_trace(self, path: str):
+        """
+        Write the buffered scopes as Chrome trace-event JSON, loadable in
+        chrome://tracing or Perfetto. Each scope becomes a complete ('X') event.
+
+        :param path: The file to write.
+        """
+        trace_events = [
+            {
+                "name": name,
+                "cat": "frame" if name == 'frame' else "scope",
+                "ph": "X",
+                "ts": (start - self.__origin) / 1000.0,  # microseconds
+                "dur": duration / 1000.0,
+                "pid": 0,
+                "tid": 0,
+                "args": {"frame": frame}
+            }
+            for name, start, duration, frame in self.events()
+        ]
+        with open(path, 'w') as file:
+            json.dump({"traceEvents": trace_events, "displayTimeUnit": "ms"}, file)
+
+    def render_overlay(self, display, budget_ms: float = 1000 / 60, height: int = 120):
+        """
+        Draw the recent frame times as a graph along the bottom of the screen,
+        with a reference line at the frame budget. Must run after the scene is drawn.
+
+        :param display: The (width, height) of the window in pixels.
+        :param budget_ms: Frame time drawn as the reference line.
+        :param height: Pixel height of the graph area. The budget line sits halfway up it.
+        """
+        if not self.enabled:
+            return
+        times = self.frame_times()
+        if len(times) < 2:
+            return
+        width = display[0]
+        scale = (height / 2) / budget_ms
+
+        graph = np.empty((len(times), 2), dtype=np.float32)
+        graph[:, 0] = np.linspace(0, width, len(times), dtype=np.float32)
+        graph[:, 1] = np.minimum(times * scale, height)
+        budget_line = np.array([(0, budget_ms * scale), (width, budget_ms * scale)], dtype=np.float32)
+
+        # Switch to pixel coordinates without disturbing the scene's matrices
+        glMatrixMode(GL_PROJECTION)
+        glPushMatrix()
+        glLoadIdentity()
+        glOrtho(0, display[0], 0, display[1], -1, 1)
+        glMatrixMode(GL_MODELVIEW)
+        glPushMatrix()
+        glLoadIdentity()
+        glDisable(GL_DEPTH_TEST)
+
+        glBindBuffer(GL_ARRAY_BUFFER, 0)
+        glEnableClientState(GL_VERTEX_ARRAY)
+        glColor3f(1.0, 0.0, 0.0)
+        glVertexPointer(2, GL_FLOAT, 0, budget_line)
+        glDrawArrays(GL_LINES, 0, 2)
+        glColor3f(1.0, 1.0, 1.0)
+        glVertexPointer(2, GL_FLOAT, 0, graph)
+        glDrawArrays(GL_LINE_STRIP, 0, len(graph))
+        glDisableClientState(GL_VERTEX_ARRAY)
+
+        glEnable(GL_DEPTH_TEST)
+        glPopMatrix()
+        glMatrixMode(GL_PROJECTION)
+        glPopMatrix()
+        glMatrixMode(GL_MODELVIEW)
+
+
+# Shared profiler used by the game loop. Off by default; main.py turns it on with --profile.
+PROFILER = FrameProfiler()
@@ -0,0 +1,231 @@
+import math
+import numpy as np
+
+
+class TerrainQuery:
+    """
+    Height, ray and collision queries answered from chunk height grids instead of noise.
+    Grids are packed into one (capacity, grid_size, grid_size) array, so a batch of
+    queries is a handful of array operations no matter how many points it holds.
+    One instance is shared by the player, the camera and every enemy.
+
+    Sampling modes:
+        'nearest'  - the height of the flat tile under the point, exactly as drawn.
+        'bilinear' - a smooth blend of the four tile heights around the point.
+    """
+    def __init__(self, chunk_width: int, generate, mode: str = 'nearest', capacity: int = 256):
+        """
+        Initialize the TerrainQuery.
+
+        :param chunk_width: Number of tiles per chunk side.
+        :param generate: Function taking a list of (chunk_x, chunk_z) coordinates and returning
+                         their (chunk_width + 2) square height grids, used for chunks that are
+                         queried before the map has produced them.
+        :param mode: Default sampling mode, 'nearest' or 'bilinear'.
+        :param capacity: Number of chunk grids to allocate room for up front.
+        """
+        if mode not in ('nearest', 'bilinear'):
+            raise ValueError(f"Unknown sampling mode: {mode}")
+        self.chunk_width = chunk_width
+        self.grid_size = chunk_width + 2
+        self.mode = mode
+        self.__generate = generate
+        self.__grids = np.zeros((max(capacity, 1), self.grid_size, self.grid_size), dtype=np.float32)
+        self.__slots = {}  # (chunk_x, chunk_z) -> row in __grids
+        self.__free = []   # rows of dropped chunks, reused before __grids grows
+
+    def __len__(self):
+        return len(self.__slots)
+
+    @property
+    def capacity(self) -> int:
+        """Number of chunk grids there is room for before the store has to grow."""
+        return len(self.__grids)
+
+    def has_chunk(self, coord: tuple) -> bool:
+        return coord in self.__slots
+
+    def add_chunk(self, coord: tuple, heights: np.ndarray):
+        """Store a chunk's height grid (with its one tile border). Chunks already stored are left alone."""
+        if coord in self.__slots:
+            return
+        if self.__free:
+            slot = self.__free.pop()
+        else:
+            # With no free rows, the rows in use are exactly 0 .. len(slots) - 1
+            slot = len(self.__slots)
+            if slot == len(self.__grids):
+                grown = np.zeros((len(self.__grids) * 2, self.grid_size, self.grid_size), dtype=np.float32)
+                grown[:slot] = self.__grids
+                self.__grids = grown
+        self.__grids[slot] = heights
+        self.__slots[coord] = slot
+
+    def drop_far(self, center: tuple, distance: int):
+        """
+        Forget the grids of chunks more than distance chunks from center along either axis,
+        so the store stays the size of the area around the player instead of every chunk ever visited.
+        Their rows go to the next chunks added. A dropped chunk that is queried again is generated again.
+
+        :param center: The (chunk_x, chunk_z) coordinate to keep the grids around.
+        :param distance: How many chunks out from center to keep.
+        """
+        center_x, center_z = center
+        far = [coord for coord in self.__slots if max(abs(coord[0] - center_x), abs(coord[1] - center_z)) > distance]
+        for coord in far:
+            self.__free.append(self.__slots.pop(coord))
+
+    def __ensure(self, coords):
+        """Generate and store every chunk in coords that isn't stored yet, in one batch."""
+        missing = [coord for coord in coords if coord not in self.__slots]
+        if missing:
+            for coord, heights in zip(missing, self.__generate(missing)):
+                self.add_chunk(coord, heights)
+
+    def __locate(self, tile_x: np.ndarray, tile_z: np.ndarray):
+        """
+        Find the grid row and in-grid indices of integer tile coordinates.
+
+        :return: A tuple (slots, i, j) of arrays the same shape as tile_x.
+        """
+        chunk_x = tile_x // self.chunk_width
+        chunk_z = tile_z // self.chunk_width
+        # Pack both chunk coordinates into one int64 so unique() runs on a flat array
+        packed = (chunk_x << 32) | (chunk_z & 0xFFFFFFFF)
+        first = packed.flat[0]
+        if (packed == first).all():
+            # Small batches (one entity, one short ray) usually stay inside a single chunk
+            keys, inverse = packed.reshape(-1)[:1], np.zeros(packed.size, dtype=np.int64)
+        else:
+            keys, inverse = np.unique(packed, return_inverse=True)
+        key_x = keys >> 32
+        key_z = ((keys & 0xFFFFFFFF) + 2**31) % 2**32 - 2**31
+        coords = list(zip(key_x.tolist(), key_z.tolist()))
+        self.__ensure(coords)
+        slots = np.array([self.__slots[coord] for coord in coords], dtype=np.int64)[inverse.reshape(tile_x.shape)]
+        return slots, tile_x - chunk_x * self.chunk_width + 1, tile_z - chunk_z * self.chunk_width + 1
+
+    def heights_at(self, xs, zs, mode: str = None) -> np.ndarray:
+        """
+        Terrain height at many world positions in one call.
+
+        :param xs: Array of world x coordinates.
+        :param zs: Array of world z coordinates, broadcastable with xs.
+        :param mode: 'nearest' or 'bilinear'. Defaults to the instance's mode.
+        :return: A float32 array of heights with the broadcast shape of xs and zs.
+        """
+        mode = mode or self.mode
+        xs, zs = np.broadcast_arrays(np.asarray(xs, dtype=np.float64), np.asarray(zs, dtype=np.float64))
+        if xs.size == 0:
+            return np.zeros(xs.shape, dtype=np.float32)
+        floor_x = np.floor(xs)
+        floor_z = np.floor(zs)
+        slots, i, j = self.__locate(floor_x.astype(np.int64), floor_z.astype(np.int64))
+        grids = self.__grids
+        if mode == 'nearest':
+            return grids[slots, i, j]
+        if mode != 'bilinear':
+            raise ValueError(f"Unknown sampling mode: {mode}")
+
+        # The one tile border means the +1 neighbours always sit in the same grid
+        wx = (xs - floor_x).astype(np.float32)
+        wz = (zs - floor_z).astype(np.float32)
+        near = grids[slots, i, j] + (grids[slots, i + 1, j] - grids[slots, i, j]) * wx
+        far = grids[slots, i, j + 1] + (grids[slots, i + 1, j + 1] - grids[slots, i, j + 1]) * wx
+        return near + (far - near) * wz
+
+    def height_at(self, x: float, z: float, mode: str = None) -> float:
+        """
+        Terrain height at a single world position.
+        Stays in plain Python, which is quicker than array calls for one point.
+        """
+        mode = mode or self.mode
+        tile_x = math.floor(x)
+        tile_z = math.floor(z)
+        coord = (tile_x // self.chunk_width, tile_z // self.chunk_width)
+        if coord not in self.__slots:
+            self.__ensure([coord])
+        grid = self.__grids[self.__slots[coord]]
+        i = tile_x - coord[0] * self.chunk_width + 1
+        j = tile_z - coord[1] * self.chunk_width + 1
+        if mode == 'nearest':
+            return float(grid[i, j])
+        if mode != 'bilinear':
+            raise ValueError(f"Unknown sampling mode: {mode}")
+        wx = x - tile_x
+        wz = z - tile_z
+        near = float(grid[i, j]) * (1 - wx) + float(grid[i + 1, j]) * wx
+        far = float(grid[i, j + 1]) * (1 - wx) + float(grid[i + 1, j + 1]) * wx
+        return near * (1 - wz) + far * wz
+
+    def raycast(self, origins, directions, max_distance: float, step: float = 0.25, mode: str = None) -> np.ndarray:
+        """
+        March a batch of rays over the heightfield and find where each first goes below the ground.
+        Every sample of every ray is looked up in one heights_at call, and the hit is refined
+        by interpolating between the last sample above ground and the first one below.
+
+        :param origins: (n, 3) ray start points.
+        :param directions: (n, 3) ray directions. They don't need to be normalized.
+        :param max_distance: How far along each ray to test.
+        :param step: Distance between samples. Keep it under one tile to not skip thin walls.
+        :return: An (n,) array of hit distances, np.inf where a ray doesn't hit within max_distance.
+        """
+        origins = np.asarray(origins, dtype=np.float64).reshape(-1, 3)
+        directions = np.asarray(directions, dtype=np.float64).reshape(-1, 3)
+        lengths = np.linalg.norm(directions, axis=1, keepdims=True)
+        directions = np.divide(directions, lengths, out=np.zeros_like(directions), where=lengths > 0)
+
+        t = np.append(np.arange(0.0, max_distance, step), max_distance)
+        points = origins[:, None, :] + directions[:, None, :] * t[None, :, None]
+        clearance = points[..., 1] - self.heights_at(points[..., 0], points[..., 2], mode)
+
+        below = clearance < 0
+        hit = np.flatnonzero(below.any(axis=1))
+        distances = np.full(len(origins), np.inf)
+        if len(hit) == 0:
+            return distances
+        first = below[hit].argmax(axis=1)
+        before = np.maximum(first - 1, 0)
+        above = clearance[hit, before]
+        under = clearance[hit, first]
+        # Rays starting underground hit at distance 0
+        fraction = np.where(first > 0, above / np.where(first > 0, above - under, 1.0), 0.0)
+        distances[hit] = t[before] + (t[first] - t[before]) * fraction
+        return distances
+
+    def sweep(self, starts, ends, step_height: float = None, max_step: float = 0.5, mode: str = None):
+        """
+        Move a batch of entities from starts to ends against the terrain.
+        The path is sampled every max_step so fast movers can't pass through a wall
+        between ticks. If the ground along the path rises more than step_height above
+        the entity, it stops at the last sample before the wall. Whatever the end point,
+        it is kept on or above the ground there.
+
+        :param starts: (n, 3) positions at the start of the move.
+        :param ends: (n, 3) positions the entities want to move to.
+        :param step_height: Tallest rise an entity can walk up, or None to climb anything.
+        :param max_step: Longest horizontal distance between path samples.
+        :return: A tuple (positions, grounded, blocked) of the resolved (n, 3) positions,
+                 whether each one ended on the ground, and whether each one hit a wall.
+        """
+        starts = np.asarray(starts, dtype=np.float32).reshape(-1, 3)
+        ends = np.asarray(ends, dtype=np.float32).reshape(-1, 3)
+        moves = ends - starts
+        resolved = ends.copy()
+        blocked = np.zeros(len(starts), dtype=bool)
+
+        if step_height is not None and len(starts):
+            longest = float(np.max(np.hypot(moves[:, 0], moves[:, 2])))
+            fractions = np.linspace(0.0, 1.0, max(1, math.ceil(longest / max_step)) + 1, dtype=np.float32)[1:]
+            path = starts[:, None, :] + moves[:, None, :] * fractions[None, :, None]
+            wall = self.heights_at(path[..., 0], path[..., 2], mode) - path[..., 1] > step_height
+            blocked = wall.any(axis=1)
+            rows = np.flatnonzero(blocked)
+            first = wall[rows].argmax(axis=1)
+            stop = np.where(first > 0, fractions[np.maximum(first - 1, 0)], 0.0)
+            resolved[rows] = starts[rows] + moves[rows] * stop[:, None]
+
+        ground = self.heights_at(resolved[:, 0], resolved[:, 2], mode)
+        grounded = resolved[:, 1] <= ground
+        resolved[:, 1] = np.maximum(resolved[:, 1], ground)
+        return resolved, grounded, blocked
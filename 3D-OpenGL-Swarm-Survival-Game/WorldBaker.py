@@ -0,0 +1,102 @@
+import argparse
+import concurrent.futures
+import os
+import sys
+import time
+
+from MeshMap import generate_chunk_heights, build_chunk_mesh
+from WorldFile import WorldFile
+
+
+def bake_chunk(coord: tuple, chunk_width: int, seed: int, scale: float, height_limit: float):
+    """
+    Generate one chunk's height grid and mesh. Runs in a worker process.
+
+    :return: A tuple (coord, heights, vertex_array)
+    """
+    heights = generate_chunk_heights(coord[0], coord[1], chunk_width, seed, scale, height_limit)
+    vertex_array, _ = build_chunk_mesh(heights, coord[0], coord[1], chunk_width, height_limit)
+    return coord, heights, vertex_array
+
+
+def print_progress(done: int, total: int, rate: float):
+    width = 30
+    filled = int(width * done / total) if total else width
+    remaining = (total - done) / rate if rate > 0 else 0
+    sys.stderr.write(f"\r[{'#' * filled}{' ' * (width - filled)}] {done}/{total} chunks  {rate:6.1f} chunks/s  ETA {remaining:6.0f}s")
+    sys.stderr.flush()
+
+
+def bake_world(path: str, chunk_width: int, seed: int, scale: float, height_limit: float, chunk_range: tuple, workers: int = None):
+    """
+    Bake every chunk in the range into a world file using all cores.
+    If the file already exists with the same parameters, only the chunks
+    missing from it are generated, so an interrupted bake picks up where it left off.
+
+    :param chunk_range: (x0, z0, x1, z1) chunk coordinates, the end exclusive.
+    :param workers: Number of worker processes. Defaults to every core.
+    :return: The number of chunks generated by this run.
+    """
+    if os.path.exists(path):
+        world = WorldFile(path, 'r+')
+        x0, z0, x1, z1 = chunk_range
+        if not world.matches(chunk_width, seed, scale, height_limit) or (world.x0, world.z0, world.x1, world.z1) != (x0, z0, x1, z1):
+            world.close()
+            raise ValueError(f"{path} was baked with different settings; delete it or pick another path")
+    else:
+        world = WorldFile.create(path, chunk_width, seed, scale, height_limit, chunk_range)
+
+    pending = [coord for coord in world.coords() if not world.has_chunk(coord)]
+    total = world.chunk_count
+    done = total - len(pending)
+    if not pending:
+        world.close()
+        print(f"{path}: all {total} chunks already baked", file=sys.stderr)
+        return 0
+
+    start = time.perf_counter()
+    generated = 0
+    try:
+        with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = [
+                executor.submit(bake_chunk, coord, chunk_width, seed, scale, height_limit)
+                for coord in pending
+            ]
+            try:
+                for future in concurrent.futures.as_completed(futures):
+                    coord, heights, vertex_array = future.result()
+                    world.write_chunk(coord, heights, vertex_array)
+                    generated += 1
+                    print_progress(done + generated, total, generated / (time.perf_counter() - start))
+            except KeyboardInterrupt:
+                for future in futures:
+                    future.cancel()
+                raise
+    finally:
+        world.close()
+        sys.stderr.write("\n")
+    return generated
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Pregenerate a rectangle of terrain chunks into a world file that MeshMap can memory-map.")
+    parser.add_argument('path', help="World file to create or resume.")
+    parser.add_argument('--seed', type=int, default=48)
+    parser.add_argument('--scale', type=float, default=0.003)
+    parser.add_argument('--height-limit', type=float, default=1000)
+    parser.add_argument('--chunk-width', type=int, default=10)
+    parser.add_argument('--range', type=int, nargs=4, metavar=('X0', 'Z0', 'X1', 'Z1'), required=True,
+                        help="Chunk coordinates to bake, from (X0, Z0) inclusive to (X1, Z1) exclusive.")
+    parser.add_argument('--workers', type=int, default=None, help="Worker processes (defaults to every core).")
+    args = parser.parse_args(argv)
+
+    try:
+        generated = bake_world(args.path, args.chunk_width, args.seed, args.scale, args.height_limit, tuple(args.range), args.workers)
+    except KeyboardInterrupt:
+        print("Interrupted. Run the same command again to resume.", file=sys.stderr)
+        sys.exit(130)
+    print(f"Baked {generated} chunks into {args.path}", file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
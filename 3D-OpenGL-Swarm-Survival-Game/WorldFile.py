@@ -0,0 +1,157 @@
+import os
+import numpy as np
+
+
+# File layout: header | chunk index | fixed-size height grids | vertex data (appended as chunks finish)
+MAGIC = b'SWARMWLD'
+VERSION = 1
+HEADER_DTYPE = np.dtype([
+    ('magic', 'S8'),
+    ('version', '<u4'),
+    ('chunk_width', '<u4'),
+    ('seed', '<i8'),
+    ('scale', '<f8'),
+    ('height_limit', '<f8'),
+    ('x0', '<i8'),  # first chunk x (inclusive)
+    ('z0', '<i8'),  # first chunk z (inclusive)
+    ('x1', '<i8'),  # last chunk x (exclusive)
+    ('z1', '<i8'),  # last chunk z (exclusive)
+])
+INDEX_DTYPE = np.dtype([
+    ('offset', '<u8'),        # byte offset of the chunk's vertex data
+    ('vertex_count', '<u4'),  # vertices of 6 float32 each
+    ('done', '<u4'),          # 1 once the chunk's heights and vertices are fully written
+])
+
+
+class WorldFile:
+    def __init__(self, path: str, mode: str = 'r'):
+        """
+        Open a baked world file.
+        In 'r' mode the file is memory-mapped and chunks are served straight from
+        the page cache. In 'r+' mode chunks can be written, which is how the baker
+        fills in (or resumes filling in) a world. Use WorldFile.create for new files.
+
+        :param path: Path of the world file.
+        :param mode: 'r' to read, 'r+' to write chunks.
+        """
+        self.path = path
+        self.mode = mode
+        self.__map = np.memmap(path, dtype=np.uint8, mode='r')
+        self.header = np.frombuffer(self.__map, dtype=HEADER_DTYPE, count=1)[0]
+        if self.header['magic'] != MAGIC or self.header['version'] != VERSION:
+            raise ValueError(f"{path} is not a version {VERSION} world file")
+
+        self.chunk_width = int(self.header['chunk_width'])
+        self.x0, self.z0 = int(self.header['x0']), int(self.header['z0'])
+        self.x1, self.z1 = int(self.header['x1']), int(self.header['z1'])
+        self.chunk_count = (self.x1 - self.x0) * (self.z1 - self.z0)
+        self.grid_size = self.chunk_width + 2
+
+        self.__index_offset = HEADER_DTYPE.itemsize
+        self.__heights_offset = self.__index_offset + INDEX_DTYPE.itemsize * self.chunk_count
+        self.__data_offset = self.__heights_offset + 4 * self.grid_size * self.grid_size * self.chunk_count
+        self.__remap()
+
+        self.__file = None
+        if mode == 'r+':
+            self.__file = open(path, 'r+b')
+            # Anything past the last finished chunk is a partial write from an interrupted run.
+            self.__file.truncate(self.__data_end())
+            self.__file.seek(0, os.SEEK_END)
+
+    @classmethod
+    def create(cls, path: str, chunk_width: int, seed: int, scale: float, height_limit: float, chunk_range: tuple):
+        """
+        Write an empty world file with room for every chunk in the range and open it for writing.
+
+        :param chunk_range: (x0, z0, x1, z1) chunk coordinates, the end exclusive.
+        """
+        x0, z0, x1, z1 = chunk_range
+        if x1 <= x0 or z1 <= z0:
+            raise ValueError(f"Empty chunk range: {chunk_range}")
+        header = np.zeros(1, dtype=HEADER_DTYPE)
+        header[0] = (MAGIC, VERSION, chunk_width, seed, scale, height_limit, x0, z0, x1, z1)
+        chunk_count = (x1 - x0) * (z1 - z0)
+        grid_size = chunk_width + 2
+        with open(path, 'wb') as file:
+            file.write(header.tobytes())
+            file.write(np.zeros(chunk_count, dtype=INDEX_DTYPE).tobytes())
+            file.truncate(file.tell() + 4 * grid_size * grid_size * chunk_count)
+        return cls(path, 'r+')
+
+    def __remap(self):
+        self.__map = np.memmap(self.path, dtype=np.uint8, mode='r')
+        self.index = np.frombuffer(self.__map, dtype=INDEX_DTYPE, count=self.chunk_count, offset=self.__index_offset)
+        self.__heights = np.frombuffer(
+            self.__map, dtype=np.float32, count=self.grid_size * self.grid_size * self.chunk_count, offset=self.__heights_offset
+        ).reshape(self.chunk_count, self.grid_size, self.grid_size)
+
+    def __data_end(self) -> int:
+        done = self.index[self.index['done'] == 1]
+        if len(done) == 0:
+            return self.__data_offset
+        return int((done['offset'] + done['vertex_count'].astype(np.uint64) * 24).max())
+
+    def matches(self, chunk_width: int, seed: int, scale: float, height_limit: float) -> bool:
+        """Whether the file was baked with these terrain parameters."""
+        return (self.chunk_width == chunk_width and int(self.header['seed']) == seed
+                and float(self.header['scale']) == scale and float(self.header['height_limit']) == height_limit)
+
+    def slot(self, coord: tuple):
+        """Return the index slot for a chunk coordinate, or None if it is outside the baked range."""
+        chunk_x, chunk_z = coord
+        if not (self.x0 <= chunk_x < self.x1 and self.z0 <= chunk_z < self.z1):
+            return None
+        return (chunk_x - self.x0) * (self.z1 - self.z0) + (chunk_z - self.z0)
+
+    def coords(self):
+        """Every chunk coordinate in the baked range."""
+        return [(x, z) for x in range(self.x0, self.x1) for z in range(self.z0, self.z1)]
+
+    def has_chunk(self, coord: tuple) -> bool:
+        slot = self.slot(coord)
+        return slot is not None and self.index[slot]['done'] == 1
+
+    def done_count(self) -> int:
+        return int(np.count_nonzero(self.index['done'] == 1))
+
+    def heights(self, coord: tuple) -> np.ndarray:
+        """The chunk's (chunk_width + 2) square height grid, as a read-only view into the file."""
+        return self.__heights[self.slot(coord)]
+
+    def vertices(self, coord: tuple) -> np.ndarray:
+        """The chunk's interleaved [x, y, z, r, g, b] vertex data, as a read-only view into the file."""
+        entry = self.index[self.slot(coord)]
+        return np.frombuffer(self.__map, dtype=np.float32, count=int(entry['vertex_count']) * 6, offset=int(entry['offset']))
+
+    def write_chunk(self, coord: tuple, heights: np.ndarray, vertex_array: np.ndarray):
+        """
+        Store one chunk. Its data is written and synced to disk before its index entry is marked done,
+        so an interrupted bake (even a power loss) never leaves a done chunk pointing at missing data.
+        """
+        slot = self.slot(coord)
+        if slot is None:
+            raise ValueError(f"Chunk {coord} is outside the baked range")
+        vertex_array = np.ascontiguousarray(vertex_array, dtype=np.float32)
+
+        self.__file.seek(self.__heights_offset + slot * 4 * self.grid_size * self.grid_size)
+        self.__file.write(np.ascontiguousarray(heights, dtype=np.float32).tobytes())
+        offset = self.__file.seek(0, os.SEEK_END)
+        self.__file.write(vertex_array.tobytes())
+        self.__file.flush()
+        # the OS may write pages back in any order, so the data has to be on disk before the done flag can be
+        os.fsync(self.__file.fileno())
+
+        entry = np.zeros(1, dtype=INDEX_DTYPE)
+        entry[0] = (offset, len(vertex_array) // 6, 1)
+        self.__file.seek(self.__index_offset + slot * INDEX_DTYPE.itemsize)
+        self.__file.write(entry.tobytes())
+        self.__file.flush()
+
+    def close(self):
+        """Finish writing (if open for writing) and remap the file so reads see everything written."""
+        if self.__file is not None:
+            self.__file.close()
+            self.__file = None
+        self.__remap()
@@ -3,6 +3,9 @@ from pygame.locals import *
 from Entity import Player, EnemyManager
 from Camera import Camera
 from MeshMap import MeshMap
+from GameLoop import FixedTimestep, Simulation
+from Profiler import PROFILER
+import argparse
 
 
 
@@ -21,7 +24,10 @@ from MeshMap import MeshMap
 
 
 # Main Loop
-def main():
+def main(profile=False, trace_path=None):
+    # Scoped timers cost almost nothing while disabled; F3 toggles them in game
+    PROFILER.enabled = profile or trace_path is not None
+    
     # Set up pygame to use opengl
     pygame.init()
     display = (1500, 900)
@@ -37,7 +43,7 @@ def main():
     mesh_map = MeshMap(
         chunk_width=chunk_width,
         render_distance=render_distance,
-        chunks_per_update=1,
+        generation_threads=1,
         seed=48,
         scale=0.003,
         height_limit=1000,
@@ -69,44 +75,64 @@ def main():
         group_spawn_size=4,
     )
     
+    # Everything that advances at the fixed tick rate
+    simulation = Simulation(mesh_map, player, enemy_manager, camera)
+    
     # Main game loop
+    # The simulation runs in fixed ticks; rendering runs as often as max_fps allows
+    # and interpolates between the last two ticks.
+    timestep = FixedTimestep(tick_rate=60)
+    max_fps = 120
     clock = pygame.time.Clock()
     running = True
     while running: 
-        # Limit fps to 60 and get the delta of each loop
-        dt = clock.tick(60) / 1000.0 
+        # Get the real time this frame took
+        frame_time = clock.tick(max_fps) / 1000.0 
         # Quit script if pygame quits
         for event in pygame.event.get():
+            if event.type == KEYDOWN and event.key == K_F3:
+                PROFILER.enabled = not PROFILER.enabled
             if event.type == QUIT:
                 running = False
                 mesh_map.cleanup()
+                enemy_manager.cleanup()
+                player.mesh_cache.cleanup()
+        if not running:
+            break
+        PROFILER.begin_frame()
         
         # Get keys pressed this loop
         keys = pygame.key.get_pressed()
         
-        # Update user control related items
-        player_pos = player.get_position()
-        tile_height = mesh_map.get_tile_height((player_pos[0], player_pos[2]))
-        player.update(keys, tile_height, dt)
-        camera.update(keys)
+        # Spend the elapsed time in whole simulation ticks
+        for _ in range(timestep.advance(frame_time)):
+            simulation.step(keys, timestep.tick_dt)
+        alpha = timestep.alpha
         
-        # Update independent logic and render everything
-        camera.apply()
-        mesh_map.update((player_pos[0], player_pos[2]))
-        mesh_map.render((player_pos[0], player_pos[2]))
+        # Stream chunks and render everything at the interpolated positions
+        player_pos = player.get_interpolated_position(alpha)
+        with PROFILER.scope('Camera.apply'):
+            camera.apply(alpha)
+        with PROFILER.scope('MeshMap.update'):
+            mesh_map.update((player_pos[0], player_pos[2]))
+        with PROFILER.scope('MeshMap.render'):
+            mesh_map.render((player_pos[0], player_pos[2]))
         # player.draw_entity_box()
-        player.render()
+        player.render(alpha)
         
-        # Manage all enemy behaviors 
-        enemy_manager.update(player.get_position(), dt)
-        if player.is_attacking:
-            attack_center, attack_radius = player.get_attack_area()
-            enemy_manager.handle_player_attacks(attack_center, attack_radius)
         # Render all enemies
-        enemy_manager.render(player_pos, ((render_distance + 1) * chunk_width))
+        with PROFILER.scope('EnemyManager.render'):
+            enemy_manager.render(player_pos, ((render_distance + 1) * chunk_width), alpha)
+        
+        # Frame time graph on top of everything
+        PROFILER.render_overlay(display)
         
         # Flip the pygame buffer for the next loop
         pygame.display.flip()
+        PROFILER.end_frame()
+    
+    if trace_path is not None:
+        PROFILER.export_chrome_trace(trace_path)
 
 
 
@@ -119,9 +145,18 @@ def main():
         
 
 if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="3D swarm survival game.")
+    parser.add_argument('--profile', action='store_true', help="Start with the frame timers and frame time graph on (F3 toggles).")
+    parser.add_argument('--trace', help="Write the buffered frame timers to this Chrome trace-event JSON file on exit.")
+    parser.add_argument('--cprofile', action='store_true', help="Run the whole game under cProfile.")
+    args = parser.parse_args()
     
-    import cProfile
-    cProfile.run('main()')
+    if args.cprofile:
+        import cProfile
+        cProfile.run('main(args.profile, args.trace)')
+    else:
+        main(args.profile, args.trace)
+
 
 
 
@@ -0,0 +1,17 @@
+import json
+import os
+import subprocess
+import sys
+
+from Benchmark import PHASES
+
+
+def test_main_writes_only_json_to_stdout():
+    # a fresh interpreter, so anything printed while importing the game modules lands on stdout too
+    run = subprocess.run(
+        [sys.executable, '-c', "import Benchmark; Benchmark.main(['--frames', '10'])"],
+        cwd=os.path.dirname(os.path.abspath(__file__)), capture_output=True, text=True, check=True
+    )
+    results = json.loads(run.stdout)
+    assert results['settings']['frames'] == 10
+    assert set(results['phases']) == set(PHASES)
@@ -0,0 +1,41 @@
+import numpy as np
+
+from Entity import Enemy, EnemySwarm
+
+
+def make_swarm(n):
+    swarm = EnemySwarm(max_speed=2, max_acceleration=0.1, friction_coefficient=0.7, jump_power=0.7,
+                       gravity=0.1, max_fall_velocity=-1.5, width=0.75, max_health=100)
+    swarm.spawn([(float(i), 0.0, 0.0, 0.0) for i in range(n)])
+    return swarm
+
+
+def test_enemy_killed_through_view_is_compacted():
+    swarm = make_swarm(3)
+    enemy = Enemy(swarm, 1)
+    enemy.take_damage(150)
+
+    assert enemy.health == 0.0
+    assert not enemy.is_alive()
+    assert swarm.alive.tolist() == [True, False, True]
+
+    swarm.compact()
+    assert len(swarm) == 2
+    np.testing.assert_array_equal(swarm.positions[:, 0], [0.0, 2.0])
+
+
+def test_healing_through_view_revives():
+    swarm = make_swarm(1)
+    enemy = Enemy(swarm, 0)
+    enemy.health = 0
+    assert not swarm.alive[0]
+    enemy.health = 10
+    assert swarm.alive[0]
+    assert swarm.health[0] == 10
+
+
+def test_apply_damage_then_compact():
+    swarm = make_swarm(4)
+    assert swarm.apply_damage((0.0, 0.0), 1.5, 200) == 2
+    swarm.compact()
+    np.testing.assert_array_equal(swarm.positions[:, 0], [2.0, 3.0])
@@ -0,0 +1,69 @@
+import numpy as np
+import noise
+import pytest
+
+import Noise
+from MeshMap import generate_chunk_heights, generate_chunk_heights_batch, terrain_height, terrain_heights
+
+
+# Both implementations round in float32, so they may only differ in the last bits.
+TOLERANCE = 1e-5
+
+SEEDS = (0, 1, 48, 200, 255)
+
+
+def reference_pnoise2(xs, ys, **kwargs) -> np.ndarray:
+    return np.array([noise.pnoise2(float(x), float(y), **kwargs) for x, y in zip(xs, ys)], dtype=np.float32)
+
+
+@pytest.mark.parametrize('spread', (1.0, 50.0, 5000.0))
+@pytest.mark.parametrize('base', SEEDS)
+@pytest.mark.parametrize('octaves', (1, 4))
+def test_pnoise2_matches_c_extension(base, spread, octaves):
+    rng = np.random.default_rng(base)
+    xs = rng.uniform(-spread, spread, 5000).astype(np.float32)
+    ys = rng.uniform(-spread, spread, 5000).astype(np.float32)
+    kwargs = dict(octaves=octaves, persistence=0.5, lacunarity=2.0, repeatx=1024, repeaty=1024, base=base)
+
+    error = np.abs(Noise.pnoise2(xs, ys, **kwargs) - reference_pnoise2(xs, ys, **kwargs)).max()
+    assert error < TOLERANCE, f"max abs error {error:.2e}"
+
+
+def test_pnoise2_rejects_out_of_range_base():
+    with pytest.raises(ValueError):
+        Noise.pnoise2(0.0, 0.0, base=256)
+
+
+@pytest.mark.parametrize('seed', SEEDS)
+def test_terrain_heights_matches_terrain_height(seed):
+    rng = np.random.default_rng(seed)
+    xs = rng.integers(-50000, 50000, 2000)
+    zs = rng.integers(-50000, 50000, 2000)
+
+    ours = terrain_heights(xs, zs, seed, 0.005, 1000)
+    reference = np.array([terrain_height(float(x), float(z), seed, 0.005, 1000) for x, z in zip(xs, zs)], dtype=np.float32)
+    error = np.abs(ours - reference).max()
+    assert error < TOLERANCE * 1000, f"max abs error {error:.2e}"
+
+
+@pytest.mark.parametrize('seed', SEEDS)
+@pytest.mark.parametrize('chunk', ((0, 0), (-3, 5), (40, -17), (-700, -700)))
+def test_chunk_heights_match_c_backend(seed, chunk):
+    numpy_heights = generate_chunk_heights(*chunk, 16, seed, 0.005, 1000)
+    c_heights = generate_chunk_heights(*chunk, 16, seed, 0.005, 1000, noise_backend='c')
+    error = np.abs(numpy_heights - c_heights).max()
+    assert error < TOLERANCE * 1000, f"max abs error {error:.2e}"
+
+
+def test_chunk_heights_batch_matches_single_chunks():
+    coords = [(0, 0), (-1, 0), (0, -1), (12, -30), (-700, 700)]
+    batch = generate_chunk_heights_batch(coords, 16, 42, 0.005, 1000)
+
+    assert batch.shape == (len(coords), 18, 18)
+    for heights, coord in zip(batch, coords):
+        np.testing.assert_array_equal(heights, generate_chunk_heights(*coord, 16, 42, 0.005, 1000))
+
+
+def test_unknown_noise_backend():
+    with pytest.raises(ValueError):
+        generate_chunk_heights(0, 0, 16, 42, 0.005, 1000, noise_backend='gpu')
@@ -0,0 +1,43 @@
+import numpy as np
+
+from TerrainQuery import TerrainQuery
+
+CHUNK_WIDTH = 4
+
+
+def grid(coord):
+    # a flat grid whose height tells the chunks apart
+    return np.full((CHUNK_WIDTH + 2, CHUNK_WIDTH + 2), coord[0] * 100 + coord[1], dtype=np.float32)
+
+
+def generate(coords):
+    return [grid(coord) for coord in coords]
+
+
+def center_of(coord):
+    return (coord[0] + 0.5) * CHUNK_WIDTH, (coord[1] + 0.5) * CHUNK_WIDTH
+
+
+def test_far_chunks_are_dropped_and_their_rows_reused():
+    terrain = TerrainQuery(CHUNK_WIDTH, generate, capacity=9)
+    start = [(x, z) for x in range(-1, 2) for z in range(-1, 2)]
+    for coord in start:
+        terrain.add_chunk(coord, grid(coord))
+    assert len(terrain) == 9 and terrain.capacity == 9
+
+    # walking one chunk along x leaves the x = -1 column out of range
+    terrain.drop_far((1, 0), 1)
+    assert len(terrain) == 6
+    assert not terrain.has_chunk((-1, 0)) and terrain.has_chunk((0, 0))
+
+    # the column coming into range takes the freed rows instead of growing the store
+    for coord in [(2, -1), (2, 0), (2, 1)]:
+        terrain.add_chunk(coord, grid(coord))
+    assert len(terrain) == 9 and terrain.capacity == 9
+    for coord in [(0, 0), (1, 1), (2, -1), (2, 1)]:
+        assert terrain.height_at(*center_of(coord)) == coord[0] * 100 + coord[1]
+
+    # a dropped chunk is generated again when queried
+    assert terrain.height_at(*center_of((-1, 0))) == -100
+    xs, zs = zip(*(center_of(coord) for coord in [(-1, 1), (2, 0)]))
+    np.testing.assert_array_equal(terrain.heights_at(xs, zs), [-99, 200])
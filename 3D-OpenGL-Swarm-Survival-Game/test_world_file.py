@@ -0,0 +1,66 @@
+import os
+
+import numpy as np
+import pytest
+
+from WorldBaker import bake_chunk, bake_world
+from WorldFile import WorldFile
+
+SETTINGS = dict(chunk_width=4, seed=48, scale=0.003, height_limit=1000)
+RANGE = (-1, 0, 1, 2)
+
+
+def chunk_data(coord):
+    return bake_chunk(coord, SETTINGS['chunk_width'], SETTINGS['seed'], SETTINGS['scale'], SETTINGS['height_limit'])[1:]
+
+
+def test_chunks_read_back_as_written(tmp_path):
+    path = str(tmp_path / 'world.bin')
+    world = WorldFile.create(path, chunk_range=RANGE, **SETTINGS)
+    written = {coord: chunk_data(coord) for coord in [(-1, 0), (0, 1)]}
+    for coord, (heights, vertices) in written.items():
+        world.write_chunk(coord, heights, vertices)
+    world.close()
+
+    world = WorldFile(path)
+    assert world.matches(**SETTINGS)
+    assert world.done_count() == 2
+    assert not world.has_chunk((-1, 1)) and not world.has_chunk((5, 5))
+    for coord, (heights, vertices) in written.items():
+        assert world.has_chunk(coord)
+        np.testing.assert_array_equal(world.heights(coord), heights)
+        np.testing.assert_array_equal(world.vertices(coord), np.asarray(vertices, dtype=np.float32).ravel())
+    assert world.slot((5, 5)) is None
+
+
+def test_bake_resumes_after_a_chunk_that_was_never_marked_done(tmp_path):
+    path = str(tmp_path / 'world.bin')
+    world = WorldFile.create(path, chunk_range=RANGE, **SETTINGS)
+    world.write_chunk((-1, 0), *chunk_data((-1, 0)))
+    world.close()
+    # an interrupted run: vertex data appended for a chunk whose index entry was never written
+    with open(path, 'ab') as file:
+        file.write(np.asarray(chunk_data((0, 0))[1], dtype=np.float32).tobytes()[:1000])
+
+    assert bake_world(path, chunk_range=RANGE, workers=1, **SETTINGS) == 3
+
+    world = WorldFile(path)
+    assert world.done_count() == world.chunk_count == 4
+    for coord in world.coords():
+        heights, vertices = chunk_data(coord)
+        np.testing.assert_array_equal(world.heights(coord), heights)
+        np.testing.assert_array_equal(world.vertices(coord), np.asarray(vertices, dtype=np.float32).ravel())
+    # the partial write was cut off rather than left in front of the resumed chunks
+    end = max(int(entry['offset']) + int(entry['vertex_count']) * 24 for entry in world.index)
+    assert os.path.getsize(path) == end
+
+    # nothing left to do
+    assert bake_world(path, chunk_range=RANGE, workers=1, **SETTINGS) == 0
+
+
+@pytest.mark.parametrize('changed', [dict(seed=49), dict(chunk_width=5), dict(scale=0.004)])
+def test_bake_refuses_a_file_with_other_settings(tmp_path, changed):
+    path = str(tmp_path / 'world.bin')
+    WorldFile.create(path, chunk_range=RANGE, **SETTINGS).close()
+    with pytest.raises(ValueError):
+        bake_world(path, chunk_range=RANGE, workers=1, **dict(SETTINGS, **changed))
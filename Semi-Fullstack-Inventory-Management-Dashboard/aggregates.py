@@ -0,0 +1,177 @@
+from datetime import datetime
+from collections import defaultdict
+from alerts import build_alerts, urgency_for
+from forecast import UsageForecast, HALF_LIFE_DAYS
+
+
+class InventoryAggregates:
+    """
+    Chart counts and alert totals kept up to date record by record instead of
+    recomputed from whole tables on every request.
+    Each order and usage's contribution is remembered, so applying a record again
+    (an edit picked up by a sync) swaps its old contribution for the new one.
+    """
+
+    def __init__(self, critical_days: int, warning_days: int, usage_period_days: int, half_life_days: float = HALF_LIFE_DAYS):
+        self.critical_days = critical_days
+        self.warning_days = warning_days
+        self.usage_period_days = usage_period_days
+        self.half_life_days = half_life_days
+        self.built = False
+        self.clear()
+
+    def clear(self):
+        # categories and products
+        self.category_names = {}        # category id field -> name, in table order
+        self.category_map = {}          # product id -> category id field
+        self.product_to_category = {}   # product id -> category name
+        self.product_info = {}          # product id -> {"name", "unit"}
+
+        # per record contributions, so a record can be taken back out
+        self.orders = {}                # order id -> (product ids, month, amount, expiration date)
+        self.usages = {}                # usage id -> (product ids, date, amount)
+        self.order_seq = {}             # order id -> position it was first seen in
+
+        # chart counts
+        self.category_orders = defaultdict(lambda: defaultdict(int))
+        self.category_usages = defaultdict(lambda: defaultdict(int))
+
+        # alert totals
+        self.product_purchases = defaultdict(float)
+        self.product_usages = defaultdict(float)
+        self.product_expirations = defaultdict(dict)  # product id -> {order id: expiration date}
+        self.first_expiration = {}      # product id -> expiration of its first listed order with one, filled on demand
+        self.forecast = UsageForecast(self.usage_period_days, self.half_life_days)
+
+    def build(self, categories: list, products: list, orders: list, usages: list):
+        """Rebuild everything from full tables."""
+        self.clear()
+        for category in categories:
+            category_id = category['fields']['id']
+            category_name = category['fields']['name']
+            self.category_names[category_id] = category_name
+            for product_id in category['fields'].get('products', []):
+                self.category_map[product_id] = category_id
+                self.product_to_category[product_id] = category_name
+        for product in products:
+            self.product_info[product['id']] = {
+                "name": product['fields'].get('name', 'Unknown Product'),
+                "unit": product['fields'].get('unit-of-measurement', 'unit')
+            }
+        self.apply_orders(orders)
+        self.apply_usages(usages)
+        self.built = True
+
+    def apply_orders(self, records: list):
+        """Add new orders, or replace the contribution of orders already counted."""
+        for record in records:
+            self.remove_order(record['id'])
+            fields = record['fields']
+            product_ids = tuple(fields.get('product', []))
+            month = extract_month(fields['order-date'])
+            amount = fields.get('amount', 0)
+            expiration_date = fields.get('expiration-date')
+            self.orders[record['id']] = (product_ids, month, amount, expiration_date)
+            self.order_seq.setdefault(record['id'], len(self.order_seq))
+            for product_id in product_ids:
+                category_id = self.category_map.get(product_id)
+                if category_id:
+                    self.category_orders[category_id][month] += 1
+                self.product_purchases[product_id] += amount
+                if expiration_date:
+                    self.product_expirations[product_id][record['id']] = expiration_date
+                    self.first_expiration.pop(product_id, None)
+
+    def remove_order(self, order_id: str):
+        if order_id not in self.orders:
+            return
+        product_ids, month, amount, expiration_date = self.orders.pop(order_id)
+        for product_id in product_ids:
+            category_id = self.category_map.get(product_id)
+            if category_id:
+                decrement(self.category_orders[category_id], month)
+            self.product_purchases[product_id] -= amount
+            if self.product_expirations[product_id].pop(order_id, None):
+                self.first_expiration.pop(product_id, None)
+
+    def apply_usages(self, records: list):
+        """Add new usages, or replace the contribution of usages already counted."""
+        for record in records:
+            self.remove_usage(record['id'])
+            fields = record['fields']
+            product_ids = tuple(fields.get('product', []))
+            usage_date = fields['usage-date']
+            month = extract_month(usage_date)
+            amount = fields.get('amount', 0)
+            self.usages[record['id']] = (product_ids, usage_date, amount)
+            for product_id in product_ids:
+                category_id = self.category_map.get(product_id)
+                if category_id:
+                    self.category_usages[category_id][month] += 1
+                self.product_usages[product_id] += amount
+                self.forecast.add(product_id, usage_date, amount)
+
+    def remove_usage(self, usage_id: str):
+        if usage_id not in self.usages:
+            return
+        product_ids, usage_date, amount = self.usages.pop(usage_id)
+        month = extract_month(usage_date)
+        for product_id in product_ids:
+            category_id = self.category_map.get(product_id)
+            if category_id:
+                decrement(self.category_usages[category_id], month)
+            self.product_usages[product_id] -= amount
+            self.forecast.add(product_id, usage_date, -amount)
+
+    def expiration_date(self, product_id: str):
+        """Expiration date of the first listed order of a product that has one."""
+        if product_id not in self.first_expiration:
+            expirations = self.product_expirations.get(product_id)
+            if expirations:
+                first_order = min(expirations, key=self.order_seq.__getitem__)
+                self.first_expiration[product_id] = expirations[first_order]
+            else:
+                self.first_expiration[product_id] = None
+        return self.first_expiration[product_id]
+
+    def chart_json(self) -> dict:
+        """
+        Orders and usages per month of each category, for the front end:
+        {"charts": [{"category": "category-1", "data": [{"month": "2025-02", "orders": 5, "usages": 4}, ...]}, ...]}
+        """
+        charts = []
+        for category_id, category_name in self.category_names.items():
+            orders = self.category_orders.get(category_id, {})
+            usages = self.category_usages.get(category_id, {})
+            data = [
+                {"month": month, "orders": orders.get(month, 0), "usages": usages.get(month, 0)}
+                for month in sorted(orders.keys() | usages.keys())
+            ]
+            if data:
+                charts.append({"category": category_name, "data": data})
+        return {"charts": charts}
+
+    def table_json(self, current_date: datetime = None) -> dict:
+        """
+        The alerts table, for the front end:
+        {"alerts": [{"urgency": "Critical", "type": "Low Inventory", "category": "category-3",
+                     "product": "Product A", "effective-date": "2025-04-01"}, ...]}
+        """
+        return build_alerts(
+            self.product_to_category, self.product_info, self.product_purchases, self.product_usages,
+            self.expiration_date, self.forecast, self.critical_days, self.warning_days, current_date
+        )
+
+    def urgency(self, days: int):
+        return urgency_for(days, self.critical_days, self.warning_days)
+
+
+def extract_month(date_str: str) -> str:
+    return datetime.strptime(date_str, "%Y-%m-%d").strftime("%Y-%m")
+
+
+def decrement(counts: dict, key):
+    # drop months that reach zero so they stop showing up as chart points
+    counts[key] -= 1
+    if counts[key] <= 0:
+        del counts[key]
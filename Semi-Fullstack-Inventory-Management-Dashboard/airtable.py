@@ -0,0 +1,401 @@
+import asyncio
+import contextvars
+import heapq
+import itertools
+import random
+import time
+from collections import defaultdict, deque
+from contextlib import contextmanager
+import httpx
+
+AIRTABLE_URL = 'https://api.airtable.com/v0'
+PAGE_SIZE = 100  # the most records airtable returns per page
+BATCH_SIZE = 10  # the most records airtable creates per request
+RATE_LIMIT = 5   # requests per second airtable allows per base
+SAFE_RATE = RATE_LIMIT * 0.9  # requests land with network jitter, pacing at exactly the limit still trips it now and then
+
+# request priorities, lower goes out first
+WRITE = 0       # a user waiting on a report
+READ = 1        # a user waiting on a table
+BACKGROUND = 2  # syncs, warm ups and refreshes nobody is waiting on
+PRIORITIES = {WRITE: 'write', READ: 'read', BACKGROUND: 'background'}
+
+# the priority reads go out at, set per task so background loops don't have to pass it all the way down
+read_priority = contextvars.ContextVar('read_priority', default=READ)
+
+
+@contextmanager
+def background_requests():
+    """Reads made in here, and in tasks started from here, queue behind everything a user is waiting on."""
+    token = read_priority.set(BACKGROUND)
+    try:
+        yield
+    finally:
+        read_priority.reset(token)
+
+
+class AirtableError(Exception):
+    pass
+
+
+class RateLimiter:
+    """Token bucket: up to burst calls go straight through, after that they start rate per second."""
+
+    def __init__(self, rate: float, burst: int = None):
+        self.rate = rate
+        self.capacity = burst or max(1, int(rate))
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = asyncio.Lock()
+
+    async def acquire(self):
+        # waiters queue on the lock, so they get their tokens in the order they asked
+        async with self.lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+class ScheduledRequest:
+    def __init__(self, method: str, table: str, kwargs: dict, key):
+        self.method = method
+        self.table = table
+        self.kwargs = kwargs
+        self.key = key              # for reads, what identical reads share it by
+        self.future = asyncio.get_running_loop().create_future()
+        self.priority = None
+        self.queued = False
+        self.enqueued = 0.0
+        self.due = 0.0              # when it comes up in the queue
+        self.attempts = 0
+        self.waiters = 0
+
+
+class RequestScheduler:
+    """
+    Every request to airtable goes through here.
+    - requests wait in one queue and go out under the rate limit, each one as if it had come in priority_delay
+      seconds later per step below a write: more urgent ones go first, but background work still moves under
+      a steady stream of writes
+    - at most max_concurrency are in flight at once
+    - a read identical to one already queued or in flight waits for that one's response instead
+    - 429s are retried with jittered backoff, and hold the whole queue back meanwhile since airtable counts
+      every request against the base; failed reads are retried too, failed writes aren't (they may have landed)
+    """
+
+    def __init__(self, send, rate: float, max_concurrency: int = 5, retries: int = 4, backoff: float = 0.5,
+                 priority_delay: float = 2.0, window: int = 1000, limiter=None):
+        # send is a coroutine function taking a method, table and httpx keyword arguments and returning a response,
+        # limiter anything with an async acquire() to use instead of a RateLimiter of rate
+        self.send = send
+        # evenly spaced, a burst on top of the rate would put more than rate requests into some one second window
+        self.limiter = limiter or RateLimiter(rate, burst=1)
+        self.slots = asyncio.Semaphore(max_concurrency)
+        self.retries = retries
+        self.backoff = backoff
+        self.priority_delay = priority_delay
+        self.queue = []         # heap of (due, arrival, request), a request moved up leaves a stale entry behind
+        self.arrivals = itertools.count()
+        self.wakeup = asyncio.Event()
+        self.reads = {}         # key -> read queued or in flight
+        self.paused_until = 0.0
+        self.dispatcher = None
+        self.tasks = set()
+        self.in_flight = 0
+        self.queued = defaultdict(int)
+        self.sent = defaultdict(int)
+        self.counts = defaultdict(int)
+        self.waits = {priority: deque(maxlen=window) for priority in PRIORITIES}  # seconds queued, most recent
+
+    async def run(self, method: str, table: str, priority: int, **kwargs) -> httpx.Response:
+        key = None
+        if method == 'GET':
+            key = (table, tuple(sorted((name, str(value)) for name, value in (kwargs.get('params') or {}).items())))
+        request = self.reads.get(key) if key else None
+        if request is not None:
+            self.counts['deduplicated'] += 1
+            if request.queued and priority < request.priority:
+                # someone more urgent wants it too
+                self.push(request, priority)
+        else:
+            request = ScheduledRequest(method, table, kwargs, key)
+            if key:
+                self.reads[key] = request
+            self.push(request, priority)
+        request.waiters += 1
+        try:
+            return await asyncio.shield(request.future)
+        except asyncio.CancelledError:
+            request.waiters -= 1
+            # nobody is left waiting on it, so it doesn't go out
+            if request.waiters == 0 and request.queued:
+                self.drop(request)
+            raise
+
+    def push(self, request: ScheduledRequest, priority: int):
+        if request.queued:
+            self.queued[request.priority] -= 1
+        else:
+            request.queued = True
+            request.enqueued = time.monotonic()
+        request.priority = priority
+        request.due = request.enqueued + priority * self.priority_delay
+        self.queued[priority] += 1
+        heapq.heappush(self.queue, (request.due, next(self.arrivals), request))
+        self.wakeup.set()
+        if self.dispatcher is None:
+            self.dispatcher = asyncio.create_task(self.dispatch())
+
+    def pop(self):
+        while self.queue:
+            due, _, request = heapq.heappop(self.queue)
+            if request.queued and due == request.due:
+                request.queued = False
+                self.queued[request.priority] -= 1
+                return request
+        return None
+
+    def drop(self, request: ScheduledRequest):
+        request.queued = False
+        self.queued[request.priority] -= 1
+        self.forget(request)
+        request.future.cancel()
+
+    def forget(self, request: ScheduledRequest):
+        if request.key and self.reads.get(request.key) is request:
+            del self.reads[request.key]
+
+    async def dispatch(self):
+        while True:
+            if not any(self.queued.values()):
+                self.wakeup.clear()
+                await self.wakeup.wait()
+                continue
+            pause = self.paused_until - time.monotonic()
+            if pause > 0:
+                await asyncio.sleep(pause)
+                continue
+            await self.slots.acquire()
+            await self.limiter.acquire()
+            # chosen only now, so anything more urgent that came in while this waited goes first
+            request = self.pop()
+            if request is None:
+                self.slots.release()
+                continue
+            self.waits[request.priority].append(time.monotonic() - request.enqueued)
+            self.sent[request.priority] += 1
+            self.in_flight += 1
+            task = asyncio.create_task(self.attempt(request))
+            self.tasks.add(task)
+            task.add_done_callback(self.tasks.discard)
+
+    async def attempt(self, request: ScheduledRequest):
+        response = error = None
+        try:
+            response = await self.send(request.method, request.table, **request.kwargs)
+        except Exception as e:
+            # handed to whoever is waiting, so nobody waits forever
+            error = e
+        finally:
+            self.in_flight -= 1
+            self.slots.release()
+        throttled = response is not None and response.status_code == 429
+        if throttled:
+            self.counts['throttled'] += 1
+        if request.attempts < self.retries and self.retryable(request, response, error):
+            delay = self.delay(request.attempts, response)
+            request.attempts += 1
+            self.counts['retries'] += 1
+            if throttled:
+                self.paused_until = max(self.paused_until, time.monotonic() + delay)
+            asyncio.get_running_loop().call_later(delay, self.retry, request)
+            return
+        self.forget(request)
+        if request.future.done():
+            return
+        if error is not None:
+            self.counts['failed'] += 1
+            request.future.set_exception(error)
+        else:
+            request.future.set_result(response)
+
+    def retryable(self, request: ScheduledRequest, response, error) -> bool:
+        if response is not None and response.status_code == 429:
+            return True  # turned away before airtable did anything with it
+        if request.method != 'GET':
+            return False
+        if response is None:
+            return isinstance(error, httpx.TransportError)
+        return response.status_code in (500, 502, 503, 504)
+
+    def delay(self, attempt: int, response) -> float:
+        try:
+            retry_after = float(response.headers['Retry-After'])
+        except (AttributeError, KeyError, ValueError):
+            retry_after = None
+        if retry_after is not None:
+            # never sooner than airtable asked, spread out a little after that
+            return retry_after * random.uniform(1, 1.2)
+        # jittered, so requests turned away together don't all come back together
+        delay = self.backoff * 2 ** attempt
+        return random.uniform(delay / 2, delay)
+
+    def retry(self, request: ScheduledRequest):
+        if request.future.done():
+            return
+        if request.waiters == 0:
+            self.forget(request)
+            request.future.cancel()
+            return
+        self.push(request, request.priority)
+
+    def metrics(self) -> dict:
+        def wait_ms(waits):
+            waits = sorted(waits)
+            if not waits:
+                return {"p50": 0.0, "p95": 0.0, "max": 0.0}
+            return {
+                "p50": round(waits[len(waits) // 2] * 1000, 1),
+                "p95": round(waits[min(len(waits) - 1, int(len(waits) * 0.95))] * 1000, 1),
+                "max": round(waits[-1] * 1000, 1)
+            }
+        return {
+            "queued": {name: self.queued[priority] for priority, name in PRIORITIES.items()},
+            "in_flight": self.in_flight,
+            "sent": {name: self.sent[priority] for priority, name in PRIORITIES.items()},
+            "wait_ms": {name: wait_ms(self.waits[priority]) for priority, name in PRIORITIES.items()},
+            "deduplicated": self.counts['deduplicated'],
+            "retries": self.counts['retries'],
+            "throttled": self.counts['throttled'],
+            "failed": self.counts['failed'],
+            "paused_seconds": round(max(0.0, self.paused_until - time.monotonic()), 3)
+        }
+
+    async def close(self):
+        tasks = list(self.tasks) + ([self.dispatcher] if self.dispatcher else [])
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        for _, _, request in self.queue:
+            request.future.cancel()
+
+
+def error_message(body) -> str:
+    # airtable errors come back as {"error": {"type", "message"}} or {"error": "TYPE"}
+    error = body.get('error') if isinstance(body, dict) else None
+    if isinstance(error, dict):
+        return error.get('message') or error.get('type') or 'Unknown error'
+    return error or (body.get('message') if isinstance(body, dict) else None) or 'Unknown error'
+
+
+class RecordStream:
+    """
+    Async iterator over every record in a table, following airtable's offset cursors.
+    The first page is requested as soon as the stream is created, and the next page is
+    always in flight while the current one is being consumed.
+    """
+
+    def __init__(self, client, table: str, params: dict = None, page_size: int = PAGE_SIZE):
+        self.client = client
+        self.table = table
+        self.params = dict(params or {}, pageSize=page_size)
+        self.pending = asyncio.ensure_future(client.read(table, self.params))
+
+    def __aiter__(self):
+        return self.records()
+
+    async def records(self):
+        try:
+            while self.pending is not None:
+                page = await self.pending
+                self.pending = None
+                if 'records' not in page:
+                    raise AirtableError(f"Error reading {self.table}: {page.get('error')}")
+                # prefetch the next page before handing out this one
+                if page.get('offset'):
+                    self.pending = asyncio.ensure_future(self.client.read(self.table, dict(self.params, offset=page['offset'])))
+                for record in page['records']:
+                    yield record
+        finally:
+            # stop fetching if the consumer quits early
+            if self.pending is not None:
+                self.pending.cancel()
+
+
+class AirtableClient:
+    """Async Airtable client sharing one connection pool across every request the app makes."""
+
+    def __init__(self, api_key: str, base: str, base_url: str = AIRTABLE_URL,
+                 max_connections: int = 10, max_concurrency: int = 5, timeout: float = 10.0,
+                 rate_limit: float = SAFE_RATE, retries: int = 4, backoff: float = 0.5, limiter=None):
+        # max_concurrency caps requests in flight at once, the pool keeps connections alive between them
+        self.url = f'{base_url}/{base}'
+        self.scheduler = RequestScheduler(self.send, rate_limit, max_concurrency, retries, backoff, limiter=limiter)
+        self.client = httpx.AsyncClient(
+            headers={
+                "Authorization": f"Bearer {api_key}",
+                "Content-Type": "application/json"
+            },
+            timeout=httpx.Timeout(timeout),
+            limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections)
+        )
+
+    async def request(self, method: str, table: str, priority: int = None, **kwargs) -> httpx.Response:
+        """Queue a request with the scheduler, reads default to the current task's priority and writes go first."""
+        if priority is None:
+            priority = read_priority.get() if method == 'GET' else WRITE
+        return await self.scheduler.run(method, table, priority, **kwargs)
+
+    async def send(self, method: str, table: str, **kwargs) -> httpx.Response:
+        return await self.client.request(method, f'{self.url}/{table}', **kwargs)
+
+    async def read(self, table: str, params: dict = None) -> dict:
+        response = await self.request('GET', table, params=params)
+        return response.json()
+
+    def stream(self, table: str, params: dict = None, page_size: int = PAGE_SIZE) -> RecordStream:
+        return RecordStream(self, table, params, page_size)
+
+    async def read_all(self, table: str, params: dict = None) -> dict:
+        """Read every page of a table into one {"records": [...]} response."""
+        return {"records": [record async for record in self.stream(table, params)]}
+
+    async def write(self, table: str, data: dict):
+        response = await self.request('POST', table, json=data)
+        return response.status_code, response.json()
+
+    async def write_many(self, table: str, records: list) -> list:
+        """
+        Create records ({"fields": ...} dicts) in batches of BATCH_SIZE, sent concurrently under the rate limit.
+        Returns one result per record, in order: {"status": 200, "record": created} or {"status": code, "error": message}.
+        A batch is created whole or not at all, so a failure never splits one.
+        """
+        batches = [records[i:i + BATCH_SIZE] for i in range(0, len(records), BATCH_SIZE)]
+        results = await asyncio.gather(*(self.write_batch(table, batch) for batch in batches))
+        return [result for batch in results for result in batch]
+
+    async def write_batch(self, table: str, records: list) -> list:
+        # a rate limited batch is retried whole by the scheduler
+        try:
+            response = await self.request('POST', table, json={"records": records})
+        except httpx.HTTPError as error:
+            return [{"status": None, "error": str(error) or type(error).__name__} for _ in records]
+        try:
+            body = response.json()
+        except ValueError:
+            body = {}
+        if response.status_code == 200:
+            return [{"status": 200, "record": record} for record in body['records']]
+        return [{"status": response.status_code, "error": error_message(body)} for _ in records]
+
+    def metrics(self) -> dict:
+        return self.scheduler.metrics()
+
+    async def close(self):
+        await self.scheduler.close()
+        await self.client.aclose()
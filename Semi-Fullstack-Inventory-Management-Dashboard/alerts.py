@@ -0,0 +1,114 @@
+from datetime import datetime, timedelta
+from collections import defaultdict
+from functools import lru_cache
+
+
+@lru_cache(maxsize=8192)
+def parse_date(date_str: str) -> datetime:
+    # the same few hundred dates repeat across thousands of records, so each string is parsed once
+    return datetime.strptime(date_str, "%Y-%m-%d")
+
+
+class ProductIndex:
+    """Everything alert generation needs per product, gathered in a single sweep over the orders and usages."""
+
+    def __init__(self, forecast):
+        self.purchases = defaultdict(float)
+        self.usages = defaultdict(float)
+        self.expirations = {}    # product id -> expiration date of the first listed order that has one
+        self.forecast = forecast  # UsageForecast the usages' daily amounts go into
+
+    def add_order(self, order: dict):
+        fields = order['fields']
+        amount = fields.get('amount', 0)  # default to 0
+        expiration_date = fields.get('expiration-date')
+        for product_id in fields.get('product', []):
+            self.purchases[product_id] += amount
+            if expiration_date and product_id not in self.expirations:
+                self.expirations[product_id] = expiration_date
+
+    def add_usage(self, usage: dict):
+        fields = usage['fields']
+        amount = fields.get('amount', 0)  # default to 0
+        usage_date = fields.get('usage-date')
+        for product_id in fields.get('product', []):
+            self.usages[product_id] += amount
+            self.forecast.add(product_id, usage_date, amount)
+
+    def expiration_date(self, product_id: str):
+        return self.expirations.get(product_id)
+
+
+def index_records(orders, usages, forecast) -> ProductIndex:
+    index = ProductIndex(forecast)
+    for order in orders:
+        index.add_order(order)
+    for usage in usages:
+        index.add_usage(usage)
+    return index
+
+
+def urgency_for(days: int, critical_days: int, warning_days: int):
+    if days <= critical_days:
+        return "Critical"
+    if days <= warning_days:
+        return "Warning"
+    return None
+
+
+def build_alerts(product_to_category: dict, product_info: dict, purchases, usages, expiration_date, forecast,
+                 critical_days: int, warning_days: int, current_date: datetime = None) -> dict:
+    """
+    Expiration and projected run out alerts for every categorized product, soonest first.
+    purchases and usages map product ids to totals, expiration_date(product_id) gives the date string or None,
+    and forecast (a UsageForecast) gives each product's daily usage rate.
+    """
+    current_date = current_date or datetime.now()
+    forecast.advance(current_date)
+    alerts = []  # (effective date, alert) pairs, so sorting never re-parses the date strings
+    for product_id, category_name in product_to_category.items():
+        product_name = product_info.get(product_id, {}).get("name", "Unknown")
+        unit_of_measurement = product_info.get(product_id, {}).get("unit", "unit")
+
+        # check expiration date
+        expiration_date_str = expiration_date(product_id)
+        if expiration_date_str:
+            effective_date = parse_date(expiration_date_str)
+            days_to_expire = (effective_date - current_date).days
+            urgency = urgency_for(days_to_expire, critical_days, warning_days) if days_to_expire else None
+            if urgency:
+                alerts.append((effective_date, {
+                    "urgency": urgency,
+                    "type": "Expiration",
+                    "category": category_name,
+                    "product": product_name,
+                    "unit-of-measurement": unit_of_measurement,
+                    "effective-date": expiration_date_str
+                }))
+
+        total_purchases = purchases.get(product_id, 0)
+        total_usages = usages.get(product_id, 0)
+
+        # recent daily usage
+        avg_daily_usage = forecast.rate(product_id) if total_usages > 0 else 0
+
+        # remaining
+        remaining_stock = total_purchases - total_usages
+
+        if avg_daily_usage > 0 and remaining_stock > 0:
+            runout_date = current_date + timedelta(days=remaining_stock / avg_daily_usage)
+            urgency = urgency_for((runout_date - current_date).days, critical_days, warning_days)
+            if urgency:
+                effective_date_str = runout_date.strftime("%Y-%m-%d")
+                alerts.append((parse_date(effective_date_str), {
+                    "urgency": urgency,
+                    "type": "Projected Run Out",
+                    "category": category_name,
+                    "product": product_name,
+                    "unit-of-measurement": unit_of_measurement,
+                    "effective-date": effective_date_str
+                }))
+
+    # return sorted alerts
+    alerts.sort(key=lambda pair: pair[0])
+    return {"alerts": [alert for _, alert in alerts]}
@@ -0,0 +1,179 @@
+# times alert generation on synthetic tables, old nested order scan against the single-pass index
+# usage: python benchmark_alerts.py [orders] [products]
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+from collections import defaultdict
+
+from alerts import index_records, build_alerts
+from aggregates import InventoryAggregates
+from forecast import UsageForecast
+
+CRITICAL_DAYS = 7
+WARNING_DAYS = 30
+USAGE_PERIOD_DAYS = 90
+
+
+def make_tables(order_count: int, product_count: int, seed: int = 1):
+    """Airtable-shaped records: a fifth of the products are never ordered, like discontinued stock."""
+    rng = random.Random(seed)
+    today = datetime(2024, 6, 1)
+    product_ids = [f"rec{i:06d}" for i in range(product_count)]
+    ordered = product_ids[:product_count * 4 // 5]
+    categories = [
+        {"id": f"cat{c}", "fields": {"id": c, "name": f"Category {c}", "products": product_ids[c::10]}}
+        for c in range(10)
+    ]
+    products = [
+        {"id": product_id, "fields": {"name": f"Product {i}", "unit-of-measurement": "case"}}
+        for i, product_id in enumerate(product_ids)
+    ]
+    orders = []
+    for i in range(order_count):
+        order_date = today - timedelta(days=rng.randrange(365))
+        orders.append({"id": f"ord{i}", "fields": {
+            "product": [rng.choice(ordered)],
+            "amount": rng.randrange(1, 50),
+            "order-date": order_date.strftime("%Y-%m-%d"),
+            "expiration-date": (today + timedelta(days=rng.randrange(-5, 120))).strftime("%Y-%m-%d")
+        }})
+    usages = []
+    for i in range(order_count // 2):
+        usage_date = today - timedelta(days=rng.randrange(USAGE_PERIOD_DAYS))
+        usages.append({"id": f"use{i}", "fields": {
+            "product": [rng.choice(ordered)],
+            "amount": rng.randrange(1, 90),
+            "usage-date": usage_date.strftime("%Y-%m-%d")
+        }})
+    return categories, products, orders, usages, today
+
+
+def nested_scan_alerts(categories, products, orders, usages, current_date):
+    """
+    The original parse_table_json: totals in separate passes, then every order rescanned per product,
+    and run outs projected from all time usage spread over USAGE_PERIOD_DAYS.
+    """
+    alerts = []
+    product_to_category = {}
+    for category in categories:
+        for product_id in category['fields'].get('products', []):
+            product_to_category[product_id] = category['fields']['name']
+    product_info = {}
+    for product in products:
+        product_info[product['id']] = {
+            "name": product['fields'].get('name', 'Unknown Product'),
+            "unit": product['fields'].get('unit-of-measurement', 'unit')
+        }
+    product_purchases = defaultdict(float)
+    for order in orders:
+        for product_id in order['fields'].get('product', []):
+            product_purchases[product_id] += order['fields'].get('amount', 0)
+    product_usages = defaultdict(float)
+    for usage in usages:
+        for product_id in usage['fields'].get('product', []):
+            product_usages[product_id] += usage['fields'].get('amount', 0)
+
+    for product_id, category_name in product_to_category.items():
+        product_name = product_info.get(product_id, {}).get("name", "Unknown")
+        unit_of_measurement = product_info.get(product_id, {}).get("unit", "unit")
+        expiration_date_str = None
+        days_to_expire = None
+        for order in orders:
+            if product_id in order['fields'].get('product', []):
+                expiration_date_str = order['fields'].get('expiration-date')
+                if expiration_date_str:
+                    days_to_expire = (datetime.strptime(expiration_date_str, "%Y-%m-%d") - current_date).days
+                    break
+        if days_to_expire:
+            urgency = "Critical" if days_to_expire <= CRITICAL_DAYS else "Warning" if days_to_expire <= WARNING_DAYS else None
+            if urgency:
+                alerts.append({
+                    "urgency": urgency,
+                    "type": "Expiration",
+                    "category": category_name,
+                    "product": product_name,
+                    "unit-of-measurement": unit_of_measurement,
+                    "effective-date": expiration_date_str
+                })
+        total_purchases = product_purchases.get(product_id, 0)
+        total_usages = product_usages.get(product_id, 0)
+        avg_daily_usage = total_usages / USAGE_PERIOD_DAYS if total_usages > 0 else 0
+        remaining_stock = total_purchases - total_usages
+        if avg_daily_usage > 0 and remaining_stock > 0:
+            runout_date = current_date + timedelta(days=remaining_stock / avg_daily_usage)
+            days_to_runout = (runout_date - current_date).days
+            urgency = "Critical" if days_to_runout <= CRITICAL_DAYS else "Warning" if days_to_runout <= WARNING_DAYS else None
+            if urgency:
+                alerts.append({
+                    "urgency": urgency,
+                    "type": "Projected Run Out",
+                    "category": category_name,
+                    "product": product_name,
+                    "unit-of-measurement": unit_of_measurement,
+                    "effective-date": runout_date.strftime("%Y-%m-%d")
+                })
+    alerts.sort(key=lambda alert: datetime.strptime(alert["effective-date"], "%Y-%m-%d"))
+    return {"alerts": alerts}
+
+
+def indexed_alerts(categories, products, orders, usages, current_date):
+    """Alerts from a single pass over whole tables, as the aggregates build them."""
+    product_to_category = {}
+    for category in categories:
+        for product_id in category['fields'].get('products', []):
+            product_to_category[product_id] = category['fields']['name']
+    product_info = {
+        product['id']: {
+            "name": product['fields'].get('name', 'Unknown Product'),
+            "unit": product['fields'].get('unit-of-measurement', 'unit')
+        }
+        for product in products
+    }
+    index = index_records(orders, usages, UsageForecast(USAGE_PERIOD_DAYS))
+    return build_alerts(
+        product_to_category, product_info, index.purchases, index.usages, index.expiration_date, index.forecast,
+        CRITICAL_DAYS, WARNING_DAYS, current_date
+    )
+
+
+def timed(function, *args):
+    start = time.perf_counter()
+    result = function(*args)
+    return result, time.perf_counter() - start
+
+
+if __name__ == '__main__':
+    order_count = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    product_count = int(sys.argv[2]) if len(sys.argv) > 2 else 1_000
+    categories, products, orders, usages, today = make_tables(order_count, product_count)
+    print(f"{order_count} orders, {len(usages)} usages, {product_count} products")
+
+    old, old_time = timed(nested_scan_alerts, categories, products, orders, usages, today)
+    new, new_time = timed(indexed_alerts, categories, products, orders, usages, today)
+
+    aggregates = InventoryAggregates(CRITICAL_DAYS, WARNING_DAYS, USAGE_PERIOD_DAYS)
+    aggregates.build(categories, products, orders, usages)
+    incremental, incremental_time = timed(aggregates.table_json, today)
+
+    # run outs now come from the usage forecast, so only expirations still line up with the old scan
+    def expirations(alerts):
+        return [alert for alert in alerts['alerts'] if alert['type'] == 'Expiration']
+
+    assert expirations(new) == expirations(old), "single-pass expiration alerts differ from the nested scan"
+    assert incremental == new, "aggregate alerts differ from the single pass"
+    print(f"{len(new['alerts'])} alerts, identical from the single pass and the aggregates, "
+          f"{len(expirations(new))} expirations matching the nested scan")
+    print(f"nested scan:  {old_time * 1000:9.1f} ms")
+    print(f"single pass:  {new_time * 1000:9.1f} ms  ({old_time / new_time:.1f}x faster)")
+    print(f"aggregates:   {incremental_time * 1000:9.1f} ms  (per request, once built)")
+
+    try:
+        from frames import FrameEngine  # pandas is only needed for the frames engine
+    except ImportError:
+        sys.exit(0)
+    engine = FrameEngine(CRITICAL_DAYS, WARNING_DAYS, USAGE_PERIOD_DAYS)
+    _, load_time = timed(engine.load, categories, products, orders, usages)
+    framed, framed_time = timed(engine.table_json, categories, products, orders, usages, today)
+    assert framed == new, "frame alerts differ from the single pass"
+    print(f"frames:       {framed_time * 1000:9.1f} ms  (per request, after a {load_time:.2f}s load)")
@@ -0,0 +1,122 @@
+import asyncio
+import time
+from collections import defaultdict
+from contextlib import nullcontext
+
+
+class TableCache:
+    """
+    Whole-table cache shared by every dashboard request.
+    - fresh entries (younger than the table's ttl) are served straight from memory
+    - stale entries (up to stale_seconds past the ttl) are served while one background refresh runs
+    - concurrent misses on the same table wait on a single fetch
+    - writes invalidate the table so the next read fetches it again
+    """
+
+    def __init__(self, fetch, ttls: dict = None, default_ttl: float = 60, stale_seconds: float = 300, background=nullcontext):
+        # fetch is a coroutine function taking a table name and returning its list of records,
+        # background a context manager the refreshes behind stale reads are started in
+        self.fetch = fetch
+        self.background = background
+        self.ttls = ttls or {}
+        self.default_ttl = default_ttl
+        self.stale_seconds = stale_seconds
+        self.entries = {}       # table -> (records, fetched_at)
+        self.inflight = {}      # table -> future of the fetch every waiter shares
+        self.generations = defaultdict(int)  # bumped on invalidate so fetches started before a write are dropped
+        self.tasks = set()      # every running fetch, kept so they aren't garbage collected
+        self.counts = defaultdict(lambda: defaultdict(int))
+
+    def ttl(self, table: str) -> float:
+        return self.ttls.get(table, self.default_ttl)
+
+    async def get(self, table: str) -> list:
+        entry = self.entries.get(table)
+        if entry is not None:
+            records, fetched_at = entry
+            age = time.monotonic() - fetched_at
+            if age < self.ttl(table):
+                self.counts[table]['hits'] += 1
+                return records
+            if age < self.ttl(table) + self.stale_seconds:
+                # serve what we have, refresh behind the scenes
+                self.counts[table]['stale_hits'] += 1
+                if table not in self.inflight:
+                    with self.background():
+                        self.start(table)
+                return records
+
+        if table in self.inflight:
+            self.counts[table]['coalesced'] += 1
+        else:
+            self.counts[table]['misses'] += 1
+        return await self.refresh(table)
+
+    async def refresh(self, table: str) -> list:
+        """Fetch a table, or join the fetch already in flight for it."""
+        future = self.inflight.get(table) or self.start(table)
+        # shielded so one reader disconnecting doesn't cancel the fetch for everyone else
+        return await asyncio.shield(future)
+
+    def start(self, table: str):
+        future = asyncio.ensure_future(self.load(table, self.generations[table]))
+        self.inflight[table] = future
+        self.tasks.add(future)
+        future.add_done_callback(lambda done: self.release(table, done))
+        return future
+
+    def release(self, table: str, future):
+        self.tasks.discard(future)
+        if self.inflight.get(table) is future:
+            del self.inflight[table]
+        # errors are counted in load and raised to any waiters, this keeps asyncio from warning about background ones
+        if not future.cancelled():
+            future.exception()
+
+    async def load(self, table: str, generation: int) -> list:
+        self.counts[table]['fetches'] += 1
+        try:
+            records = await self.fetch(table)
+        except Exception:
+            self.counts[table]['errors'] += 1
+            raise
+        # a write landed while this fetch was running, so don't cache what may be missing it
+        if self.generations[table] == generation:
+            self.entries[table] = (records, time.monotonic())
+        return records
+
+    def invalidate(self, *tables: str):
+        for table in tables:
+            self.counts[table]['invalidations'] += 1
+            self.generations[table] += 1
+            self.entries.pop(table, None)
+            # the next reader starts a fresh fetch instead of joining one that predates the write
+            self.inflight.pop(table, None)
+
+    def metrics(self) -> dict:
+        now = time.monotonic()
+        tables = {}
+        for table in sorted(set(self.counts) | set(self.entries)):
+            counts = self.counts[table]
+            reads = counts['hits'] + counts['stale_hits'] + counts['misses'] + counts['coalesced']
+            entry = self.entries.get(table)
+            tables[table] = {
+                "hits": counts['hits'],
+                "stale_hits": counts['stale_hits'],
+                "misses": counts['misses'],
+                "coalesced": counts['coalesced'],
+                "fetches": counts['fetches'],
+                "errors": counts['errors'],
+                "invalidations": counts['invalidations'],
+                "hit_ratio": (counts['hits'] + counts['stale_hits']) / reads if reads else 0.0,
+                "ttl_seconds": self.ttl(table),
+                "age_seconds": round(now - entry[1], 3) if entry else None,
+                "records": len(entry[0]) if entry else 0
+            }
+        return {"tables": tables}
+
+    async def close(self):
+        tasks = list(self.tasks)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
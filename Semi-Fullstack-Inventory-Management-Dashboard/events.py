@@ -0,0 +1,161 @@
+import asyncio
+import json
+from collections import Counter
+
+KEEPALIVE_SECONDS = 15  # comment lines that stop proxies from closing quiet streams
+
+
+def encode(event: str, data: dict, event_id: str = None) -> str:
+    # one server-sent event, data on a single line
+    lines = [f"event: {event}"]
+    if event_id is not None:
+        lines.append(f"id: {event_id}")
+    lines.append(f"data: {json.dumps(data, separators=(',', ':'))}")
+    return "\n".join(lines) + "\n\n"
+
+
+def alert_key(alert: dict) -> str:
+    return json.dumps(alert, sort_keys=True)
+
+
+def without_first(keys: list, counts: Counter) -> list:
+    # keys in order, less the first counts[key] of each, as a page removing the first match leaves them
+    skip = Counter(counts)
+    kept = []
+    for key in keys:
+        if skip[key]:
+            skip[key] -= 1
+        else:
+            kept.append(key)
+    return kept
+
+
+class DashboardEvents:
+    """
+    Pushes what changed on the dashboard to every open page over server-sent events.
+    - "reset" carries the full charts and alerts, sent when a page connects or falls too far behind
+    - "chart" carries the chart points that changed, the ones that are gone, and the positions of categories
+      that are new or moved
+    - "alerts" carries the alerts that appeared with their positions in the new list, and the ones that cleared,
+      so a page splicing them in ends up in the same order as a fresh load
+    Each change is diffed and encoded once and the same message goes to every page,
+    so an update costs the same however many dashboards are open.
+    current() is a coroutine function returning the dashboard's (chart_json, table_json) as it stands now.
+    Event ids are the version tagged with source (the worker process), since every worker counts its own versions
+    and a page reconnecting to another worker has to start over from a reset.
+    """
+
+    def __init__(self, current, queue_size: int = 100, source: str = ''):
+        self.current = current
+        self.queue_size = queue_size
+        self.source = source
+        self.version = 0
+        self.state = None       # (charts, points, alerts) the subscribers last saw, None while nobody is listening
+        self.subscribers = set()
+        # one diff at a time, so two publishes waiting on current() don't both diff against the same state
+        self.lock = asyncio.Lock()
+
+    async def capture(self):
+        chart_json, table_json = await self.current()
+        points = {
+            (chart['category'], point['month']): {"orders": point['orders'], "usages": point['usages']}
+            for chart in chart_json['charts'] for point in chart['data']
+        }
+        return chart_json['charts'], points, table_json['alerts']
+
+    def event_id(self) -> str:
+        return f"{self.source}/{self.version}"
+
+    def reset(self) -> str:
+        charts, _, alerts = self.state
+        return encode("reset", {"charts": charts, "alerts": alerts}, self.event_id())
+
+    async def publish(self):
+        """Diff the dashboard against what subscribers last saw and push the difference."""
+        async with self.lock:
+            self.diff_and_send(await self.capture() if self.subscribers else None)
+
+    def diff_and_send(self, captured):
+        if not self.subscribers:
+            # nothing to diff against, the next subscriber starts from a reset anyway
+            # (the version still moves, so a page reconnecting from before this doesn't skip it)
+            self.version += 1
+            self.state = None
+            return
+        old_charts, old_points, old_alerts = self.state
+        charts, points, alerts = captured
+
+        messages = []
+        changed = [
+            {"category": category, "month": month, **counts}
+            for (category, month), counts in points.items() if old_points.get((category, month)) != counts
+        ]
+        gone = [{"category": category, "month": month} for category, month in old_points.keys() - points.keys()]
+        # new categories go where the server has them, like added alerts
+        old_order = [chart['category'] for chart in old_charts]
+        new_order = [chart['category'] for chart in charts]
+        kept = set(old_order) & set(new_order)
+        if [category for category in old_order if category in kept] == [category for category in new_order if category in kept]:
+            placed = set(new_order) - kept
+        else:
+            # the charts that stayed moved around each other, so every chart is given its place
+            placed = set(new_order)
+        categories = [{"category": category, "position": position} for position, category in enumerate(new_order) if category in placed]
+        if changed or gone or categories:
+            messages.append(("chart", {"points": changed, "removed": gone, "categories": categories}))
+
+        # alerts are compared as multisets, two identical alerts can both be on the table
+        old_keys = [alert_key(alert) for alert in old_alerts]
+        new_keys = [alert_key(alert) for alert in alerts]
+        cleared = Counter(old_keys) - Counter(new_keys)
+        added = Counter(new_keys) - Counter(old_keys)
+        # added takes the first of each duplicate below, so both sides keep the later ones
+        if without_first(old_keys, cleared) != without_first(new_keys, added):
+            # the alerts that stayed moved around each other, so the page replaces its whole list
+            cleared, added = Counter(old_keys), Counter(new_keys)
+        if added or cleared:
+            positions, added_alerts = [], []
+            for position, (key, alert) in enumerate(zip(new_keys, alerts)):
+                if added[key]:
+                    added[key] -= 1
+                    positions.append(position)
+                    added_alerts.append(alert)
+            messages.append(("alerts", {
+                "added": added_alerts,
+                "positions": positions,
+                "removed": [json.loads(key) for key in cleared.elements()]
+            }))
+
+        if not messages:
+            return
+        self.version += 1
+        self.state = (charts, points, alerts)
+        encoded = "".join(encode(event, data, self.event_id()) for event, data in messages)
+        for queue in self.subscribers:
+            try:
+                queue.put_nowait(encoded)
+            except asyncio.QueueFull:
+                # a page that can't keep up skips the backlog and starts over from a reset
+                while not queue.empty():
+                    queue.get_nowait()
+                queue.put_nowait(None)
+
+    async def stream(self, last_event_id: str = None):
+        """Server-sent event stream for one page. A page reconnecting to this worker at its current version skips the reset."""
+        queue = asyncio.Queue(self.queue_size)
+        async with self.lock:
+            if self.state is None:
+                self.state = await self.capture()
+            self.subscribers.add(queue)
+        try:
+            if last_event_id != self.event_id():
+                yield self.reset()
+            while True:
+                try:
+                    message = await asyncio.wait_for(queue.get(), KEEPALIVE_SECONDS)
+                except asyncio.TimeoutError:
+                    yield ": keepalive\n\n"
+                    continue
+                yield self.reset() if message is None else message
+        finally:
+            self.subscribers.discard(queue)
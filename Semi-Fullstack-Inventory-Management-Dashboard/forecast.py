@@ -0,0 +1,103 @@
+from array import array
+from datetime import datetime
+
+from alerts import parse_date
+
+HALF_LIFE_DAYS = 14  # a day's usage counts half as much toward the weighted rate two weeks later
+
+
+class UsageHistory:
+    """One product's daily usage for the days in the window ending at `day`."""
+    __slots__ = ('days', 'day', 'total', 'weighted', 'pending')
+
+    def __init__(self, window_days: int):
+        self.days = array('d', bytes(8 * window_days))  # ring buffer, day number % window_days -> usage that day
+        self.day = None         # last day in the window, None until the forecast has a today
+        self.total = 0.0        # sum of the window
+        self.weighted = 0.0     # exponentially weighted sum of the window, today weighted most
+        self.pending = {}       # day number -> usage dated after `day`, added once the window reaches it
+
+
+class UsageForecast:
+    """
+    Daily usage rates per product over a rolling window, for run out projections.
+    - each product's last window_days days sit in a ring buffer indexed by day number, with the window's total
+      and exponentially weighted total kept alongside, so adding or taking back a usage is O(1)
+    - moving the window to a new day takes one O(1) step per day (at most window_days), done per product when
+      it's next touched, so a day rolling over doesn't walk every product at once
+    - usage dated after today waits until its day comes, usage from before the window is ignored
+    rate() is the larger of the window's daily mean and the weighted daily rate,
+    so a product whose usage has picked up is projected at its recent pace rather than its average.
+    """
+
+    def __init__(self, window_days: int, half_life_days: float = HALF_LIFE_DAYS):
+        self.window_days = window_days
+        decay = 0.5 ** (1 / half_life_days)
+        self.decay = decay
+        self.weights = [(1 - decay) * decay ** age for age in range(window_days + 1)]  # age in days -> weight
+        self.normalizer = 1 - decay ** window_days  # the weights over the window sum to this
+        self.today = None       # day number the rates are for, set by advance()
+        self.histories = {}     # product id -> UsageHistory
+
+    def add(self, product_id: str, usage_date: str, amount: float):
+        """Count a usage, or take one back with a negative amount."""
+        history = self.history(product_id)
+        day = parse_date(usage_date).toordinal()
+        if history.day is None or day > history.day:
+            history.pending[day] = history.pending.get(day, 0.0) + amount
+            return
+        self.put(history, day, amount)
+
+    def put(self, history: UsageHistory, day: int, amount: float):
+        age = history.day - day
+        if age >= self.window_days:
+            return
+        history.days[day % self.window_days] += amount
+        history.total += amount
+        history.weighted += self.weights[age] * amount
+
+    def history(self, product_id: str) -> UsageHistory:
+        history = self.histories.get(product_id)
+        if history is None:
+            history = self.histories[product_id] = UsageHistory(self.window_days)
+        self.roll(history)
+        return history
+
+    def roll(self, history: UsageHistory):
+        # move a product's window up to today, dropping the days that fall out of it
+        if self.today is None or history.day == self.today:
+            return
+        if history.day is None or self.today - history.day >= self.window_days:
+            history.days = array('d', bytes(8 * self.window_days))
+            history.total = history.weighted = 0.0
+        elif self.today > history.day:
+            days, dropped_weight = history.days, self.weights[self.window_days]
+            for day in range(history.day + 1, self.today + 1):
+                slot = day % self.window_days
+                # every day ages by one, and the one that was window_days ago leaves
+                history.weighted = history.weighted * self.decay - days[slot] * dropped_weight
+                history.total -= days[slot]
+                days[slot] = 0.0
+        else:
+            # the window never moves back, an earlier today is answered as of the later one
+            return
+        history.day = self.today
+        if history.pending:
+            for day in sorted(day for day in history.pending if day <= self.today):
+                self.put(history, day, history.pending.pop(day))
+
+    def advance(self, current_date: datetime = None):
+        """Make current_date (now by default) the last day of every product's window."""
+        today = (current_date or datetime.now()).toordinal()
+        if self.today is None or today > self.today:
+            self.today = today
+
+    def rate(self, product_id: str) -> float:
+        """Projected daily usage of a product as of the last advance()."""
+        if product_id not in self.histories:
+            return 0.0
+        history = self.history(product_id)
+        if history.day is None:
+            return 0.0
+        # running sums can drift a hair below zero after usages are taken back out
+        return max(history.total / self.window_days, history.weighted / self.normalizer, 0.0)
@@ -0,0 +1,170 @@
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+
+from forecast import UsageForecast, HALF_LIFE_DAYS
+
+
+def categories_frame(categories: list):
+    """
+    Category names in table order, and one row per categorized product.
+    Like the parsers' dicts, a product listed twice belongs to the later category but keeps its first position.
+    """
+    category_names = {}
+    product_categories = {}
+    for category in categories:
+        category_id = category['fields']['id']
+        category_names[category_id] = category['fields']['name']
+        for product_id in category['fields'].get('products', []):
+            product_categories[product_id] = (category_id, category['fields']['name'])
+    frame = pd.DataFrame(
+        [(product_id, category_id, name) for product_id, (category_id, name) in product_categories.items()],
+        columns=['product', 'category_id', 'category']
+    )
+    return category_names, frame
+
+
+def products_frame(products: list):
+    return pd.DataFrame({
+        'product': [product['id'] for product in products],
+        'name': [product['fields'].get('name', 'Unknown Product') for product in products],
+        'unit': [product['fields'].get('unit-of-measurement', 'unit') for product in products]
+    }).drop_duplicates('product', keep='last')
+
+
+def lines_frame(records: list, date_field: str, expirations: bool = False):
+    """One row per product on each record, in record order, with the record's date already parsed into a month."""
+    counts = [len(record['fields'].get('product', [])) for record in records]
+    frame = pd.DataFrame({
+        'product': [product_id for record in records for product_id in record['fields'].get('product', [])],
+        'amount': np.repeat(np.array([record['fields'].get('amount', 0) for record in records], dtype=float), counts),
+        'date': np.repeat(np.array([record['fields'][date_field] for record in records], dtype=object), counts)
+    })
+    # every date is parsed in one go rather than one strptime per record
+    frame['month'] = pd.to_datetime(frame['date'], format='%Y-%m-%d').dt.strftime('%Y-%m')
+    if expirations:
+        frame['expiration'] = np.repeat(
+            np.array([record['fields'].get('expiration-date') or None for record in records], dtype=object), counts
+        )
+    return frame
+
+
+class FrameEngine:
+    """
+    Chart and alert computation over whole tables held as pandas frames, for tables too big to walk record by record.
+    chart_json and table_json give the same output as InventoryAggregates.
+    """
+
+    def __init__(self, critical_days: int, warning_days: int, usage_period_days: int, half_life_days: float = HALF_LIFE_DAYS):
+        self.critical_days = critical_days
+        self.warning_days = warning_days
+        self.usage_period_days = usage_period_days
+        self.half_life_days = half_life_days
+        self.sources = {}   # table kind -> (records list it was built from, frame)
+
+    def frame(self, kind: str, records: list, build):
+        # records lists are only ever replaced by the cache, never changed, so the same list means the same frame
+        source = self.sources.get(kind)
+        if source is None or source[0] is not records:
+            source = (records, build(records))
+            self.sources[kind] = source
+        return source[1]
+
+    def load(self, categories: list, products: list, orders: list, usages: list):
+        return (
+            self.frame('categories', categories, categories_frame),
+            self.frame('products', products, products_frame),
+            self.frame('orders', orders, lambda records: lines_frame(records, 'order-date', expirations=True)),
+            self.frame('usages', usages, lambda records: lines_frame(records, 'usage-date'))
+        )
+
+    def chart_json(self, categories: list, orders: list, usages: list) -> dict:
+        category_names, product_categories = self.frame('categories', categories, categories_frame)
+        order_lines = self.frame('orders', orders, lambda records: lines_frame(records, 'order-date', expirations=True))
+        usage_lines = self.frame('usages', usages, lambda records: lines_frame(records, 'usage-date'))
+        # the parsers skip falsy category ids when counting
+        category_map = product_categories[product_categories['category_id'].astype(bool)]
+        category_map = category_map.set_index('product')['category_id']
+
+        def monthly(lines):
+            categorized = lines.assign(category_id=lines['product'].map(category_map)).dropna(subset=['category_id'])
+            return categorized.groupby(['category_id', 'month']).size()
+
+        counts = pd.concat({'orders': monthly(order_lines), 'usages': monthly(usage_lines)}, axis=1).fillna(0).astype(int)
+        charts = []
+        for category_id, category_name in category_names.items():
+            if category_id not in counts.index.get_level_values(0):
+                continue
+            months = counts.xs(category_id, level=0).sort_index()
+            data = [
+                {"month": month, "orders": int(orders_count), "usages": int(usages_count)}
+                for month, orders_count, usages_count in zip(months.index, months['orders'], months['usages'])
+            ]
+            charts.append({"category": category_name, "data": data})
+        return {"charts": charts}
+
+    def usage_rates(self, usage_lines, current_date: datetime) -> dict:
+        # daily usage within the forecast window, summed per product and day before it goes into the forecast
+        window_start = (current_date - timedelta(days=self.usage_period_days)).strftime("%Y-%m-%d")
+        daily = usage_lines[usage_lines['date'] > window_start].groupby(['product', 'date'])['amount'].sum()
+        forecast = UsageForecast(self.usage_period_days, self.half_life_days)
+        for (product_id, usage_date), amount in daily.items():
+            forecast.add(product_id, usage_date, amount)
+        forecast.advance(current_date)
+        return {product_id: forecast.rate(product_id) for product_id in forecast.histories}
+
+    def table_json(self, categories: list, products: list, orders: list, usages: list, current_date: datetime = None) -> dict:
+        (_, product_categories), product_info, order_lines, usage_lines = self.load(categories, products, orders, usages)
+        current_date = current_date or datetime.now()
+        rates = self.usage_rates(usage_lines, current_date)
+        current_date = pd.Timestamp(current_date)
+
+        table = product_categories.merge(product_info, on='product', how='left')
+        table['name'] = table['name'].fillna('Unknown')
+        table['unit'] = table['unit'].fillna('unit')
+        table['purchases'] = table['product'].map(order_lines.groupby('product')['amount'].sum()).fillna(0.0)
+        table['usages'] = table['product'].map(usage_lines.groupby('product')['amount'].sum()).fillna(0.0)
+        # the first listed order that has an expiration date
+        first_expirations = order_lines.dropna(subset=['expiration']).drop_duplicates('product', keep='first')
+        table['expiration'] = table['product'].map(first_expirations.set_index('product')['expiration'])
+
+        # expiration alerts, a zero day difference never raises one (as in the parsers)
+        expiration_dates = pd.to_datetime(table['expiration'], format='%Y-%m-%d')
+        days_to_expire = (expiration_dates - current_date).dt.days
+        expiring = table.assign(
+            effective=expiration_dates, days=days_to_expire, date=table['expiration'], type='Expiration', kind=0
+        )[days_to_expire.notna() & (days_to_expire != 0)]
+
+        # run out projections as array math, rounded to the microsecond like timedelta(days=...)
+        avg_daily_usage = table['product'].map(rates).fillna(0.0).where(table['usages'] > 0, 0.0)
+        remaining_stock = table['purchases'] - table['usages']
+        projected = (avg_daily_usage > 0) & (remaining_stock > 0)
+        days_until_runout = (remaining_stock / avg_daily_usage).where(projected, 0.0)
+        runout_offsets = pd.to_timedelta((days_until_runout * 86_400_000_000).round().astype('int64'), unit='us')
+        runout_dates = current_date + runout_offsets
+        running_out = table.assign(
+            effective=runout_dates.dt.normalize(), days=runout_offsets.dt.days,
+            date=runout_dates.dt.strftime('%Y-%m-%d'), type='Projected Run Out', kind=1
+        )[projected]
+
+        alerts = pd.concat([expiring, running_out])
+        alerts['urgency'] = np.select(
+            [alerts['days'] <= self.critical_days, alerts['days'] <= self.warning_days], ['Critical', 'Warning'], None
+        )
+        alerts = alerts[alerts['urgency'].notna()]
+        # same order as the parsers: by date, then product position, then expiration before run out
+        alerts = alerts.assign(position=alerts.index).sort_values(['effective', 'position', 'kind'], kind='stable')
+        return {"alerts": [
+            {
+                "urgency": urgency,
+                "type": alert_type,
+                "category": category,
+                "product": name,
+                "unit-of-measurement": unit,
+                "effective-date": date
+            }
+            for urgency, alert_type, category, name, unit, date in zip(
+                alerts['urgency'], alerts['type'], alerts['category'], alerts['name'], alerts['unit'], alerts['date']
+            )
+        ]}
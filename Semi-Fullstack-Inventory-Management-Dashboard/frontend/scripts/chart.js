@@ -1,23 +1,39 @@
-// fetch from internal API
-async function fetchChartData() {
-  try {
-    const response = await fetch('/api/dashboard-chart-data');
-    const data = await response.json();
-    processChartData(data);
-  } catch (error) {
-    console.error('Error fetching chart data:', error);
-  }
-}
+// charts are drawn by live.js, from the server-sent reset and the updates after it
+
+// charts on the page by category, {wrapper, chart}, kept so a redraw updates them rather than starting over
+const renderedCharts = new Map();
 
 // process data
 function processChartData(data) {
   const months = getLast12Months(data.charts);
+  const chartContainer = document.getElementById('charts-section');
+
+  // drop charts for categories that are gone, destroying them so chart.js lets go of them
+  const categories = new Set(data.charts.map(chartData => chartData.category));
+  renderedCharts.forEach((rendered, category) => {
+    if (!categories.has(category)) {
+      rendered.chart.destroy();
+      rendered.wrapper.remove();
+      renderedCharts.delete(category);
+    }
+  });
 
   data.charts.forEach((chartData, index) => {
-    const chartContainer = document.getElementById('charts-section');
-    
+    const formattedData = formatDataForChart(chartData.data, months);
+    const rendered = renderedCharts.get(chartData.category);
+    if (rendered) {
+      // same chart, new numbers
+      rendered.chart.data.labels = formatMonths(months);
+      rendered.chart.data.datasets[0].data = formattedData.map(d => d.purchased);
+      rendered.chart.data.datasets[1].data = formattedData.map(d => d.used);
+      rendered.chart.update();
+      chartContainer.appendChild(rendered.wrapper);  // keeps the wrappers in data order
+      return;
+    }
+
     // create div for each chart
     const chartWrapper = document.createElement('div');
+    chartWrapper.className = 'chart-wrapper';
     chartWrapper.style.marginTop = '10px';
     chartWrapper.style.marginBottom = '100px';
     chartWrapper.style.marginLeft = '30px';
@@ -38,8 +54,8 @@ function processChartData(data) {
     chartContainer.appendChild(chartWrapper);  // add wrapper to container
 
     const ctx = canvas.getContext('2d');
-    const formattedData = formatDataForChart(chartData.data, months);
-    createChart(ctx, formattedData, 'Purchase Frequency', 'Usage Frequency', '#afcd6d', '#4289cf', months);
+    const chart = createChart(ctx, formattedData, 'Purchase Frequency', 'Usage Frequency', '#afcd6d', '#4289cf', months);
+    renderedCharts.set(chartData.category, { wrapper: chartWrapper, chart: chart });
   });
 }
 
@@ -83,16 +99,20 @@ function formatDataForChart(chartData, months) {
 
 
 
-// make charts
-function createChart(ctx, data, label1, label2, color1, color2, months) {
-  const formattedMonths = months.map(month => {
+// yyyy-mm to mon-yy labels
+function formatMonths(months) {
+  return months.map(month => {
     const [year, monthStr] = month.split('-');
     const formattedMonth = new Date(year, parseInt(monthStr, 10) - 1);  // convert to date object
     return `${formattedMonth.toLocaleString('default', { month: 'short' })}-${year.slice(2)}`; // mon-yy
   });
+}
 
+// make charts
+function createChart(ctx, data, label1, label2, color1, color2, months) {
+  const formattedMonths = formatMonths(months);
 
-  new Chart(ctx, {
+  return new Chart(ctx, {
     type: 'bar',
     data: {
       labels: formattedMonths, // months on x-axis
@@ -151,6 +171,3 @@ function createChart(ctx, data, label1, label2, color1, color2, months) {
   });
 }
 
-
-// main entry
-fetchChartData();
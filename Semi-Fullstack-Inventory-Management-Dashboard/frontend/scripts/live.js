@@ -0,0 +1,89 @@
+// live updates pushed by the server, applied to what the page already shows
+(function () {
+    let charts = [];  // [{category, data: [{month, orders, usages}]}]
+    let alerts = [];
+
+    function renderCharts() {
+        processChartData({ charts: charts });
+    }
+
+    function renderAlerts() {
+        if (window.populateAlertsTable) {
+            window.populateAlertsTable(alerts);
+        }
+    }
+
+    // full state, sent on connect or after falling behind
+    function onReset(event) {
+        const data = JSON.parse(event.data);
+        charts = data.charts;
+        alerts = data.alerts;
+        renderCharts();
+        renderAlerts();
+    }
+
+    // chart points that changed or are gone, and where new or moved categories go
+    function onChart(event) {
+        const data = JSON.parse(event.data);
+        const fresh = new Map();  // charts for categories the page doesn't have yet, placed below
+        data.removed.forEach(point => {
+            const chart = charts.find(chart => chart.category === point.category);
+            if (chart) {
+                chart.data = chart.data.filter(item => item.month !== point.month);
+            }
+        });
+        data.points.forEach(point => {
+            let chart = charts.find(chart => chart.category === point.category) || fresh.get(point.category);
+            if (!chart) {
+                chart = { category: point.category, data: [] };
+                fresh.set(point.category, chart);
+            }
+            const existing = chart.data.find(item => item.month === point.month);
+            if (existing) {
+                existing.orders = point.orders;
+                existing.usages = point.usages;
+            } else {
+                chart.data.push({ month: point.month, orders: point.orders, usages: point.usages });
+                chart.data.sort((a, b) => a.month.localeCompare(b.month));
+            }
+        });
+        charts = charts.filter(chart => chart.data.length > 0);
+        // in increasing order, so every chart before a position is already in place
+        data.categories.forEach(({ category, position }) => {
+            let chart = fresh.get(category);
+            if (!chart) {
+                const index = charts.findIndex(chart => chart.category === category);
+                if (index === -1) {
+                    return;
+                }
+                chart = charts.splice(index, 1)[0];
+            }
+            charts.splice(position, 0, chart);
+        });
+        renderCharts();
+    }
+
+    // alerts that appeared or cleared
+    function onAlerts(event) {
+        const data = JSON.parse(event.data);
+        const sameAlert = (a, b) => ['urgency', 'type', 'category', 'product', 'unit-of-measurement', 'effective-date'].every(key => a[key] === b[key]);
+        data.removed.forEach(removed => {
+            const index = alerts.findIndex(alert => sameAlert(alert, removed));
+            if (index !== -1) {
+                alerts.splice(index, 1);
+            }
+        });
+        // each new alert goes where the server has it, in increasing order so earlier ones are already in place
+        data.added.forEach((alert, i) => alerts.splice(data.positions[i], 0, alert));
+        renderAlerts();
+    }
+
+    // main entry, the first reset draws the page and the browser reconnects on its own, resuming from the last event id
+    // (opened once the table script has set up populateAlertsTable)
+    document.addEventListener('DOMContentLoaded', function () {
+        const source = new EventSource('/api/dashboard-events');
+        source.addEventListener('reset', onReset);
+        source.addEventListener('chart', onChart);
+        source.addEventListener('alerts', onAlerts);
+    });
+})();
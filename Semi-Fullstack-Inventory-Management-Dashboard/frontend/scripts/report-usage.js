@@ -16,6 +16,27 @@ async function fetchProducts() {
     }
 }
 
+// type-ahead, products whose names start with the query
+async function searchProducts(query) {
+    try {
+        const response = await fetch(`/api/product-search?q=${encodeURIComponent(query)}&limit=50`);
+        if (response.ok) {
+            const data = await response.json();
+            return data.products;
+        } else {
+            console.error('Failed to search products');
+        }
+    } catch (error) {
+        console.error('Error searching products:', error);
+    }
+}
+
+// options for a product select
+function productOptions(products) {
+    return `<option value="" disabled selected>Select a Product</option>
+            ${products.map(product => `<option value="${product.id}" data-unit="${product.unit}">${product.name}</option>`).join('')}`;
+}
+
 // init product data and listener
 async function init() {
     const products = await fetchProducts();
@@ -40,9 +61,9 @@ function addItem(products) {
 
     const newItemHTML = `
         <label for="product-${itemCount}">Product</label>
+        <input type="search" id="product-search-${itemCount}" placeholder="Search for a product..." autocomplete="off">
         <select name="product-${itemCount}" id="product-${itemCount}" class="product-select" required>
-            <option value="" disabled selected>Select a Product</option>
-            ${products.map(product => `<option value="${product.id}" data-unit="${product.unit}">${product.name}</option>`).join('')}
+            ${productOptions(products)}
         </select>
 
         <label for="usage-date-${itemCount}">Usage Date</label>
@@ -62,13 +83,8 @@ function addItem(products) {
     // store item
     itemsList.push(newItem);
 
-    // Initialize Select2 for the new product select field
+    // Get the product select element for this item
     const productSelect = newItem.querySelector(`#product-${itemCount}`);
-    $(productSelect).select2({
-        width: '100%', // Make the dropdown match the full width
-        placeholder: "Search for a product...",
-        allowClear: true // Allow clearing selection
-    });
 
     // Update unit when a product is selected
     productSelect.addEventListener('change', function () {
@@ -81,6 +97,21 @@ function addItem(products) {
             unitSpan.textContent = '';  // Clear the unit if no product is selected
         }
     });
+
+    // narrow the select to the products matching what's typed
+    const searchInput = newItem.querySelector(`#product-search-${itemCount}`);
+    searchInput.addEventListener('input', async function () {
+        const query = searchInput.value;
+        const matches = query.trim() ? await searchProducts(query) : products;  // the whole list once cleared
+        if (!matches || searchInput.value !== query) {
+            return;  // failed, or a later keystroke's search takes over
+        }
+        productSelect.innerHTML = productOptions(matches);
+        if (matches.length === 1) {
+            productSelect.value = matches[0].id;
+        }
+        productSelect.dispatchEvent(new Event('change'));
+    });
 }
 
 
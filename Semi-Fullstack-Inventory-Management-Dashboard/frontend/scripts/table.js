@@ -1,16 +1,4 @@
 document.addEventListener("DOMContentLoaded", function() {
-    // get data
-    function fetchAlerts() {
-        fetch('/api/dashboard-table-data')
-            .then(response => response.json()) // response to JSON
-            .then(data => {
-                populateTable(data.alerts); // populate table
-            })
-            .catch(error => {
-                console.error('Error fetching alerts:', error);
-            });
-    }
-
     // populate table with alerts
     function populateTableRecursive(alerts, table) {
         if (alerts.length === 0) return; // default
@@ -64,6 +52,6 @@ document.addEventListener("DOMContentLoaded", function() {
     
     
 
-    // main entry when page loads
-    fetchAlerts();
+    // main entry, live.js draws the table through this from the server-sent reset and redraws it on updates
+    window.populateAlertsTable = populateTable;
 });
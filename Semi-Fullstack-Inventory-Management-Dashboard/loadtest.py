@@ -0,0 +1,182 @@
+# drives the dashboard's endpoints at increasing concurrency and reports latency percentiles and throughput
+# usage: python loadtest.py --mock                 (starts a mock airtable and the dashboard itself)
+#        python loadtest.py --url http://127.0.0.1:8000 --levels 1,10,50 --duration 10
+import argparse
+import asyncio
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import date
+
+import httpx
+
+# (weight, method, path) - mostly dashboard reads, with some report writes mixed in
+MIX = [
+    (4, 'GET', '/api/dashboard-chart-data'),
+    (4, 'GET', '/api/dashboard-table-data'),
+    (1, 'POST', '/api/purchase-report'),
+    (1, 'POST', '/api/usage-report'),
+]
+
+
+def percentile(sorted_values: list, fraction: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, round(fraction * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def report_body(path: str, product_ids: list, rng: random.Random) -> dict:
+    today = date.today().isoformat()
+    if path == '/api/purchase-report':
+        return {"items": [{"product": rng.choice(product_ids), "orderDate": today, "amount": str(rng.randrange(1, 20))}]}
+    return {"items": [{"product": rng.choice(product_ids), "usageDate": today, "amount": str(rng.randrange(1, 5))}]}
+
+
+async def worker(client: httpx.AsyncClient, deadline: float, product_ids: list, results: list, seed: int):
+    rng = random.Random(seed)
+    weights = [weight for weight, _, _ in MIX]
+    while time.perf_counter() < deadline:
+        _, method, path = rng.choices(MIX, weights)[0]
+        start = time.perf_counter()
+        try:
+            if method == 'GET':
+                response = await client.get(path)
+            else:
+                response = await client.post(path, json=report_body(path, product_ids, rng))
+            ok = response.status_code < 400
+        except httpx.HTTPError:
+            ok = False
+        results.append((path, time.perf_counter() - start, ok))
+
+
+async def run_level(url: str, concurrency: int, duration: float, product_ids: list) -> dict:
+    results = []
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=url, timeout=60, limits=limits) as client:
+        start = time.perf_counter()
+        deadline = start + duration
+        await asyncio.gather(*(worker(client, deadline, product_ids, results, seed) for seed in range(concurrency)))
+        elapsed = time.perf_counter() - start
+    latencies = sorted(latency for _, latency, _ in results)
+    return {
+        "concurrency": concurrency,
+        "requests": len(results),
+        "errors": sum(1 for _, _, ok in results if not ok),
+        "rps": len(results) / elapsed,
+        "p50": percentile(latencies, 0.50),
+        "p95": percentile(latencies, 0.95),
+        "p99": percentile(latencies, 0.99),
+        "by_path": {
+            path: percentile(sorted(latency for p, latency, _ in results if p == path), 0.95)
+            for _, _, path in MIX
+        }
+    }
+
+
+async def wait_for_workers(url: str, workers: int, timeout: float = 600):
+    # each worker warms up on its own, a new connection each time so the requests spread across them
+    ready = set()
+    deadline = time.time() + timeout
+    while len(ready) < workers:
+        if time.time() > deadline:
+            raise RuntimeError(f"only {len(ready)} of {workers} workers warmed up")
+        try:
+            async with httpx.AsyncClient(base_url=url, timeout=10) as client:
+                response = await client.get('/api/ready')
+            if response.status_code == 200:
+                ready.add(response.json()['worker'])
+        except httpx.HTTPError:
+            pass
+        await asyncio.sleep(0.1)
+
+
+async def load_test(url: str, levels: list, duration: float, workers: int = 1):
+    async with httpx.AsyncClient(base_url=url, timeout=120) as client:
+        # warm up, the first dashboard read builds everything (and may need a few tries past 429s)
+        for attempt in range(10):
+            try:
+                chart = await client.get('/api/dashboard-chart-data')
+                products = await client.get('/api/form-product-data')
+                if chart.status_code == 200 and products.status_code == 200:
+                    break
+            except httpx.HTTPError:
+                pass
+            await asyncio.sleep(1)
+        else:
+            raise RuntimeError("the dashboard never answered its first requests")
+    product_ids = [product['id'] for product in products.json()['products']]
+    if workers > 1:
+        await wait_for_workers(url, workers)
+
+    print(f"{'conc':>5} {'reqs':>7} {'errs':>5} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}   p95 ms by endpoint")
+    for concurrency in levels:
+        level = await run_level(url, concurrency, duration, product_ids)
+        by_path = "  ".join(f"{path.rsplit('/', 1)[-1]}={latency * 1000:.0f}" for path, latency in level['by_path'].items())
+        print(f"{level['concurrency']:>5} {level['requests']:>7} {level['errors']:>5} {level['rps']:>8.1f} "
+              f"{level['p50'] * 1000:>8.1f} {level['p95'] * 1000:>8.1f} {level['p99'] * 1000:>8.1f}   {by_path}")
+        # what the airtable queue looked like, from whichever worker answers
+        async with httpx.AsyncClient(base_url=url, timeout=10) as client:
+            metrics = (await client.get('/api/airtable-metrics')).json()
+        waits = "  ".join(f"{name}={wait['p95']:.0f}" for name, wait in metrics['wait_ms'].items())
+        print(f"      airtable: sent {sum(metrics['sent'].values())}, shared {metrics['deduplicated']}, "
+              f"retried {metrics['retries']}, throttled {metrics['throttled']}, queue p95 ms {waits}")
+
+
+def wait_for(url: str, timeout: float = 60):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            httpx.get(url, timeout=1)
+            return
+        except httpx.HTTPError:
+            time.sleep(0.2)
+    raise RuntimeError(f"{url} didn't come up")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Load test the dashboard's endpoints.")
+    parser.add_argument('--url', default='http://127.0.0.1:8000', help="dashboard to test")
+    parser.add_argument('--levels', default='1,5,10,25,50', help="comma separated concurrency levels")
+    parser.add_argument('--duration', type=float, default=10, help="seconds per level")
+    parser.add_argument('--mock', action='store_true', help="start a mock airtable and a dashboard pointed at it")
+    parser.add_argument('--orders', type=int, default=10_000, help="orders in the mock tables")
+    parser.add_argument('--latency', type=float, default=0.1, help="mock airtable latency in seconds")
+    parser.add_argument('--rate-limit', type=float, default=0, help="mock airtable requests per second before 429s")
+    parser.add_argument('--error-rate', type=float, default=0.0, help="chance of a 429 from the mock on any request")
+    parser.add_argument('--workers', type=int, default=1, help="dashboard worker processes, more than one runs main.py in production mode")
+    args = parser.parse_args()
+
+    processes = []
+    url = args.url
+    try:
+        if args.mock:
+            here = os.path.dirname(os.path.abspath(__file__))
+            processes.append(subprocess.Popen([
+                sys.executable, 'mock_airtable.py', '--port', '8001', '--orders', str(args.orders), '--usages', str(args.orders * 2),
+                '--latency', str(args.latency), '--rate-limit', str(args.rate_limit), '--error-rate', str(args.error_rate)
+            ], cwd=here))
+            wait_for('http://127.0.0.1:8001/mock/stats')
+            env = dict(
+                os.environ, AIRTABLE_URL='http://127.0.0.1:8001/v0', API_KEY='mock', BASE='mock',
+                CATEGORIES='Categories', PRODUCTS='Products', ORDERS='Orders', USAGES='Usages',
+                CRITICAL_DAYS='7', WARNING_DAYS='30', USAGE_PERIOD_DAYS='90', SNAPSHOT_PATH=':memory:'
+            )
+            if args.workers > 1:
+                # the workers share their caches through the snapshot, so it needs to be a file
+                env['SNAPSHOT_PATH'] = os.path.join(tempfile.mkdtemp(), 'snapshot.db')
+                command = [sys.executable, 'main.py', '--mode', 'production', '--workers', str(args.workers), '--port', '8002']
+            else:
+                command = [sys.executable, '-m', 'uvicorn', 'main:app', '--port', '8002', '--log-level', 'warning']
+            processes.append(subprocess.Popen(command, cwd=here, env=env))
+            url = 'http://127.0.0.1:8002'
+            wait_for(url + '/api/ready')
+        asyncio.run(load_test(url, [int(level) for level in args.levels.split(',')], args.duration, args.workers))
+    finally:
+        # dashboard first, so it doesn't log its airtable going away
+        for process in reversed(processes):
+            process.terminate()
+            process.wait()
@@ -2,17 +2,28 @@
 
 # Only offers expiration alerts in this version
 
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
 from fastapi.exceptions import HTTPException
-from fastapi.responses import FileResponse, JSONResponse, RedirectResponse
-from fastapi.staticfiles import StaticFiles
-import json
-import requests
-from datetime import datetime, timedelta
-from collections import defaultdict
+from fastapi.responses import FileResponse, JSONResponse, RedirectResponse, StreamingResponse
+from fastapi.middleware.gzip import GZipMiddleware
+from contextlib import asynccontextmanager
+from datetime import datetime, timedelta, timezone
 from typing import Dict
 from dotenv import load_dotenv
+import asyncio
 import os
+import socket
+
+from airtable import AirtableClient, AIRTABLE_URL, SAFE_RATE, background_requests
+from cache import TableCache
+from aggregates import InventoryAggregates
+from forecast import HALF_LIFE_DAYS
+from snapshot import SnapshotStore
+from shared import SharedTables, SharedRateLimiter
+from products import ProductNameIndex
+from events import DashboardEvents
+from workers import SyncLease, ChangeFollower
+from responses import Fingerprints, CachedStaticFiles, json_response
 
 load_dotenv()
 
@@ -25,293 +36,328 @@ USAGES = os.getenv('USAGES')
 
 CRITICAL_DAYS = int(os.getenv('CRITICAL_DAYS'))
 WARNING_DAYS = int(os.getenv('WARNING_DAYS'))
-USAGE_PERIOD_DAYS = int(os.getenv('USAGE_PERIOD_DAYS'))
-
-HEADERS ={ 
-    "Authorization": f"Bearer {API_KEY}",
-    "Content-Type": "application/json"
+USAGE_PERIOD_DAYS = int(os.getenv('USAGE_PERIOD_DAYS'))  # days of usage the run out rates are taken over
+USAGE_HALF_LIFE_DAYS = float(os.getenv('USAGE_HALF_LIFE_DAYS', HALF_LIFE_DAYS))  # how fast the weighted rate forgets
+
+# local copy of every table, for month ranges, for when airtable can't be reached,
+# and for sharing tables and changes between worker processes
+SNAPSHOT_PATH = os.getenv('SNAPSHOT_PATH', 'snapshot.db')
+snapshot = SnapshotStore(SNAPSHOT_PATH)
+SNAPSHOT_RETRY_SECONDS = float(os.getenv('SNAPSHOT_RETRY_SECONDS', 30))
+
+# airtable's limit is per base, so every worker process on the snapshot takes its requests from one token bucket there
+AIRTABLE_RATE_LIMIT = float(os.getenv('AIRTABLE_RATE_LIMIT', SAFE_RATE))
+airtable_limiter = None if SNAPSHOT_PATH == ':memory:' else SharedRateLimiter(SNAPSHOT_PATH, 'airtable', AIRTABLE_RATE_LIMIT)
+
+# one pooled client for the whole app, AIRTABLE_URL can point it at a local stand-in
+# every request queues with its scheduler: report writes first, then reads a visitor waits on, then background work
+airtable = AirtableClient(
+    API_KEY,
+    BASE,
+    base_url=os.getenv('AIRTABLE_URL', AIRTABLE_URL),
+    max_connections=int(os.getenv('AIRTABLE_MAX_CONNECTIONS', 10)),
+    max_concurrency=int(os.getenv('AIRTABLE_MAX_CONCURRENCY', 5)),
+    timeout=float(os.getenv('AIRTABLE_TIMEOUT', 10)),
+    rate_limit=AIRTABLE_RATE_LIMIT,
+    limiter=airtable_limiter
+)
+
+async def airtable_read(table: str):
+    # every page, not just the first 100 records
+    return await airtable.read_all(table)
+
+async def airtable_write(table: str, data: dict):
+    return await airtable.write(table, data)
+
+async def airtable_write_many(table: str, records: list):
+    # batches of 10 sent concurrently, one result per record
+    return await airtable.write_many(table, records)
+
+async def fetch_table(table: str):
+    return (await airtable_read(table))['records']
+
+# which worker process this is, for leases and for telling its own changes apart in the snapshot's log
+WORKER_ID = f"{socket.gethostname()}:{os.getpid()}"
+
+# categories and products change rarely so they live longer
+TABLE_TTLS = {
+    CATEGORIES: float(os.getenv('CATEGORIES_TTL', 300)),
+    PRODUCTS: float(os.getenv('PRODUCTS_TTL', 300)),
+    ORDERS: float(os.getenv('ORDERS_TTL', 60)),
+    USAGES: float(os.getenv('USAGES_TTL', 60))
 }
-
-def airtable_read(table: str):
-    url = f'https://api.airtable.com/v0/{BASE}/{table}'
-    response = requests.get(url, headers=HEADERS)
-    return response.json()
-
-def airtable_write(table: str, data: dict):
-    url = f'https://api.airtable.com/v0/{BASE}/{table}'
-    response = requests.post(url, headers=HEADERS, data=json.dumps(data))
-    
-    return response.status_code, response.json()
-
-# JSON to be passed to the front end:
-    # {
-    #   "charts": [
-    #     {
-    #       "category": "category-1",
-    #       "data": [
-    #         {"month": "2025-02", "orders": 5, "usages": 4},
-    #         {"month": "2025-03", "orders": 3, "usages": 2}
-    #       ]
-    #     },
-    #     {
-    #       "category": "category-2",
-    #       "data": [
-    #         {"month": "2025-02", "orders": 4, "usages": 3},
-    #         {"month": "2025-03", "orders": 2, "usages": 1}
-    #       ]
-    #     }
-    #   ]
-    # }
-def parse_chart_json(categories_data, orders_data, usages_data):
-    # map product IDs to categories
-    category_map = {}
-    category_names = {}
-    
-    for category in categories_data['records']:
-        category_id = category['fields']['id']
-        category_name = category['fields']['name']
-        category_names[category_id] = category_name
-        for product in category['fields'].get('products', []):
-            category_map[product] = category_id
-
-    # extract year-month from a date
-    def extract_month(date_str):
-        return datetime.strptime(date_str, "%Y-%m-%d").strftime("%Y-%m")
-
-    # count orders per category per month
-    category_orders = defaultdict(lambda: defaultdict(int))
-    
-    for order in orders_data['records']:
-        product_ids = order['fields'].get('product', [])
-        order_month = extract_month(order['fields']['order-date'])
-        for product_id in product_ids:
-            category_id = category_map.get(product_id)
-            if category_id:
-                category_orders[category_id][order_month] += 1
-
-    # count usages per category per month
-    category_usages = defaultdict(lambda: defaultdict(int))
-    
-    for usage in usages_data['records']:
-        product_ids = usage['fields'].get('product', [])
-        usage_month = extract_month(usage['fields']['usage-date'])
-        for product_id in product_ids:
-            category_id = category_map.get(product_id)
-            if category_id:
-                category_usages[category_id][usage_month] += 1
-
-    # construct JSON response
-    charts = []
-    for category_id, category_name in category_names.items():
-        months = set(category_orders[category_id].keys()) | set(category_usages[category_id].keys())
-        data = [
-            {
-                "month": month,
-                "orders": category_orders[category_id].get(month, 0),
-                "usages": category_usages[category_id].get(month, 0)
-            }
-            for month in sorted(months)
-        ]
-        
-        if data:
-            charts.append({"category": category_name, "data": data})
-    return {"charts": charts}
-
-# JSON to be passed to the front end:
-    # {
-    #   "alerts": [
-    #     {
-    #       "urgency": "Critical",
-    #       "type": "Low Inventory",
-    #       "category": "category-3",
-    #       "product": "Product A",
-    #       "effective-date": "2025-04-01"
-    #     },
-    #     {
-    #       "urgency": "Warning",
-    #       "type": "Projected Run Out",
-    #       "category": "category-2",
-    #       "product": "Product B",
-    #       "effective-date": "2025-04-03"
-    #     }
-    #   ]
-    # }
-def parse_table_json(categories_data, products_data, orders_data, usages_data):
-    # init alerts list
-    alerts = []
-
-    # map products to categories
-    product_to_category = {}
-    for category in categories_data['records']:
-        category_name = category['fields']['name']
-        category_products = category['fields'].get('products', [])
-        for product_id in category_products:
-            product_to_category[product_id] = category_name
-    
-    # get product info
-    product_info = {}  
-    for product in products_data['records']:
-        product_id = product['id']
-        product_name = product['fields'].get('name', 'Unknown Product')
-        unit_of_measurement = product['fields'].get('unit-of-measurement', 'unit')  # default to 'unit'
-        product_info[product_id] = {"name": product_name, "unit": unit_of_measurement}
-    
-    
-    # get order amounts
-    product_purchases = defaultdict(float)  
-    for order in orders_data['records']:
-        product_ids = order['fields'].get('product', [])
-        order_amount = order['fields'].get('amount', 0)  # default to 0
-        for product_id in product_ids:
-            product_purchases[product_id] += order_amount  
-
-    # get usage amounts
-    product_usages = defaultdict(float)  
-    for usage in usages_data['records']:
-        product_ids = usage['fields'].get('product', [])
-        usage_amount = usage['fields'].get('amount', 0)  # default to 0
-        for product_id in product_ids:
-            product_usages[product_id] += usage_amount  
-
-    # get expiration dates
-    product_expiration_dates = {}
-    for order in orders_data['records']:
-        for product_id in order['fields']['product']:
-            try:
-                expiration_date = order['fields']['expiration-date']
-            except:
-                expiration_date = None
-            # store latest expiration
-            if product_id not in product_expiration_dates:
-                product_expiration_dates[product_id] = expiration_date
-            else:
-                # keep the earliest expiration date
-                if expiration_date:
-                    if expiration_date < product_expiration_dates[product_id]:
-                        product_expiration_dates[product_id] = expiration_date
-
-    # track product usage dates
-    product_usage_dates = {}
-    for usage in usages_data['records']:
-        for product_id in usage['fields']['product']:
-            usage_date = usage['fields']['usage-date']
-            if product_id not in product_usage_dates:
-                product_usage_dates[product_id] = []
-            product_usage_dates[product_id].append(usage_date)
-
-    # generate alerts
-    current_date = datetime.now()
-    for product_id, category_name in product_to_category.items():        
-        product_name = product_info.get(product_id, {}).get("name", "Unknown")
-        unit_of_measurement = product_info.get(product_id, {}).get("unit", "unit")
-        
-        expiration_alert = None
-        expiration_date_str = None
-        expiration_date = None
-        days_to_expire = None
-
-        # check expiration date
-        for order in orders_data['records']:
-            if product_id in order['fields'].get('product', []):
-                expiration_date_str = order['fields'].get('expiration-date')
-                if expiration_date_str:
-                    expiration_date = datetime.strptime(expiration_date_str, "%Y-%m-%d")
-                    days_to_expire = (expiration_date - current_date).days
-                    break
-
-        if days_to_expire:
-            if days_to_expire <= CRITICAL_DAYS:
-                urgency = "Critical"
-            elif days_to_expire <= WARNING_DAYS:
-                urgency = "Warning"
-            else:
-                urgency = None
-
-            if urgency:
-                expiration_alert = {
-                    "urgency": urgency,
-                    "type": "Expiration",
-                    "category": category_name,
-                    "product": product_name,
-                    "unit-of-measurement": unit_of_measurement,
-                    "effective-date": expiration_date_str
-                }
-                alerts.append(expiration_alert)
-
-
-        runout_alert = None
-        total_purchases = product_purchases.get(product_id, 0)
-        total_usages = product_usages.get(product_id, 0)
-
-        # average usage
-        avg_daily_usage = total_usages / USAGE_PERIOD_DAYS if total_usages > 0 else 0
-
-        # remaining
-        remaining_stock = total_purchases - total_usages
-        
-        if avg_daily_usage > 0 and remaining_stock > 0:
-            days_until_runout = remaining_stock / avg_daily_usage
-            runout_date = current_date + timedelta(days=days_until_runout)
-            days_to_runout = (runout_date - current_date).days
-
-            if days_to_runout <= CRITICAL_DAYS:
-                urgency = "Critical"
-            elif days_to_runout <= WARNING_DAYS:
-                urgency = "Warning"
+# whole tables shared by every worker, only one of them reads a table from airtable at a time
+shared_tables = SharedTables(snapshot, fetch_table, WORKER_ID, TABLE_TTLS)
+# and in front of that, by every request to this worker
+table_cache = TableCache(shared_tables.get, ttls=TABLE_TTLS, stale_seconds=float(os.getenv('CACHE_STALE_SECONDS', 300)),
+                         background=background_requests)
+
+async def invalidate_tables(*tables: str):
+    # everywhere, so no worker keeps serving a table from before a write
+    table_cache.invalidate(*tables)
+    await shared_tables.invalidate(*tables)
+
+# chart counts and alert totals, built once then kept current by report writes and delta syncs
+aggregates = InventoryAggregates(CRITICAL_DAYS, WARNING_DAYS, USAGE_PERIOD_DAYS, USAGE_HALF_LIFE_DAYS)
+aggregates_lock = asyncio.Lock()
+AGGREGATE_SYNC_SECONDS = float(os.getenv('AGGREGATE_SYNC_SECONDS', 30))
+AGGREGATE_REBUILD_SECONDS = float(os.getenv('AGGREGATE_REBUILD_SECONDS', 3600))
+SYNC_OVERLAP = timedelta(seconds=5)  # re-read a little before the last sync, applying a record twice is harmless
+aggregates_synced_at = None  # when the last sync or build started
+aggregates_rebuilt_at = 0.0
+aggregates_failed_at = None  # when building from airtable last failed
+
+# with several workers, one at a time (the holder of the "sync" lease) keeps the snapshot in step with airtable,
+# and every worker replays the snapshot's log of what the others wrote into its own aggregates
+SYNC_LEASE_SECONDS = float(os.getenv('SYNC_LEASE_SECONDS', 30))  # renewed every third of this, while the worker is alive
+CHANGE_POLL_SECONDS = float(os.getenv('CHANGE_POLL_SECONDS', 1))
+sync_lease = SyncLease(snapshot, WORKER_ID, SYNC_LEASE_SECONDS)
+WARM_UP_RETRY_SECONDS = float(os.getenv('WARM_UP_RETRY_SECONDS', 5))
+warmed_up = False
+
+# "aggregates" keeps totals current record by record, "frames" recomputes from whole cached tables with pandas
+DASHBOARD_ENGINE = os.getenv('DASHBOARD_ENGINE', 'aggregates')
+if DASHBOARD_ENGINE == 'frames':
+    from frames import FrameEngine  # pandas is only needed for this engine
+    frame_engine = FrameEngine(CRITICAL_DAYS, WARNING_DAYS, USAGE_PERIOD_DAYS, USAGE_HALF_LIFE_DAYS)
+
+def airtable_time(moment: datetime) -> str:
+    return moment.strftime("%Y-%m-%dT%H:%M:%S.000Z")
+
+async def read_tables():
+    """Every table for rebuild_aggregates, with when it started and where the snapshot's log was."""
+    started = datetime.now(timezone.utc)
+    # changes logged from here on are replayed on top, applying one the tables already have is harmless
+    last_change = await asyncio.to_thread(snapshot.last_change)
+    tables = await asyncio.gather(
+        table_cache.get(CATEGORIES),
+        table_cache.get(PRODUCTS),
+        table_cache.get(ORDERS),
+        table_cache.get(USAGES)
+    )
+    return started, last_change, tables
+
+async def rebuild_aggregates(read=None):
+    # read is what read_tables returned, when it ran before taking the lock so dashboard reads weren't held up behind airtable
+    global aggregates_synced_at, aggregates_rebuilt_at
+    started, last_change, (categories, products, orders, usages) = read or await read_tables()
+    aggregates.build(categories, products, orders, usages)
+    aggregates_synced_at = started
+    aggregates_rebuilt_at = asyncio.get_running_loop().time()
+    follower.applied = last_change
+    if sync_lease.leader:
+        await asyncio.to_thread(snapshot.replace, categories, products, orders, usages, airtable_time(started), WORKER_ID)
+    await events.publish()
+
+async def ensure_aggregates():
+    # the first request builds them, anyone arriving meanwhile waits for that build
+    if not aggregates.built:
+        async with aggregates_lock:
+            if not aggregates.built:
+                await rebuild_aggregates()
+
+def snapshot_dashboard():
+    table_json = snapshot.table_json(CRITICAL_DAYS, WARNING_DAYS, USAGE_PERIOD_DAYS, half_life_days=USAGE_HALF_LIFE_DAYS)
+    return snapshot.chart_json(), table_json
+
+async def dashboard_now():
+    if aggregates.built:
+        return aggregates.chart_json(), aggregates.table_json()
+    # a full pass over the snapshot, kept off the event loop like the endpoints' fallback
+    return await asyncio.to_thread(snapshot_dashboard)
+
+# changes pushed to open dashboards as they happen
+events = DashboardEvents(dashboard_now, source=WORKER_ID)
+# what the other workers write, replayed into this one's aggregates
+follower = ChangeFollower(
+    snapshot, WORKER_ID, aggregates, aggregates_lock, table_cache, (CATEGORIES, PRODUCTS, ORDERS, USAGES),
+    read_tables, rebuild_aggregates, events.publish
+)
+
+async def ensure_dashboard() -> bool:
+    """True once the aggregates are built, False if airtable is unreachable and the snapshot should answer instead."""
+    global aggregates_failed_at
+    if aggregates.built:
+        await follower.follow()
+        return True
+    # don't make every request wait out airtable's timeout again right after it failed
+    loop_time = asyncio.get_running_loop().time()
+    # the snapshot's lock is held for a whole rebuild, so even this small read stays off the event loop
+    synced_at = await asyncio.to_thread(snapshot.synced_at)
+    has_snapshot = synced_at is not None
+    if has_snapshot and aggregates_failed_at is not None and loop_time - aggregates_failed_at < SNAPSHOT_RETRY_SECONDS:
+        return False
+    try:
+        await ensure_aggregates()
+        aggregates_failed_at = None
+        return True
+    except Exception as e:
+        if not has_snapshot:
+            raise
+        aggregates_failed_at = asyncio.get_running_loop().time()
+        print(f"Error building aggregates, serving the snapshot from {synced_at}: {e}")
+        return False
+
+async def sync_aggregates():
+    """Apply records modified since the last sync. Category or product changes, and every so often anything at all, trigger a full rebuild."""
+    global aggregates_synced_at
+    if not aggregates.built:
+        return
+    started = datetime.now(timezone.utc)
+    since = airtable_time(aggregates_synced_at - SYNC_OVERLAP)
+    params = {"filterByFormula": f"IS_AFTER(LAST_MODIFIED_TIME(), DATETIME_PARSE('{since}'))"}
+    # read outside the lock, so changes from other workers aren't held up behind airtable
+    # (a record edited again meanwhile is newer than since, and comes back with the next sync)
+    categories, products, orders, usages = await asyncio.gather(
+        airtable.read_all(CATEGORIES, params),
+        airtable.read_all(PRODUCTS, params),
+        airtable.read_all(ORDERS, params),
+        airtable.read_all(USAGES, params)
+    )
+    # deletions never show up as modified records, so a periodic rebuild catches those
+    rebuild_due = asyncio.get_running_loop().time() - aggregates_rebuilt_at > AGGREGATE_REBUILD_SECONDS
+    if categories['records'] or products['records'] or rebuild_due:
+        await invalidate_tables(CATEGORIES, PRODUCTS, ORDERS, USAGES)
+        read = await read_tables()
+        async with aggregates_lock:
+            await rebuild_aggregates(read)
+        return
+    async with aggregates_lock:
+        aggregates.apply_orders(orders['records'])
+        aggregates.apply_usages(usages['records'])
+        # sqlite can wait out another worker's write lock, keep that off the event loop
+        await asyncio.to_thread(snapshot.upsert_orders, orders['records'], WORKER_ID)
+        await asyncio.to_thread(snapshot.upsert_usages, usages['records'], WORKER_ID)
+        await asyncio.to_thread(snapshot.mark_synced, airtable_time(started))
+        # run every sync even with nothing new, alerts also move as the dates get closer
+        await events.publish()
+        if orders['records']:
+            await invalidate_tables(ORDERS)
+        if usages['records']:
+            await invalidate_tables(USAGES)
+        aggregates_synced_at = started
+
+async def take_over():
+    # taking over from a worker that stopped, start again from airtable rather than from its last sync
+    if not aggregates.built:
+        return
+    await invalidate_tables(CATEGORIES, PRODUCTS, ORDERS, USAGES)
+    read = await read_tables()
+    async with aggregates_lock:
+        await rebuild_aggregates(read)
+
+async def warm_up():
+    """Fill the caches before the first visitor needs them, trying again until airtable answers."""
+    global warmed_up
+    while True:
+        try:
+            if DASHBOARD_ENGINE == 'frames':
+                categories, products, orders, usages = await asyncio.gather(
+                    table_cache.get(CATEGORIES), table_cache.get(PRODUCTS), table_cache.get(ORDERS), table_cache.get(USAGES)
+                )
+                await asyncio.to_thread(frame_engine.load, categories, products, orders, usages)
             else:
-                urgency = None
-
-            if urgency:
-                runout_alert = {
-                    "urgency": urgency,
-                    "type": "Projected Run Out",
-                    "category": category_name,
-                    "product": product_name,
-                    "unit-of-measurement": unit_of_measurement,
-                    "effective-date": runout_date.strftime("%Y-%m-%d")
-                }
-                alerts.append(runout_alert)
-                
-    # return sorted alerts
-    alerts.sort(key=lambda alert: datetime.strptime(alert["effective-date"], "%Y-%m-%d"))
-    return {"alerts": alerts}
-
-
-app = FastAPI()
+                await ensure_aggregates()
+            await get_product_names()
+            warmed_up = True
+            return
+        except Exception as e:
+            print(f"Error warming up the caches, trying again in {WARM_UP_RETRY_SECONDS:g}s: {e}")
+            await asyncio.sleep(WARM_UP_RETRY_SECONDS)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # the first worker up syncs with airtable, the rest follow it from the log's current end
+    await sync_lease.renew()
+    await follower.start_from_end()
+    # nobody is waiting on what these read, so it queues behind anything a visitor is
+    with background_requests():
+        tasks = [
+            asyncio.create_task(warm_up()),
+            asyncio.create_task(sync_lease.hold_forever()),
+            asyncio.create_task(sync_lease.step_forever(AGGREGATE_SYNC_SECONDS, sync_aggregates, take_over)),
+            asyncio.create_task(follower.follow_forever(CHANGE_POLL_SECONDS))
+        ]
+    yield
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+    await follower.close()
+    sync_lease.release()
+    await table_cache.close()
+    await airtable.close()
+    if airtable_limiter:
+        airtable_limiter.close()
+    snapshot.close()
+
+app = FastAPI(lifespan=lifespan)
+# compress anything worth compressing, event streams are left alone
+app.add_middleware(GZipMiddleware, minimum_size=500)
+
+# pages link their scripts, styles and images by content hash
+fingerprints = Fingerprints('frontend')
 
 @app.get("/favicon.ico")
 async def favicon():
-    return FileResponse('frontend/images/favicon.ico')
+    return FileResponse('frontend/images/favicon.ico', headers={"Cache-Control": "public, max-age=86400"})
 
 @app.get("/")
 async def redirect_to_dashboard():
     return RedirectResponse(url="/dashboard")
 
 @app.get("/dashboard")
-async def get_dashboard():
-    return FileResponse('frontend/dashboard.html')
+async def get_dashboard(request: Request):
+    return fingerprints.page_response(request, 'dashboard.html')
 
-@app.get("/api/dashboard-chart-data")
-async def dashboard_chart_data():
-    categories_data = airtable_read(CATEGORIES)
-    orders_data = airtable_read(ORDERS)
-    usages_data = airtable_read(USAGES)
+def check_month(month: str):
+    try:
+        datetime.strptime(month, "%Y-%m")
+    except ValueError:
+        raise HTTPException(status_code=400, detail=f"Invalid month: {month}")
 
-    chart_json = parse_chart_json(categories_data, orders_data, usages_data)
-    return JSONResponse(content=chart_json)
+@app.get("/api/dashboard-chart-data")
+async def dashboard_chart_data(request: Request, start: str = None, end: str = None):
+    # optional YYYY-MM bounds, answered from the snapshot since the aggregates only keep all time counts
+    for month in (start, end):
+        if month:
+            check_month(month)
+    if DASHBOARD_ENGINE == 'frames' and not (start or end):
+        categories, orders, usages = await asyncio.gather(table_cache.get(CATEGORIES), table_cache.get(ORDERS), table_cache.get(USAGES))
+        chart_json = await asyncio.to_thread(frame_engine.chart_json, categories, orders, usages)
+    elif await ensure_dashboard() and not (start or end):
+        chart_json = aggregates.chart_json()
+    else:
+        chart_json = await asyncio.to_thread(snapshot.chart_json, start, end)
+    return json_response(request, chart_json)
 
 @app.get("/api/dashboard-table-data")
-async def dashboard_table_data():
-    categories_data = airtable_read(CATEGORIES)
-    products_data = airtable_read(PRODUCTS)
-    orders_data = airtable_read(ORDERS)
-    usages_data = airtable_read(USAGES)
-
-    table_json = parse_table_json(categories_data, products_data, orders_data, usages_data)
-    return JSONResponse(content=table_json)
+async def dashboard_table_data(request: Request):
+    if DASHBOARD_ENGINE == 'frames':
+        categories, products, orders, usages = await asyncio.gather(
+            table_cache.get(CATEGORIES), table_cache.get(PRODUCTS), table_cache.get(ORDERS), table_cache.get(USAGES)
+        )
+        table_json = await asyncio.to_thread(frame_engine.table_json, categories, products, orders, usages)
+    elif await ensure_dashboard():
+        table_json = aggregates.table_json()
+    else:
+        table_json = await asyncio.to_thread(
+            snapshot.table_json, CRITICAL_DAYS, WARNING_DAYS, USAGE_PERIOD_DAYS, None, USAGE_HALF_LIFE_DAYS
+        )
+    return json_response(request, table_json)
+
+@app.get("/api/dashboard-events")
+async def dashboard_events(request: Request):
+    # server-sent events: a full reset on connect, then only what changed
+    await ensure_dashboard()
+    return StreamingResponse(
+        events.stream(request.headers.get('last-event-id')),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
 @app.get("/api/form-product-data")
-async def dashboard_table_data():
-    products_data = airtable_read(PRODUCTS)
+async def dashboard_table_data(request: Request):
+    products_data = {"records": await table_cache.get(PRODUCTS)}
     # extract id, name, and unit-of-measurement for each product
     products_json = {
         "products": sorted(
@@ -326,24 +372,21 @@ async def dashboard_table_data():
             key=lambda x: x['name']  # Sort by 'name' field in alphabetical order
         )
     }
-    return JSONResponse(content=products_json)
+    return json_response(request, products_json)
 
 
-def get_product_record_id(product_name):
-    """Retrieve the record ID for the product from the 'Products' table based on the product name."""
-    url = f'https://api.airtable.com/v0/{BASE}/{PRODUCTS}?filterByFormula={{Name}}="{product_name}"'
-    response = requests.get(url, headers=HEADERS)
-    
-    if response.status_code == 200:
-        data = response.json()
-        records = data.get("records", [])
-        
-        if len(records) > 0:
-            return records[0]["id"]  # return ID of first match
-        else:
-            raise HTTPException(status_code=400, detail=f"Product '{product_name}' not found in Airtable.")
-    else:
-        raise HTTPException(status_code=500, detail="Error retrieving product data from Airtable.")
+# product names to ids, rebuilt whenever the products cache refreshes
+product_names = ProductNameIndex()
+
+async def get_product_names() -> ProductNameIndex:
+    product_names.build(await table_cache.get(PRODUCTS))
+    return product_names
+
+@app.get("/api/product-search")
+async def product_search(request: Request, q: str = "", limit: int = 10):
+    # type-ahead for the report forms, case-insensitive name prefix
+    index = await get_product_names()
+    return json_response(request, {"products": index.search(q, max(1, min(limit, 50)))})
 
 def format_date_to_airtable(date_string: str) -> str:
     try:
@@ -354,10 +397,53 @@ def format_date_to_airtable(date_string: str) -> str:
     except ValueError:
         raise HTTPException(status_code=400, detail=f"Invalid date format: {date_string}")
 
+async def apply_orders(records: list):
+    # written records go straight into the aggregates and the snapshot (and from there to the other workers)
+    if aggregates.built:
+        aggregates.apply_orders(records)
+    await asyncio.to_thread(snapshot.upsert_orders, records, WORKER_ID)
+
+async def apply_usages(records: list):
+    if aggregates.built:
+        aggregates.apply_usages(records)
+    await asyncio.to_thread(snapshot.upsert_usages, records, WORKER_ID)
+
+async def submit_report(table: str, records: list, apply, message: str):
+    results = await airtable_write_many(table, records)
+    await invalidate_tables(table)
+    written = [result['record'] for result in results if result['status'] == 200]
+    if written:
+        await apply(written)
+        await events.publish()
+
+    # per item outcome, in the order the items were sent
+    items = [
+        {"status": 200, "id": result['record']['id']} if result['status'] == 200
+        else {"status": result['status'], "error": result['error']}
+        for result in results
+    ]
+
+    # handle errors
+    failed = [result for result in results if result['status'] != 200]
+    if failed:
+        return JSONResponse(status_code=500, content={
+            "status": 500,
+            "message": f"Error writing to Airtable: {failed[0]['error']}",
+            "items": items
+        })
+
+    # success response
+    return JSONResponse(content={
+        "status": 200,  # success status code
+        "message": message,  # success message
+        "items": items
+    })
+
 @app.post("/api/purchase-report")
 async def purchase_report(data: Dict):
     # check data
     if "items" in data and isinstance(data["items"], list) and len(data["items"]) > 0:
+        records = []
         for item in data["items"]:
             
             product_id = item.get("product")
@@ -398,18 +484,10 @@ async def purchase_report(data: Dict):
                 }
             }
 
-            # write to airtable
-            status_code, response_data = airtable_write(ORDERS, airtable_data)
-
-            # handle errors
-            if status_code != 200:
-                raise HTTPException(status_code=500, detail=f"Error writing to Airtable: {response_data.get('message')}")
+            records.append(airtable_data)
 
-        # success response
-        return JSONResponse(content={
-            "status": 200,  # success status code
-            "message": "Report submitted successfully"  # success message
-        })
+        # every item checks out, write them all
+        return await submit_report(ORDERS, records, apply_orders, "Report submitted successfully")
     
     else:
         # failure response
@@ -419,6 +497,7 @@ async def purchase_report(data: Dict):
 async def usage_report(data: Dict):
     # check data
     if "items" in data and isinstance(data["items"], list) and len(data["items"]) > 0:
+        records = []
         for item in data["items"]:
             
             product_id = item.get("product")
@@ -451,39 +530,72 @@ async def usage_report(data: Dict):
                 }
             }
 
-            # write to airtable
-            status_code, response_data = airtable_write(USAGES, airtable_data)
-
-            # handle errors
-            if status_code != 200:
-                raise HTTPException(status_code=500, detail=f"Error writing to Airtable: {response_data.get('message')}")
+            records.append(airtable_data)
 
-        # success response
-        return JSONResponse(content={
-            "status": 200,  # success status code
-            "message": "Usage report submitted successfully"  # success message
-        })
+        # every item checks out, write them all
+        return await submit_report(USAGES, records, apply_usages, "Usage report submitted successfully")
     
     else:
         # failure response
         raise HTTPException(status_code=400, detail="Invalid data or missing items")
 
+@app.get("/api/cache-metrics")
+async def cache_metrics():
+    return JSONResponse(content={**table_cache.metrics(), "shared": shared_tables.metrics()})
+
+@app.get("/api/airtable-metrics")
+async def airtable_metrics():
+    # queue depth and wait times by priority, and how often requests were shared, retried or turned away
+    return JSONResponse(content=airtable.metrics())
+
+@app.get("/api/ready")
+async def readiness():
+    # for load balancers and deploy scripts, 503 until this worker's caches are warm
+    synced_at = await asyncio.to_thread(snapshot.synced_at)
+    content = {
+        "ready": warmed_up,
+        "worker": WORKER_ID,
+        "sync_leader": sync_lease.leader,
+        "engine": DASHBOARD_ENGINE,
+        "aggregates_built": aggregates.built,
+        "tables_cached": {table: table in table_cache.entries for table in (CATEGORIES, PRODUCTS, ORDERS, USAGES)},
+        "changes_applied": follower.applied,
+        "snapshot_synced_at": synced_at
+    }
+    return JSONResponse(status_code=200 if warmed_up else 503, content=content)
+
 @app.get("/purchase-report")
-async def get_purchase_report():
-    return FileResponse('frontend/purchase-report.html')
+async def get_purchase_report(request: Request):
+    return fingerprints.page_response(request, 'purchase-report.html')
 
 @app.get("/usage-report")
-async def get_usage_report():
-    return FileResponse('frontend/usage-report.html')
+async def get_usage_report(request: Request):
+    return fingerprints.page_response(request, 'usage-report.html')
 
-app.mount("/styles", StaticFiles(directory="frontend/styles"), name="styles")
-app.mount("/scripts", StaticFiles(directory="frontend/scripts"), name="scripts")
-app.mount("/images", StaticFiles(directory="frontend/images"), name="images")
+app.mount("/styles", CachedStaticFiles(directory="frontend/styles", fingerprints=fingerprints), name="styles")
+app.mount("/scripts", CachedStaticFiles(directory="frontend/scripts", fingerprints=fingerprints), name="scripts")
+app.mount("/images", CachedStaticFiles(directory="frontend/images", fingerprints=fingerprints), name="images")
 
 
 if __name__ == '__main__':
+    import argparse
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description="Run the dashboard.")
+    parser.add_argument('--mode', choices=['dev', 'production'], default='dev',
+                        help="dev is one worker that reloads on code changes, production runs several")
+    parser.add_argument('--host', default='0.0.0.0')
+    parser.add_argument('--port', type=int, default=8000)
+    parser.add_argument('--workers', type=int, default=int(os.getenv('WEB_CONCURRENCY', os.cpu_count() or 1)),
+                        help="worker processes in production mode")
+    args = parser.parse_args()
     print()
-    os.system('uvicorn main:app --reload --host 0.0.0.0 --port 8000')
+    if args.mode == 'dev':
+        uvicorn.run('main:app', host=args.host, port=args.port, reload=True)
+    else:
+        if SNAPSHOT_PATH == ':memory:':
+            parser.error("production mode needs SNAPSHOT_PATH to be a file, it's how the workers share their caches")
+        uvicorn.run('main:app', host=args.host, port=args.port, workers=args.workers, proxy_headers=True)
     
 
     
@@ -0,0 +1,182 @@
+# local stand-in for the airtable api, serving generated tables so the dashboard can be measured without the real thing
+# usage: python mock_airtable.py [--orders 100000] [--latency 0.1] [--rate-limit 5] [--error-rate 0.01] [--port 8001]
+# then run the dashboard with AIRTABLE_URL=http://127.0.0.1:8001/v0
+import argparse
+import asyncio
+import random
+import re
+import time
+from datetime import datetime, timedelta, timezone
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+
+IS_AFTER = re.compile(r"IS_AFTER\(LAST_MODIFIED_TIME\(\), DATETIME_PARSE\('([^']+)'\)\)")
+FIELD_EQUALS = re.compile(r'\{(\w+)\}="(.*)"')
+
+
+def airtable_time(moment: datetime) -> str:
+    return moment.strftime("%Y-%m-%dT%H:%M:%S.000Z")
+
+
+def make_tables(products: int = 200, categories: int = 10, orders: int = 10_000, usages: int = 20_000, seed: int = 1) -> dict:
+    """Tables shaped like the dashboard's base, with dates around today so alerts show up."""
+    rng = random.Random(seed)
+    today = datetime.now()
+    product_ids = [f"recP{i:06d}" for i in range(products)]
+    tables = {
+        "Categories": [
+            {"id": f"recC{c:04d}", "fields": {"id": c + 1, "name": f"category-{c + 1}", "products": product_ids[c::categories]}}
+            for c in range(categories)
+        ],
+        "Products": [
+            {"id": product_id, "fields": {"name": f"Product {i:04d}", "unit-of-measurement": rng.choice(["case", "lb", "each"])}}
+            for i, product_id in enumerate(product_ids)
+        ],
+        "Orders": [],
+        "Usages": []
+    }
+    for i in range(orders):
+        order_date = today - timedelta(days=rng.randrange(365))
+        fields = {
+            "product": [rng.choice(product_ids)],
+            "order-date": order_date.strftime("%Y-%m-%d"),
+            "amount": rng.randrange(1, 40)
+        }
+        if rng.random() < 0.8:
+            fields["expiration-date"] = (order_date + timedelta(days=rng.randrange(10, 400))).strftime("%Y-%m-%d")
+        tables["Orders"].append({"id": f"recO{i:08d}", "fields": fields})
+    for i in range(usages):
+        tables["Usages"].append({"id": f"recU{i:08d}", "fields": {
+            "product": [rng.choice(product_ids)],
+            "usage-date": (today - timedelta(days=rng.randrange(90))).strftime("%Y-%m-%d"),
+            "amount": rng.randrange(1, 15)
+        }})
+    return tables
+
+
+def normalize(fields: dict) -> dict:
+    # the dashboard writes dates as mm/dd/yyyy, airtable hands them back as yyyy-mm-dd
+    normalized = {}
+    for name, value in fields.items():
+        if isinstance(value, str) and re.fullmatch(r"\d{2}/\d{2}/\d{4}", value):
+            value = datetime.strptime(value, "%m/%d/%Y").strftime("%Y-%m-%d")
+        if value is not None:
+            normalized[name] = value
+    return normalized
+
+
+class MockAirtable:
+    """
+    In-memory airtable base.
+    - pages of up to 100 records with offset cursors
+    - filterByFormula for {Field}="value" and IS_AFTER(LAST_MODIFIED_TIME(), DATETIME_PARSE('...'))
+    - single and batched (up to 10) record creates
+    - latency (with jitter) on every request, and 429s past rate_limit requests per second or at random
+    """
+
+    def __init__(self, tables: dict, latency: float = 0.0, jitter: float = 0.0,
+                 rate_limit: float = None, error_rate: float = 0.0, seed: int = 1):
+        self.tables = tables
+        self.latency = latency
+        self.jitter = jitter
+        self.rate_limit = rate_limit
+        self.error_rate = error_rate
+        self.rng = random.Random(seed)
+        self.created = airtable_time(datetime.now(timezone.utc))
+        self.modified = {}  # record id -> last modified time, records never touched count as created at startup
+        self.window = []    # start times of requests in the last second, for rate limiting
+        self.counts = {"reads": 0, "writes": 0, "throttled": 0}
+
+    def throttled(self) -> bool:
+        now = time.monotonic()
+        self.window = [started for started in self.window if now - started < 1.0]
+        self.window.append(now)
+        if self.rate_limit and len(self.window) > self.rate_limit:
+            return True
+        return self.rng.random() < self.error_rate
+
+    async def delay(self):
+        if self.latency or self.jitter:
+            await asyncio.sleep(self.latency + self.rng.random() * self.jitter)
+
+    def matches(self, record: dict, formula: str) -> bool:
+        after = IS_AFTER.fullmatch(formula)
+        if after:
+            return self.modified.get(record['id'], self.created) > after.group(1)
+        equals = FIELD_EQUALS.fullmatch(formula)
+        if equals:
+            # airtable field names are matched case-insensitively here, the dashboard says {Name} for "name"
+            fields = {name.lower(): value for name, value in record['fields'].items()}
+            return str(fields.get(equals.group(1).lower())) == equals.group(2)
+        return True
+
+    def app(self) -> FastAPI:
+        app = FastAPI()
+
+        @app.middleware("http")
+        async def latency_and_limits(request: Request, call_next):
+            await self.delay()
+            if self.throttled():
+                self.counts["throttled"] += 1
+                return JSONResponse(status_code=429, content={"error": {"type": "RATE_LIMIT_REACHED", "message": "Rate limit exceeded"}})
+            return await call_next(request)
+
+        @app.get("/v0/{base}/{table}")
+        async def read(table: str, pageSize: int = 100, offset: int = 0, filterByFormula: str = None):
+            if table not in self.tables:
+                return JSONResponse(status_code=404, content={"error": {"type": "TABLE_NOT_FOUND", "message": f"Could not find table {table}"}})
+            self.counts["reads"] += 1
+            records = self.tables[table]
+            if filterByFormula:
+                records = [record for record in records if self.matches(record, filterByFormula)]
+            page_size = max(1, min(pageSize, 100))
+            page = {"records": records[offset:offset + page_size]}
+            if offset + page_size < len(records):
+                page["offset"] = str(offset + page_size)
+            return page
+
+        @app.post("/v0/{base}/{table}")
+        async def write(table: str, request: Request):
+            if table not in self.tables:
+                return JSONResponse(status_code=404, content={"error": {"type": "TABLE_NOT_FOUND", "message": f"Could not find table {table}"}})
+            body = await request.json()
+            batch = body.get("records")
+            if batch is not None and len(batch) > 10:
+                return JSONResponse(status_code=422, content={"error": {"type": "INVALID_RECORDS", "message": "At most 10 records per request"}})
+            self.counts["writes"] += 1
+            now = airtable_time(datetime.now(timezone.utc))
+            created = []
+            for fields in ([record['fields'] for record in batch] if batch is not None else [body['fields']]):
+                record = {"id": f"recN{len(self.tables[table]):08d}", "createdTime": now, "fields": normalize(fields)}
+                self.tables[table].append(record)
+                self.modified[record['id']] = now
+                created.append(record)
+            return {"records": created} if batch is not None else created[0]
+
+        @app.get("/mock/stats")
+        async def stats():
+            return {**self.counts, **{table: len(records) for table, records in self.tables.items()}}
+
+        return app
+
+
+if __name__ == '__main__':
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description="Serve a local airtable stand-in with generated tables.")
+    parser.add_argument('--port', type=int, default=8001)
+    parser.add_argument('--products', type=int, default=200)
+    parser.add_argument('--categories', type=int, default=10)
+    parser.add_argument('--orders', type=int, default=10_000)
+    parser.add_argument('--usages', type=int, default=20_000)
+    parser.add_argument('--latency', type=float, default=0.1, help="seconds added to every request")
+    parser.add_argument('--jitter', type=float, default=0.05, help="up to this many more seconds, at random")
+    parser.add_argument('--rate-limit', type=float, default=0, help="requests per second before 429s (airtable allows 5), 0 for none")
+    parser.add_argument('--error-rate', type=float, default=0.0, help="chance of a 429 on any request")
+    args = parser.parse_args()
+
+    tables = make_tables(args.products, args.categories, args.orders, args.usages)
+    mock = MockAirtable(tables, args.latency, args.jitter, args.rate_limit or None, args.error_rate)
+    print(f"mock airtable on http://127.0.0.1:{args.port}/v0 ({args.orders} orders, {args.usages} usages)")
+    uvicorn.run(mock.app(), host='127.0.0.1', port=args.port, log_level='warning')
@@ -0,0 +1,55 @@
+import bisect
+
+
+def fold(name: str) -> str:
+    # case-insensitive and whitespace-insensitive at the ends
+    return name.strip().casefold()
+
+
+class ProductNameIndex:
+    """
+    Product names to record ids, held in memory so lookups never need a round trip to airtable.
+    Built from the cached products table, and rebuilt whenever the cache hands out a different list.
+    """
+
+    def __init__(self):
+        self.source = None      # the records list the index was built from
+        self.ids = {}           # folded name -> id of the first product with that name
+        self.keys = []          # folded names, sorted, for prefix search
+        self.entries = []       # {"id", "name", "unit"} in the same order as keys
+
+    def build(self, records: list):
+        if records is self.source:
+            return
+        ids = {}
+        entries = []
+        for product in records:
+            name = product['fields'].get('name')
+            if not name:
+                continue
+            ids.setdefault(fold(name), product['id'])
+            entries.append((fold(name), {
+                "id": product['id'],
+                "name": name,
+                "unit": product['fields'].get('unit-of-measurement', '')
+            }))
+        entries.sort(key=lambda entry: entry[0])
+        self.ids = ids
+        self.keys = [key for key, _ in entries]
+        self.entries = [entry for _, entry in entries]
+        self.source = records
+
+    def lookup(self, name: str):
+        """Id of the product with this name, ignoring case, or None."""
+        return self.ids.get(fold(name))
+
+    def search(self, prefix: str, limit: int = 10) -> list:
+        """Products whose names start with prefix, ignoring case, in alphabetical order."""
+        prefix = fold(prefix)
+        start = bisect.bisect_left(self.keys, prefix)
+        matches = []
+        for key, entry in zip(self.keys[start:start + limit], self.entries[start:start + limit]):
+            if not key.startswith(prefix):
+                break
+            matches.append(entry)
+        return matches
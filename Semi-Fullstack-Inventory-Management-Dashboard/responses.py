@@ -0,0 +1,105 @@
+import hashlib
+import os
+import re
+from urllib.parse import parse_qs
+
+from fastapi import Request
+from fastapi.responses import HTMLResponse, JSONResponse, Response
+from fastapi.staticfiles import StaticFiles
+
+IMMUTABLE = "public, max-age=31536000, immutable"  # fingerprinted urls never change content
+REVALIDATE = "no-cache"  # keep a copy but check the etag before using it
+ASSET_LINK = re.compile(r'((?:src|href)=")((?:styles|scripts|images)/[^"?#]+)(")')
+
+
+def weak(etag: str) -> str:
+    # gzip sends a different body under the same tag, so tags only promise the same content, not the same bytes
+    return etag if etag.startswith('W/') else 'W/' + etag
+
+
+def etag_for(body: bytes) -> str:
+    return weak('"' + hashlib.sha256(body).hexdigest()[:32] + '"')
+
+
+def not_modified(request: Request, etag: str) -> bool:
+    if_none_match = request.headers.get('if-none-match')
+    if not if_none_match:
+        return False
+    # the weak comparison, which is the one If-None-Match uses
+    tags = [tag.strip().removeprefix('W/') for tag in if_none_match.split(',')]
+    return '*' in tags or etag.removeprefix('W/') in tags
+
+
+def conditional(request: Request, response: Response) -> Response:
+    """Tag a finished response with a hash of its body, and answer 304 if the client already has that body."""
+    etag = etag_for(response.body)
+    headers = {"ETag": etag, "Cache-Control": REVALIDATE}
+    if not_modified(request, etag):
+        return Response(status_code=304, headers=headers)
+    response.headers.update(headers)
+    return response
+
+
+def json_response(request: Request, content) -> Response:
+    return conditional(request, JSONResponse(content=content))
+
+
+class Fingerprints:
+    """
+    Content hashes of the frontend's static files, added to the asset links in its html pages
+    (scripts/chart.js becomes scripts/chart.js?v=<hash>) so browsers can keep them for good.
+    Hashes are redone when a file's modification time changes.
+    """
+
+    def __init__(self, root: str):
+        self.root = root
+        self.hashes = {}  # relative path -> (mtime, hash)
+
+    def version(self, relative: str):
+        path = os.path.join(self.root, relative)
+        try:
+            mtime = os.stat(path).st_mtime_ns
+        except OSError:
+            return None
+        cached = self.hashes.get(relative)
+        if cached is None or cached[0] != mtime:
+            with open(path, 'rb') as file:
+                cached = (mtime, hashlib.sha256(file.read()).hexdigest()[:12])
+            self.hashes[relative] = cached
+        return cached[1]
+
+    def page(self, name: str) -> str:
+        with open(os.path.join(self.root, name), encoding='utf-8') as file:
+            html = file.read()
+
+        def fingerprint(match):
+            version = self.version(match.group(2))
+            if version is None:
+                return match.group(0)
+            return f"{match.group(1)}{match.group(2)}?v={version}{match.group(3)}"
+
+        return ASSET_LINK.sub(fingerprint, html)
+
+    def page_response(self, request: Request, name: str) -> Response:
+        return conditional(request, HTMLResponse(self.page(name)))
+
+
+class CachedStaticFiles(StaticFiles):
+    """
+    Static files browsers keep for a year when asked for by their current fingerprinted url, and revalidate by etag otherwise.
+    A ?v= that isn't the file's current hash (stale, or made up) is revalidated like any other request.
+    """
+
+    def __init__(self, *args, fingerprints: Fingerprints, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.fingerprints = fingerprints
+
+    def file_response(self, full_path, stat_result, scope, status_code: int = 200) -> Response:
+        response = super().file_response(full_path, stat_result, scope, status_code)
+        requested = parse_qs(scope.get('query_string', b'').decode('latin-1')).get('v', [])
+        relative = os.path.relpath(full_path, self.fingerprints.root).replace(os.sep, '/')
+        current = requested == [self.fingerprints.version(relative)]
+        response.headers['Cache-Control'] = IMMUTABLE if current else REVALIDATE
+        if 'etag' in response.headers:
+            response.headers['ETag'] = weak(response.headers['etag'])
+        return response
@@ -0,0 +1,118 @@
+import asyncio
+import sqlite3
+import threading
+import time
+
+from snapshot import SnapshotStore
+
+
+class SharedTables:
+    """
+    Whole tables kept in the snapshot database for every worker process using it.
+    - a table fetched less than its ttl ago is read from the database, not from airtable
+    - only the worker holding a table's lease fetches it, the others wait for its copy to land
+    - invalidate marks a table stale for every worker, and a fetch that started before it isn't kept
+    It sits behind each worker's TableCache as its fetch, so memory still answers most reads.
+    """
+
+    def __init__(self, store: SnapshotStore, fetch, holder: str, ttls: dict = None, default_ttl: float = 60,
+                 lease_seconds: float = 60, poll_seconds: float = 0.1):
+        # fetch is a coroutine function taking a table name and returning its list of records
+        self.store = store
+        self.fetch = fetch
+        self.holder = holder
+        self.ttls = ttls or {}
+        self.default_ttl = default_ttl
+        self.lease_seconds = lease_seconds    # longer than any fetch, a worker that dies mid-fetch frees it after this
+        self.poll_seconds = poll_seconds
+        self.counts = {"shared_hits": 0, "fetches": 0, "waits": 0}
+
+    async def get(self, table: str) -> list:
+        lease = f"table:{table}"
+        while True:
+            records = await self.fresh(table)
+            if records is not None:
+                return records
+            if not await asyncio.to_thread(self.store.claim, lease, self.holder, self.lease_seconds, time.time()):
+                # another worker is fetching it, its copy shows up in the database when it's done
+                self.counts["waits"] += 1
+                await asyncio.sleep(self.poll_seconds)
+                continue
+            try:
+                # the worker that held the lease before may have just stored the same table
+                fetched_at, version = await asyncio.to_thread(self.store.table_state, table)
+                if self.is_fresh(table, fetched_at):
+                    continue
+                self.counts["fetches"] += 1
+                records = await self.fetch(table)
+                await asyncio.to_thread(self.store.cache_table, table, records, time.time(), version)
+                return records
+            finally:
+                await asyncio.to_thread(self.store.release, lease, self.holder)
+
+    def is_fresh(self, table: str, fetched_at: float) -> bool:
+        return time.time() - fetched_at < self.ttls.get(table, self.default_ttl)
+
+    async def fresh(self, table: str):
+        fetched_at, _ = await asyncio.to_thread(self.store.table_state, table)
+        if not self.is_fresh(table, fetched_at):
+            return None
+        # None again if it was invalidated in between
+        records = await asyncio.to_thread(self.store.cached_table, table)
+        if records is not None:
+            self.counts["shared_hits"] += 1
+        return records
+
+    async def invalidate(self, *tables: str):
+        for table in tables:
+            await asyncio.to_thread(self.store.expire_table, table)
+
+    def metrics(self) -> dict:
+        return dict(self.counts)
+
+
+class SharedRateLimiter:
+    """
+    Token bucket kept in a sqlite file, so every worker process on it draws on one rate limit
+    instead of each on a fixed share of it (a share sits idle while its worker has nothing to send).
+    Same acquire() as airtable.RateLimiter, and the scheduler in front of it still decides what each worker sends next.
+    """
+
+    def __init__(self, path: str, name: str, rate: float, burst: int = 1, busy_timeout: float = 30):
+        # a connection of its own, so taking a token doesn't queue behind this worker's snapshot queries
+        self.connection = sqlite3.connect(path, timeout=busy_timeout, check_same_thread=False, isolation_level=None)
+        self.lock = threading.Lock()
+        self.name = name
+        self.rate = rate
+        self.capacity = burst
+        with self.lock:
+            self.connection.execute('PRAGMA journal_mode=WAL')
+            # losing the last few tokens taken to a crash doesn't matter, waiting on the disk for each one would
+            self.connection.execute('PRAGMA synchronous=NORMAL')
+            self.connection.execute('CREATE TABLE IF NOT EXISTS buckets (name TEXT PRIMARY KEY, tokens REAL, updated REAL)')
+            self.connection.execute('INSERT OR IGNORE INTO buckets VALUES (?, ?, ?)', (name, burst, time.time()))
+
+    def take(self, now: float) -> float:
+        """Take a token, 0 if there was one, otherwise the seconds until there should be."""
+        refilled = 'MIN(:capacity, tokens + MAX(0, :now - updated) * :rate)'
+        values = {"name": self.name, "capacity": self.capacity, "now": now, "rate": self.rate}
+        with self.lock:
+            # one statement, so two workers can't both take the last token
+            cursor = self.connection.execute(
+                f'UPDATE buckets SET tokens = {refilled} - 1, updated = :now WHERE name = :name AND {refilled} >= 1', values
+            )
+            if cursor.rowcount == 1:
+                return 0.0
+            tokens = self.connection.execute(f'SELECT {refilled} FROM buckets WHERE name = :name', values).fetchone()[0]
+        return (1 - tokens) / self.rate
+
+    async def acquire(self):
+        while True:
+            wait = await asyncio.to_thread(self.take, time.time())
+            if wait <= 0:
+                return
+            await asyncio.sleep(wait)
+
+    def close(self):
+        with self.lock:
+            self.connection.close()
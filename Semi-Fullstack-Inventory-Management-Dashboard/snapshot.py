@@ -0,0 +1,283 @@
+import json
+import sqlite3
+import threading
+from datetime import datetime, timedelta
+
+from alerts import build_alerts
+from forecast import UsageForecast, HALF_LIFE_DAYS
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+CREATE TABLE IF NOT EXISTS categories (category_id PRIMARY KEY, name TEXT);
+CREATE TABLE IF NOT EXISTS product_categories (product_id TEXT PRIMARY KEY, category_id);
+CREATE TABLE IF NOT EXISTS products (id TEXT PRIMARY KEY, name TEXT, unit TEXT);
+CREATE TABLE IF NOT EXISTS orders (id TEXT PRIMARY KEY, order_date TEXT, month TEXT, amount REAL, expiration_date TEXT);
+CREATE TABLE IF NOT EXISTS usages (id TEXT PRIMARY KEY, usage_date TEXT, month TEXT, amount REAL);
+-- one row per product on a record, copied from the record so queries never join
+CREATE TABLE IF NOT EXISTS order_lines (
+    order_id TEXT, seq INTEGER, product_id TEXT, order_date TEXT, month TEXT, amount REAL, expiration_date TEXT
+);
+CREATE TABLE IF NOT EXISTS usage_lines (usage_id TEXT, product_id TEXT, usage_date TEXT, month TEXT, amount REAL);
+CREATE INDEX IF NOT EXISTS order_lines_order ON order_lines (order_id);
+CREATE INDEX IF NOT EXISTS order_lines_product ON order_lines (product_id, month, amount);
+CREATE INDEX IF NOT EXISTS order_lines_expiration ON order_lines (product_id, seq, expiration_date) WHERE expiration_date IS NOT NULL;
+CREATE INDEX IF NOT EXISTS order_lines_date ON order_lines (order_date, product_id);
+CREATE INDEX IF NOT EXISTS usage_lines_usage ON usage_lines (usage_id);
+CREATE INDEX IF NOT EXISTS usage_lines_product ON usage_lines (product_id, month, amount);
+CREATE INDEX IF NOT EXISTS usage_lines_date ON usage_lines (usage_date, product_id);
+-- shared by every worker process: what each one wrote, whole tables as airtable returned them, and who holds what
+CREATE TABLE IF NOT EXISTS changes (seq INTEGER PRIMARY KEY AUTOINCREMENT, kind TEXT, source TEXT, record TEXT);
+CREATE TABLE IF NOT EXISTS cached_tables (name TEXT PRIMARY KEY, records TEXT, fetched_at REAL, version INTEGER);
+CREATE TABLE IF NOT EXISTS leases (name TEXT PRIMARY KEY, holder TEXT, expires REAL);
+'''
+
+
+class SnapshotStore:
+    """
+    Local SQLite mirror of the categories, products, orders and usages tables.
+    Records keep the position they were first seen in (their rowid), so "first listed order"
+    means the same thing here as it does in the aggregates.
+    chart_json and table_json give the same output as InventoryAggregates,
+    so the dashboard can still answer from the last snapshot while airtable is unreachable.
+    With several worker processes on one file it is also what they share:
+    a log of the records each one wrote, whole cached tables, and leases so only one does a job at a time.
+    """
+
+    def __init__(self, path: str = 'snapshot.db', busy_timeout: float = 30):
+        # one connection shared by the event loop and worker threads, the lock keeps them taking turns
+        # (other processes on the same file wait up to busy_timeout for a write to finish)
+        self.connection = sqlite3.connect(path, timeout=busy_timeout, check_same_thread=False)
+        self.lock = threading.Lock()
+        with self.lock, self.connection:
+            self.connection.execute('PRAGMA journal_mode=WAL')
+            self.connection.executescript(SCHEMA)
+
+    def replace(self, categories: list, products: list, orders: list, usages: list, synced_at: str = None, source: str = None):
+        """Swap the whole snapshot for full tables, in one transaction. Other workers see a "rebuild" change."""
+        with self.lock, self.connection:
+            for table in ('categories', 'product_categories', 'products', 'orders', 'order_lines', 'usages', 'usage_lines'):
+                self.connection.execute(f'DELETE FROM {table}')
+            for category in categories:
+                category_id = category['fields']['id']
+                # a repeated id keeps its first position but takes the later name, like the parsers' dicts
+                self.connection.execute(
+                    'INSERT INTO categories VALUES (?, ?) ON CONFLICT (category_id) DO UPDATE SET name = excluded.name',
+                    (category_id, category['fields']['name'])
+                )
+                self.connection.executemany(
+                    'INSERT INTO product_categories VALUES (?, ?) ON CONFLICT (product_id) DO UPDATE SET category_id = excluded.category_id',
+                    [(product_id, category_id) for product_id in category['fields'].get('products', [])]
+                )
+            self.connection.executemany(
+                'INSERT OR REPLACE INTO products VALUES (?, ?, ?)',
+                [
+                    (product['id'], product['fields'].get('name', 'Unknown Product'), product['fields'].get('unit-of-measurement', 'unit'))
+                    for product in products
+                ]
+            )
+            self.insert_orders(orders)
+            self.insert_usages(usages)
+            if synced_at:
+                self.set_meta('synced_at', synced_at)
+            # anyone further behind than this rebuilds anyway, so the log can start over here
+            seq = self.log('rebuild', [None], source)
+            self.connection.execute('DELETE FROM changes WHERE seq < ?', (seq,))
+
+    def upsert_orders(self, records: list, source: str = None):
+        """Add new orders or update existing ones in place."""
+        with self.lock, self.connection:
+            self.insert_orders(records)
+            self.log('order', records, source)
+
+    def upsert_usages(self, records: list, source: str = None):
+        """Add new usages or update existing ones in place."""
+        with self.lock, self.connection:
+            self.insert_usages(records)
+            self.log('usage', records, source)
+
+    def insert_orders(self, records: list):
+        rows, links = [], []
+        for record in records:
+            fields = record['fields']
+            rows.append((
+                record['id'], fields['order-date'], fields['order-date'][:7],
+                fields.get('amount', 0), fields.get('expiration-date') or None
+            ))
+            links.extend((record['id'], product_id) for product_id in fields.get('product', []))
+        # updating in place keeps an order's rowid, and so its position
+        self.connection.executemany(
+            '''INSERT INTO orders VALUES (?, ?, ?, ?, ?) ON CONFLICT (id) DO UPDATE SET
+               order_date = excluded.order_date, month = excluded.month,
+               amount = excluded.amount, expiration_date = excluded.expiration_date''',
+            rows
+        )
+        self.connection.executemany('DELETE FROM order_lines WHERE order_id = ?', [(row[0],) for row in rows])
+        self.connection.executemany(
+            '''INSERT INTO order_lines SELECT id, rowid, ?, order_date, month, amount, expiration_date
+               FROM orders WHERE id = ?''',
+            [(product_id, order_id) for order_id, product_id in links]
+        )
+
+    def insert_usages(self, records: list):
+        rows, links = [], []
+        for record in records:
+            fields = record['fields']
+            rows.append((record['id'], fields['usage-date'], fields['usage-date'][:7], fields.get('amount', 0)))
+            links.extend((record['id'], product_id) for product_id in fields.get('product', []))
+        self.connection.executemany(
+            '''INSERT INTO usages VALUES (?, ?, ?, ?) ON CONFLICT (id) DO UPDATE SET
+               usage_date = excluded.usage_date, month = excluded.month, amount = excluded.amount''',
+            rows
+        )
+        self.connection.executemany('DELETE FROM usage_lines WHERE usage_id = ?', [(row[0],) for row in rows])
+        self.connection.executemany(
+            'INSERT INTO usage_lines SELECT id, ?, usage_date, month, amount FROM usages WHERE id = ?',
+            [(product_id, usage_id) for usage_id, product_id in links]
+        )
+
+    def log(self, kind: str, records: list, source: str = None) -> int:
+        self.connection.executemany(
+            'INSERT INTO changes (kind, source, record) VALUES (?, ?, ?)',
+            [(kind, source, json.dumps(record)) for record in records]
+        )
+        return self.connection.execute('SELECT COALESCE(MAX(seq), 0) FROM changes').fetchone()[0]
+
+    def last_change(self) -> int:
+        return self.query('SELECT COALESCE(MAX(seq), 0) FROM changes')[0][0]
+
+    def changes_since(self, seq: int, limit: int = 1000) -> list:
+        """(seq, kind, source, record) for changes after seq, oldest first."""
+        return [
+            (seq, kind, source, json.loads(record))
+            for seq, kind, source, record in self.query(
+                'SELECT seq, kind, source, record FROM changes WHERE seq > ? ORDER BY seq LIMIT ?', (seq, limit)
+            )
+        ]
+
+    def table_state(self, name: str):
+        """(fetched_at, version) of a shared table, fetched_at is 0 while it has no records."""
+        rows = self.query('SELECT fetched_at, version FROM cached_tables WHERE name = ?', (name,))
+        return rows[0] if rows else (0.0, 0)
+
+    def cached_table(self, name: str):
+        """A shared table's records, None if it has none."""
+        rows = self.query('SELECT records FROM cached_tables WHERE name = ? AND records IS NOT NULL', (name,))
+        return json.loads(rows[0][0]) if rows else None
+
+    def cache_table(self, name: str, records: list, fetched_at: float, version: int) -> bool:
+        """Store a fetched table, unless it was invalidated (its version moved) while the fetch ran."""
+        with self.lock, self.connection:
+            cursor = self.connection.execute(
+                '''INSERT INTO cached_tables VALUES (?, ?, ?, ?) ON CONFLICT (name) DO UPDATE SET
+                   records = excluded.records, fetched_at = excluded.fetched_at WHERE cached_tables.version = excluded.version''',
+                (name, json.dumps(records), fetched_at, version)
+            )
+            return cursor.rowcount == 1
+
+    def expire_table(self, name: str):
+        with self.lock, self.connection:
+            self.connection.execute(
+                '''INSERT INTO cached_tables VALUES (?, NULL, 0, 1) ON CONFLICT (name) DO UPDATE SET
+                   records = NULL, fetched_at = 0, version = cached_tables.version + 1''',
+                (name,)
+            )
+
+    def claim(self, name: str, holder: str, seconds: float, now: float) -> bool:
+        """Take or renew a lease, True if holder has it until now + seconds."""
+        with self.lock, self.connection:
+            cursor = self.connection.execute(
+                '''INSERT INTO leases VALUES (?, ?, ?) ON CONFLICT (name) DO UPDATE SET
+                   holder = excluded.holder, expires = excluded.expires
+                   WHERE leases.holder = excluded.holder OR leases.expires < ?''',
+                (name, holder, now + seconds, now)
+            )
+            return cursor.rowcount == 1
+
+    def release(self, name: str, holder: str):
+        with self.lock, self.connection:
+            self.connection.execute('DELETE FROM leases WHERE name = ? AND holder = ?', (name, holder))
+
+    def set_meta(self, key: str, value: str):
+        self.connection.execute('INSERT OR REPLACE INTO meta VALUES (?, ?)', (key, value))
+
+    def synced_at(self):
+        """When the snapshot was last brought up to date, None if it never has been."""
+        with self.lock:
+            row = self.connection.execute("SELECT value FROM meta WHERE key = 'synced_at'").fetchone()
+        return row[0] if row else None
+
+    def mark_synced(self, synced_at: str):
+        with self.lock, self.connection:
+            self.set_meta('synced_at', synced_at)
+
+    def query(self, sql: str, params: tuple = ()) -> list:
+        with self.lock:
+            return self.connection.execute(sql, params).fetchall()
+
+    def chart_json(self, start_month: str = None, end_month: str = None) -> dict:
+        """Orders and usages per category per month, optionally limited to months from start_month to end_month (YYYY-MM)."""
+        category_map = dict(self.query('SELECT product_id, category_id FROM product_categories'))
+        if start_month or end_month:
+            # a date range rather than a month one, so the date index can serve it
+            where, params = 'WHERE {0}_date >= ? AND {0}_date < ?', ((start_month or '0000-00') + '-00', (end_month or '9999-99') + '-99')
+        else:
+            where, params = '', ()
+
+        counts = {}
+        for kind, kind_date in (('orders', 'order'), ('usages', 'usage')):
+            rows = self.query(
+                f'SELECT product_id, month, COUNT(*) FROM {kind_date}_lines {where.format(kind_date)} GROUP BY product_id, month',
+                params
+            )
+            for product_id, month, count in rows:
+                category_id = category_map.get(product_id)
+                if category_id:
+                    months = counts.setdefault(category_id, {})
+                    months.setdefault(month, {"orders": 0, "usages": 0})[kind] += count
+
+        charts = []
+        for category_id, category_name in self.query('SELECT category_id, name FROM categories ORDER BY rowid'):
+            months = counts.get(category_id, {})
+            data = [{"month": month, **months[month]} for month in sorted(months)]
+            if data:
+                charts.append({"category": category_name, "data": data})
+        return {"charts": charts}
+
+    def table_json(self, critical_days: int, warning_days: int, usage_period_days: int,
+                   current_date: datetime = None, half_life_days: float = HALF_LIFE_DAYS) -> dict:
+        product_to_category = dict(self.query('''
+            SELECT pc.product_id, c.name FROM product_categories pc
+            JOIN categories c ON c.category_id = pc.category_id
+            ORDER BY pc.rowid
+        '''))
+        product_info = {
+            product_id: {"name": name, "unit": unit}
+            for product_id, name, unit in self.query('SELECT id, name, unit FROM products')
+        }
+        purchases = dict(self.query('SELECT product_id, SUM(amount) FROM order_lines GROUP BY product_id'))
+        usages = dict(self.query('SELECT product_id, SUM(amount) FROM usage_lines GROUP BY product_id'))
+        # sqlite takes the bare expiration_date from the row holding MIN(seq), the first listed order with one
+        expirations = {
+            product_id: expiration_date
+            for product_id, expiration_date, _ in self.query('''
+                SELECT product_id, expiration_date, MIN(seq) FROM order_lines
+                WHERE expiration_date IS NOT NULL GROUP BY product_id
+            ''')
+        }
+        # daily usage within the forecast window, older days don't count toward the rates
+        current_date = current_date or datetime.now()
+        forecast = UsageForecast(usage_period_days, half_life_days)
+        window_start = (current_date - timedelta(days=usage_period_days)).strftime("%Y-%m-%d")
+        for product_id, usage_date, amount in self.query('''
+            SELECT product_id, usage_date, SUM(amount) FROM usage_lines
+            WHERE usage_date > ? GROUP BY product_id, usage_date
+        ''', (window_start,)):
+            forecast.add(product_id, usage_date, amount)
+        return build_alerts(
+            product_to_category, product_info, purchases, usages, expirations.get, forecast,
+            critical_days, warning_days, current_date
+        )
+
+    def close(self):
+        with self.lock:
+            self.connection.close()
@@ -0,0 +1,177 @@
+import asyncio
+import json
+import threading
+import time
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs
+
+import pytest
+
+from airtable import AirtableClient, background_requests
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    """Airtable stand-in: 250 records per table served 100 at a time, a little slowly, turning some requests away."""
+    protocol_version = 'HTTP/1.1'  # keep-alive, so pooled connections get reused
+    gets = []
+    posts = []
+    offsets = []    # of every page read, in the order they came in
+    in_flight = 0
+    peak = 0        # most requests being answered at once
+    counter = threading.Lock()
+
+    def reply(self, status, body):
+        payload = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def answer_slowly(self):
+        with StubHandler.counter:
+            StubHandler.in_flight += 1
+            StubHandler.peak = max(StubHandler.peak, StubHandler.in_flight)
+        time.sleep(0.2)
+        with StubHandler.counter:
+            StubHandler.in_flight -= 1
+
+    def do_GET(self):
+        table = self.path.split('?')[0].rsplit('/', 1)[-1]
+        StubHandler.gets.append(table)
+        # turn away the first read of this one
+        if table == 'Flaky' and StubHandler.gets.count('Flaky') == 1:
+            self.send_response(429)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+        offset = int(parse_qs(urlparse(self.path).query).get('offset', ['0'])[0])
+        StubHandler.offsets.append(offset)
+        self.answer_slowly()
+        page = {"records": [{"id": f"{table}-{i}", "fields": {}} for i in range(offset, min(offset + 100, 250))]}
+        if offset + 100 < 250:
+            page["offset"] = str(offset + 100)
+        self.reply(200, page)
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+        StubHandler.gets.append('POST')
+        if 'records' not in body:
+            self.reply(200, {"id": "rec1", "fields": body['fields']})
+            return
+        self.answer_slowly()
+        StubHandler.posts.append(len(body['records']))
+        # turn away the first batch once, like airtable does past 5 requests a second
+        if len(StubHandler.posts) == 1:
+            self.send_response(429)
+            self.send_header('Retry-After', '0.1')
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+        self.reply(200, {"records": [{"id": f"rec{record['fields']['n']}", "fields": record['fields']} for record in body['records']]})
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture(scope='module')
+def server():
+    server = ThreadingHTTPServer(('127.0.0.1', 0), StubHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f'http://127.0.0.1:{server.server_port}/v0'
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def base_url(server):
+    StubHandler.gets.clear()
+    StubHandler.posts.clear()
+    StubHandler.offsets.clear()
+    StubHandler.peak = 0
+    return server
+
+
+async def until(condition, timeout: float = 5):
+    # generous, a loaded machine is slow but never this slow
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            return False
+        await asyncio.sleep(0.01)
+    return True
+
+
+def test_reads_run_concurrently(base_url):
+    async def check():
+        # paced well above airtable's rate, this is about requests overlapping rather than the limit
+        airtable = AirtableClient('key', 'base', base_url=base_url, rate_limit=50)
+        results = await asyncio.gather(*(airtable.read(table) for table in ('Categories', 'Products', 'Orders', 'Usages')))
+        status, written = await airtable.write('Orders', {"fields": {"amount": 1}})
+        await airtable.close()
+        assert [result['records'][0]['id'] for result in results] == ['Categories-0', 'Products-0', 'Orders-0', 'Usages-0']
+        assert status == 200 and written['fields'] == {"amount": 1}
+        assert StubHandler.peak > 1, "reads ran one after another"
+
+    asyncio.run(check())
+
+
+def test_stream_prefetches_pages(base_url):
+    async def check():
+        airtable = AirtableClient('key', 'base', base_url=base_url, rate_limit=50)
+        ids = []
+        prefetched = []
+        async for record in airtable.stream('Orders'):
+            ids.append(record['id'])
+            # holding on to the first record of a page, the next page has still been asked for
+            position = len(ids) - 1
+            if position % 100 == 0 and position + 100 < 250:
+                prefetched.append(await until(lambda: position + 100 in StubHandler.offsets))
+        await airtable.close()
+        assert ids == [f'Orders-{i}' for i in range(250)]
+        assert prefetched == [True, True], "pages weren't prefetched"
+
+    asyncio.run(check())
+
+
+def test_write_many_sends_concurrent_batches(base_url):
+    async def check():
+        airtable = AirtableClient('key', 'base', base_url=base_url, rate_limit=50)
+        results = await airtable.write_many('Orders', [{"fields": {"n": n}} for n in range(25)])
+        await airtable.close()
+        assert [result['record']['id'] for result in results] == [f'rec{n}' for n in range(25)]
+        # 3 batches, the rate limited one sent again
+        assert sorted(StubHandler.posts) == [5, 10, 10, 10], StubHandler.posts
+        assert StubHandler.peak > 1, "batches ran one after another"
+
+    asyncio.run(check())
+
+
+def test_write_goes_ahead_of_background_reads(base_url):
+    async def check():
+        # one request at a time: identical reads share one, a write goes ahead of queued background reads
+        airtable = AirtableClient('key', 'base', base_url=base_url, max_concurrency=1, backoff=0.05)
+        with background_requests():
+            reads = [asyncio.ensure_future(airtable.read(table)) for table in ('First', 'Second', 'Third', 'Second')]
+        await asyncio.sleep(0.05)
+        status, _ = await airtable.write('Orders', {"fields": {"amount": 1}})
+        results = await asyncio.gather(*reads)
+        await airtable.close()
+        assert status == 200 and results[1] == results[3]
+        assert StubHandler.gets == ['First', 'POST', 'Second', 'Third'], StubHandler.gets
+        metrics = airtable.metrics()
+        assert metrics['deduplicated'] == 1
+        assert metrics['sent'] == {"write": 1, "read": 0, "background": 3}, metrics
+
+    asyncio.run(check())
+
+
+def test_rate_limited_read_is_retried(base_url):
+    async def check():
+        airtable = AirtableClient('key', 'base', base_url=base_url, max_concurrency=1, backoff=0.05)
+        result = await airtable.read('Flaky')
+        await airtable.close()
+        assert result['records'][0]['id'] == 'Flaky-0'
+        assert airtable.metrics()['retries'] == 1 and airtable.metrics()['throttled'] == 1
+
+    asyncio.run(check())
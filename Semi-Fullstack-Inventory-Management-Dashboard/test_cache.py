@@ -0,0 +1,115 @@
+import asyncio
+
+import pytest
+
+from cache import TableCache
+
+
+class FakeFetch:
+    """Stands in for airtable: each fetch returns records tagged with its call number, held until the gate opens."""
+
+    def __init__(self):
+        self.calls = []
+        self.gate = asyncio.Event()
+
+    async def __call__(self, table):
+        self.calls.append(table)
+        call = len(self.calls)
+        await self.gate.wait()
+        if table == 'Broken':
+            raise RuntimeError("airtable is down")
+        return [{"id": f"{table}-{call}"}]
+
+
+def test_concurrent_misses_share_one_fetch():
+    async def check():
+        fetch = FakeFetch()
+        cache = TableCache(fetch)
+        readers = [asyncio.ensure_future(cache.get('Orders')) for _ in range(5)]
+        await asyncio.sleep(0)
+        fetch.gate.set()
+        results = await asyncio.gather(*readers)
+        assert fetch.calls == ['Orders']
+        assert all(result == [{"id": "Orders-1"}] for result in results)
+        # and the next read is served from memory
+        assert await cache.get('Orders') == [{"id": "Orders-1"}]
+        assert fetch.calls == ['Orders']
+
+    asyncio.run(check())
+
+
+def test_stale_hit_returns_at_once_and_refreshes_once():
+    async def check():
+        fetch = FakeFetch()
+        fetch.gate.set()
+        # a ttl of 0 makes every cached read stale
+        cache = TableCache(fetch, ttls={'Orders': 0}, stale_seconds=60)
+        assert await cache.get('Orders') == [{"id": "Orders-1"}]
+
+        fetch.gate.clear()
+        # served the old records without waiting on the refresh, however many readers arrive meanwhile
+        for _ in range(3):
+            assert await asyncio.wait_for(cache.get('Orders'), 1) == [{"id": "Orders-1"}]
+        await asyncio.sleep(0)
+        assert fetch.calls == ['Orders', 'Orders']
+
+        fetch.gate.set()
+        await asyncio.gather(*cache.tasks)
+        assert cache.entries['Orders'][0] == [{"id": "Orders-2"}]
+        await cache.close()
+
+    asyncio.run(check())
+
+
+def test_invalidate_drops_a_fetch_already_in_flight():
+    async def check():
+        fetch = FakeFetch()
+        cache = TableCache(fetch)
+        reader = asyncio.ensure_future(cache.get('Orders'))
+        await asyncio.sleep(0)
+        # a write lands while the read is still out
+        cache.invalidate('Orders')
+        fetch.gate.set()
+        # the reader still gets its records, they just aren't kept
+        assert await reader == [{"id": "Orders-1"}]
+        assert 'Orders' not in cache.entries
+
+        # so the next read fetches again
+        assert await cache.get('Orders') == [{"id": "Orders-2"}]
+        assert cache.entries['Orders'][0] == [{"id": "Orders-2"}]
+
+    asyncio.run(check())
+
+
+def test_metrics_counts():
+    async def check():
+        fetch = FakeFetch()
+        cache = TableCache(fetch, ttls={'Categories': 0}, stale_seconds=60)
+        readers = [asyncio.ensure_future(cache.get('Orders')) for _ in range(3)]
+        await asyncio.sleep(0)
+        fetch.gate.set()
+        await asyncio.gather(*readers)
+        await cache.get('Orders')
+        await cache.get('Categories')
+        await cache.get('Categories')
+        await asyncio.gather(*cache.tasks)
+        with pytest.raises(RuntimeError):
+            await cache.get('Broken')
+        cache.invalidate('Orders')
+
+        tables = cache.metrics()['tables']
+        orders = tables['Orders']
+        assert {key: orders[key] for key in ('hits', 'stale_hits', 'misses', 'coalesced', 'fetches', 'errors', 'invalidations')} == {
+            "hits": 1, "stale_hits": 0, "misses": 1, "coalesced": 2, "fetches": 1, "errors": 0, "invalidations": 1
+        }
+        assert orders['hit_ratio'] == 0.25
+        assert orders['records'] == 0 and orders['age_seconds'] is None
+
+        categories = tables['Categories']
+        assert (categories['misses'], categories['stale_hits'], categories['fetches']) == (1, 1, 2)
+        assert categories['hit_ratio'] == 0.5 and categories['ttl_seconds'] == 0
+        assert categories['records'] == 1
+
+        assert (tables['Broken']['misses'], tables['Broken']['fetches'], tables['Broken']['errors']) == (1, 1, 1)
+
+    asyncio.run(check())
@@ -0,0 +1,173 @@
+import asyncio
+import json
+
+from events import DashboardEvents
+
+
+def alert(product, date="2024-06-01"):
+    return {"urgency": "Warning", "type": "Expiration", "category": "Food", "product": product, "effective-date": date}
+
+
+def chart(category, *points):
+    return {"category": category, "data": [{"month": month, "orders": orders, "usages": 0} for month, orders in points]}
+
+
+class FakeDashboard:
+    """What current() returns, changed by the tests between publishes."""
+
+    def __init__(self, charts=(), alerts=()):
+        self.charts = list(charts)
+        self.alerts = list(alerts)
+
+    async def __call__(self):
+        return {"charts": self.charts}, {"alerts": self.alerts}
+
+
+def decode(message: str) -> list:
+    events = []
+    for block in message.strip().split("\n\n"):
+        fields = dict(line.split(": ", 1) for line in block.split("\n"))
+        events.append((fields["event"], json.loads(fields["data"])))
+    return events
+
+
+def apply_alerts(alerts: list, data: dict) -> list:
+    # what live.js does with an "alerts" event
+    alerts = list(alerts)
+    for removed in data["removed"]:
+        alerts.remove(removed)
+    for position, added in zip(data["positions"], data["added"]):
+        alerts.insert(position, added)
+    return alerts
+
+
+async def subscribe(events: DashboardEvents):
+    # connect a page, returning its stream and the queue publishes go into
+    stream = events.stream()
+    reset = decode(await stream.__anext__())
+    assert reset[0][0] == "reset"
+    return stream, next(iter(events.subscribers))
+
+
+def test_alert_duplicates_are_added_and_removed_one_at_a_time():
+    async def check():
+        old_alerts = [alert("A"), alert("B"), alert("B"), alert("C")]
+        dashboard = FakeDashboard(alerts=old_alerts)
+        events = DashboardEvents(dashboard)
+        stream, queue = await subscribe(events)
+
+        # one of the two B alerts clears, a second C appears, D goes at the front
+        dashboard.alerts = [alert("D"), alert("A"), alert("B"), alert("C"), alert("C")]
+        await events.publish()
+        [(event, data)] = decode(queue.get_nowait())
+        assert event == "alerts"
+        assert data["removed"] == [alert("B")]
+        # the first of the two C alerts counts as the new one, the page's C ends up after it
+        assert data["added"] == [alert("D"), alert("C")]
+        assert data["positions"] == [0, 3]
+        assert apply_alerts(old_alerts, data) == dashboard.alerts
+
+        # nothing changed, nothing sent
+        await events.publish()
+        assert queue.empty()
+        await stream.aclose()
+
+    asyncio.run(check())
+
+
+def test_reordered_alerts_replace_the_whole_list():
+    async def check():
+        old_alerts = [alert("A"), alert("B"), alert("C")]
+        dashboard = FakeDashboard(alerts=old_alerts)
+        events = DashboardEvents(dashboard)
+        stream, queue = await subscribe(events)
+
+        # splicing C in front of the page's A and B can't move them, so everything is replaced
+        dashboard.alerts = [alert("C"), alert("A"), alert("B")]
+        await events.publish()
+        [(event, data)] = decode(queue.get_nowait())
+        assert event == "alerts"
+        assert sorted(item["product"] for item in data["removed"]) == ["A", "B", "C"]
+        assert data["added"] == dashboard.alerts
+        assert data["positions"] == [0, 1, 2]
+        assert apply_alerts(old_alerts, data) == dashboard.alerts
+        await stream.aclose()
+
+    asyncio.run(check())
+
+
+def test_chart_changes_place_new_and_moved_categories():
+    async def check():
+        dashboard = FakeDashboard(charts=[chart("Food", ("2024-01", 1)), chart("Tools", ("2024-01", 2))])
+        events = DashboardEvents(dashboard)
+        stream, queue = await subscribe(events)
+
+        # a category in between the two, and a point gone from the last
+        dashboard.charts = [chart("Food", ("2024-01", 1)), chart("Paper", ("2024-02", 3)), chart("Tools", ("2024-02", 2))]
+        await events.publish()
+        [(event, data)] = decode(queue.get_nowait())
+        assert event == "chart"
+        assert sorted((point["category"], point["month"]) for point in data["points"]) == [("Paper", "2024-02"), ("Tools", "2024-02")]
+        assert data["removed"] == [{"category": "Tools", "month": "2024-01"}]
+        assert data["categories"] == [{"category": "Paper", "position": 1}]
+
+        # the same charts in another order, every one is placed
+        dashboard.charts = [dashboard.charts[2], dashboard.charts[0], dashboard.charts[1]]
+        await events.publish()
+        [(event, data)] = decode(queue.get_nowait())
+        assert data["points"] == [] and data["removed"] == []
+        assert data["categories"] == [
+            {"category": "Tools", "position": 0}, {"category": "Food", "position": 1}, {"category": "Paper", "position": 2}
+        ]
+        await stream.aclose()
+
+    asyncio.run(check())
+
+
+def test_a_page_that_falls_behind_gets_a_reset():
+    async def check():
+        dashboard = FakeDashboard(alerts=[alert("A")])
+        events = DashboardEvents(dashboard, queue_size=2)
+        stream, queue = await subscribe(events)
+
+        for n in range(3):
+            dashboard.alerts = dashboard.alerts + [alert(f"New {n}")]
+            await events.publish()
+        # the backlog was dropped for a marker, which the stream turns into a reset of the latest state
+        assert queue.qsize() == 1
+        [(event, data)] = decode(await stream.__anext__())
+        assert event == "reset"
+        assert data["alerts"] == dashboard.alerts
+        assert events.version == 3
+        await stream.aclose()
+
+    asyncio.run(check())
+
+
+def test_a_page_reconnecting_to_another_worker_gets_a_reset():
+    async def check():
+        dashboard = FakeDashboard(alerts=[alert("A")])
+        first = DashboardEvents(dashboard, source="host:1")
+        second = DashboardEvents(dashboard, source="host:2")
+        # both workers are at the same version, only the ids tell them apart
+        assert first.version == second.version and first.event_id() != second.event_id()
+
+        # back to the worker the page saw last: no reset, the next thing it gets is the next change
+        stream = first.stream(first.event_id())
+        receiving = asyncio.ensure_future(stream.__anext__())
+        await asyncio.sleep(0)
+        dashboard.alerts = [alert("A"), alert("B")]
+        await first.publish()
+        [(event, _)] = decode(await receiving)
+        assert event == "alerts"
+        await stream.aclose()
+
+        # the other worker's counter happens to match, but its state isn't the one the page has
+        await second.publish()
+        assert second.version == first.version
+        stream = second.stream(first.event_id())
+        [(event, _)] = decode(await asyncio.wait_for(stream.__anext__(), 5))
+        assert event == "reset"
+        await stream.aclose()
+
+    asyncio.run(check())
@@ -0,0 +1,42 @@
+import random
+from datetime import datetime, timedelta
+
+from forecast import UsageForecast, parse_date
+
+
+def test_rates_match_recomputation():
+    # incremental windows agree with sums recomputed from scratch as days pass and usages come and go
+    rng = random.Random(1)
+    window, start = 30, datetime(2024, 1, 1)
+    forecast = UsageForecast(window, half_life_days=7)
+    usages = []
+    for step in range(120):
+        today = start + timedelta(days=step)
+        forecast.advance(today)
+        for _ in range(rng.randrange(4)):
+            usage = ("p", (today - timedelta(days=rng.randrange(-3, 40))).strftime("%Y-%m-%d"), rng.randrange(1, 20))
+            usages.append(usage)
+            forecast.add(*usage)
+        if usages and rng.random() < 0.3:
+            product_id, usage_date, amount = usages.pop(rng.randrange(len(usages)))
+            forecast.add(product_id, usage_date, -amount)
+
+        ages = [(today - parse_date(usage_date)).days for _, usage_date, _ in usages]
+        in_window = [(age, amount) for age, (_, _, amount) in zip(ages, usages) if 0 <= age < window]
+        mean = sum(amount for _, amount in in_window) / window
+        weighted = sum(forecast.weights[age] * amount for age, amount in in_window) / forecast.normalizer
+        assert abs(forecast.rate("p") - max(mean, weighted)) < 1e-9, step
+
+
+def test_unknown_product_has_no_rate():
+    assert UsageForecast(30).rate("missing") == 0.0
+
+
+def test_steady_rate():
+    # a steady rate comes out as itself either way
+    start = datetime(2024, 1, 1)
+    steady = UsageForecast(90)
+    for age in range(90):
+        steady.add("p", (start - timedelta(days=age)).strftime("%Y-%m-%d"), 3)
+    steady.advance(start)
+    assert abs(steady.rate("p") - 3) < 1e-9
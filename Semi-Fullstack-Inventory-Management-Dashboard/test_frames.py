@@ -0,0 +1,19 @@
+import pytest
+
+pytest.importorskip('pandas')  # only the frames engine needs it
+
+from aggregates import InventoryAggregates
+from benchmark_alerts import make_tables
+from frames import FrameEngine
+
+
+def test_frames_match_aggregates():
+    # same output as the aggregates on the benchmark tables
+    categories, products, orders, usages, today = make_tables(100_000, 1_000)
+    aggregates = InventoryAggregates(7, 30, 90)
+    aggregates.build(categories, products, orders, usages)
+
+    engine = FrameEngine(7, 30, 90)
+    engine.load(categories, products, orders, usages)
+    assert engine.chart_json(categories, orders, usages) == aggregates.chart_json(), "frame charts differ"
+    assert engine.table_json(categories, products, orders, usages, today) == aggregates.table_json(today), "frame alerts differ"
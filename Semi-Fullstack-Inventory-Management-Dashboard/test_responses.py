@@ -0,0 +1,40 @@
+from fastapi import FastAPI, Request
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.testclient import TestClient
+
+from responses import Fingerprints, CachedStaticFiles, IMMUTABLE, REVALIDATE, json_response
+
+
+def make_client(tmp_path):
+    (tmp_path / 'scripts').mkdir()
+    (tmp_path / 'scripts' / 'app.js').write_text('console.log("hi");\n' * 100)
+    fingerprints = Fingerprints(str(tmp_path))
+    app = FastAPI()
+    app.add_middleware(GZipMiddleware, minimum_size=500)
+
+    @app.get("/api/data")
+    async def data(request: Request):
+        return json_response(request, {"values": list(range(500))})
+
+    app.mount("/scripts", CachedStaticFiles(directory=str(tmp_path / 'scripts'), fingerprints=fingerprints), name="scripts")
+    return TestClient(app), fingerprints
+
+
+def test_only_the_current_fingerprint_is_immutable(tmp_path):
+    client, fingerprints = make_client(tmp_path)
+    version = fingerprints.version('scripts/app.js')
+    assert client.get(f'/scripts/app.js?v={version}').headers['cache-control'] == IMMUTABLE
+    assert client.get('/scripts/app.js?v=0123456789ab').headers['cache-control'] == REVALIDATE
+    assert client.get('/scripts/app.js').headers['cache-control'] == REVALIDATE
+
+
+def test_etags_are_weak_and_still_match(tmp_path):
+    client, _ = make_client(tmp_path)
+    for url in ('/api/data', '/scripts/app.js'):
+        # gzipped and plain bodies go out under one tag, so it can't be a strong one
+        gzipped = client.get(url, headers={'accept-encoding': 'gzip'})
+        plain = client.get(url, headers={'accept-encoding': 'identity'})
+        assert gzipped.headers.get('content-encoding') == 'gzip' and 'content-encoding' not in plain.headers
+        assert gzipped.headers['etag'] == plain.headers['etag']
+        assert gzipped.headers['etag'].startswith('W/"')
+        assert client.get(url, headers={'if-none-match': gzipped.headers['etag']}).status_code == 304
@@ -0,0 +1,49 @@
+import asyncio
+import time
+
+import pytest
+
+from shared import SharedRateLimiter
+
+
+def test_limiters_share_one_rate(tmp_path):
+    # two limiters on one file, as two workers would have, share a single rate
+    async def check():
+        path = str(tmp_path / 'limits.db')
+        limiters = [SharedRateLimiter(path, 'airtable', 20), SharedRateLimiter(path, 'airtable', 20)]
+        taken = []
+
+        async def take(limiter, count):
+            for _ in range(count):
+                await limiter.acquire()
+                taken.append(time.monotonic())
+
+        start = time.monotonic()
+        await asyncio.gather(take(limiters[0], 10), take(limiters[1], 10))
+        elapsed = time.monotonic() - start
+        for limiter in limiters:
+            limiter.close()
+        # 20 tokens at 20 a second, the first one straight away (a slow machine only takes longer)
+        assert elapsed >= 0.9, f"the limiters didn't share a bucket ({elapsed:.2f}s)"
+        assert len(taken) == 20
+
+    asyncio.run(check())
+
+
+def test_limiters_take_from_one_bucket(tmp_path):
+    # the same on a clock the test moves, so how busy the machine is doesn't matter
+    # (timestamps this size round in the last few digits, hence the tolerance)
+    path = str(tmp_path / 'limits.db')
+    first, second = SharedRateLimiter(path, 'airtable', 20), SharedRateLimiter(path, 'airtable', 20)
+    now = time.time() + 1000
+    assert first.take(now) == 0.0
+    # the other worker finds the token gone, and waits as long as the first would
+    assert second.take(now) == pytest.approx(0.05, abs=1e-4)
+    assert first.take(now) == pytest.approx(0.05, abs=1e-4)
+    assert second.take(now + 0.1) == 0.0
+    assert first.take(now + 0.125) == pytest.approx(0.025, abs=1e-4)
+    # an idle bucket refills to its burst and no further
+    assert first.take(now + 10) == 0.0
+    assert second.take(now + 10) == pytest.approx(0.05, abs=1e-4)
+    first.close()
+    second.close()
@@ -0,0 +1,48 @@
+import pytest
+
+from aggregates import InventoryAggregates
+from benchmark_alerts import make_tables
+from snapshot import SnapshotStore
+
+
+@pytest.fixture(scope='module')
+def tables():
+    return make_tables(100_000, 1_000)
+
+
+@pytest.fixture
+def mirrored(tables):
+    categories, products, orders, usages, today = tables
+    snapshot = SnapshotStore(':memory:')
+    snapshot.replace(categories, products, orders, usages, synced_at='2024-06-01T00:00:00.000Z')
+    aggregates = InventoryAggregates(7, 30, 90)
+    aggregates.build(categories, products, orders, usages)
+    yield snapshot, aggregates
+    snapshot.close()
+
+
+def test_snapshot_matches_aggregates(tables, mirrored):
+    # the snapshot answers exactly what the in-memory aggregates do on the benchmark tables
+    today = tables[4]
+    snapshot, aggregates = mirrored
+    assert snapshot.synced_at() == '2024-06-01T00:00:00.000Z'
+    assert snapshot.chart_json() == aggregates.chart_json(), "snapshot charts differ"
+    assert snapshot.table_json(7, 30, 90, today) == aggregates.table_json(today), "snapshot alerts differ"
+
+
+def test_upserted_order_keeps_its_position(tables, mirrored):
+    # editing an order moves its contribution without changing its position
+    orders, today = tables[2], tables[4]
+    snapshot, aggregates = mirrored
+    edited = dict(orders[0], fields=dict(orders[0]['fields'], amount=500, **{'order-date': '2023-01-15'}))
+    snapshot.upsert_orders([edited])
+    aggregates.apply_orders([edited])
+    assert snapshot.chart_json() == aggregates.chart_json()
+    assert snapshot.table_json(7, 30, 90, today) == aggregates.table_json(today)
+
+
+def test_chart_month_range(mirrored):
+    snapshot, _ = mirrored
+    ranged = snapshot.chart_json('2024-01', '2024-03')
+    assert ranged['charts']
+    assert all('2024-01' <= point['month'] <= '2024-03' for chart in ranged['charts'] for point in chart['data'])
@@ -0,0 +1,190 @@
+import asyncio
+import time
+
+import pytest
+
+from snapshot import SnapshotStore
+from workers import SyncLease, ChangeFollower
+
+TABLES = ('Categories', 'Products', 'Orders', 'Usages')
+
+
+def order(n, product='prod1'):
+    return {"id": f"ord{n}", "fields": {"product": [product], "order-date": "2024-05-01", "amount": n}}
+
+
+def usage(n, product='prod1'):
+    return {"id": f"use{n}", "fields": {"product": [product], "usage-date": "2024-05-02", "amount": n}}
+
+
+def category():
+    return {"id": "cat1", "fields": {"id": 1, "name": "Food", "products": ["prod1"]}}
+
+
+class FakeAggregates:
+    def __init__(self, built=True):
+        self.built = built
+        self.orders = []
+        self.usages = []
+
+    def apply_orders(self, records):
+        self.orders.extend(record['id'] for record in records)
+
+    def apply_usages(self, records):
+        self.usages.extend(record['id'] for record in records)
+
+
+class FakeCache:
+    def __init__(self):
+        self.invalidated = []
+
+    def invalidate(self, *tables):
+        self.invalidated.extend(tables)
+
+
+class Worker:
+    """One worker process's view of a shared snapshot file: its store, aggregates and follower."""
+
+    def __init__(self, path, holder, store_class=SnapshotStore):
+        self.holder = holder
+        self.store = store_class(path)
+        self.aggregates = FakeAggregates()
+        self.cache = FakeCache()
+        self.rebuilds = 0
+        self.publishes = 0
+        self.follower = ChangeFollower(
+            self.store, holder, self.aggregates, asyncio.Lock(), self.cache, TABLES,
+            self.read_tables, self.rebuild, self.publish
+        )
+
+    async def read_tables(self):
+        return None, await asyncio.to_thread(self.store.last_change), None
+
+    async def rebuild(self, read):
+        # like main.rebuild_aggregates, the tables read cover the log up to where it was then
+        _, last_change, _ = read or await self.read_tables()
+        self.rebuilds += 1
+        self.follower.applied = last_change
+
+    async def publish(self):
+        self.publishes += 1
+
+    def write_orders(self, records):
+        # a report written by this worker goes straight into its own aggregates and into the log
+        self.aggregates.apply_orders(records)
+        self.store.upsert_orders(records, self.holder)
+
+
+@pytest.fixture
+def path(tmp_path):
+    return str(tmp_path / 'snapshot.db')
+
+
+def test_one_leader_and_the_lease_passes_on_after_it_expires(path):
+    async def check():
+        first = SyncLease(SnapshotStore(path), 'first', seconds=30)
+        second = SyncLease(SnapshotStore(path), 'second', seconds=30)
+        now = time.time()
+        assert await first.renew(now)
+        assert not await second.renew(now)
+        # renewing keeps it
+        assert await first.renew(now + 20)
+        assert not await second.renew(now + 40)
+
+        # first stops renewing, second takes over once the lease runs out
+        assert await second.renew(now + 51)
+        assert not await first.renew(now + 51)
+
+        steps = []
+
+        async def sync():
+            steps.append('sync')
+
+        async def take_over():
+            steps.append('take over')
+
+        for _ in range(2):
+            await first.step(sync, take_over)
+            await second.step(sync, take_over)
+        assert steps == ['take over', 'sync']
+
+        # stepping down hands the lease straight on
+        second.release()
+        assert await first.renew(now + 52)
+
+    asyncio.run(check())
+
+
+def test_changes_from_other_workers_are_applied_once(path):
+    async def check():
+        first, second = Worker(path, 'first'), Worker(path, 'second')
+        await second.follower.start_from_end()
+
+        first.write_orders([order(1), order(2)])
+        second.write_orders([order(3)])
+        first.store.upsert_usages([usage(1)], 'first')
+
+        await second.follower.follow()
+        # its own order was already in, the other worker's records are added
+        assert second.aggregates.orders == ['ord3', 'ord1', 'ord2']
+        assert second.aggregates.usages == ['use1']
+        assert second.publishes == 1
+        assert second.cache.invalidated == ['Orders', 'Usages']
+
+        # nothing new, nothing applied again
+        await second.follower.follow()
+        assert second.aggregates.orders == ['ord3', 'ord1', 'ord2']
+        assert second.publishes == 1
+
+        # and the first worker picks up the second's order, skipping its own
+        await first.follower.follow()
+        assert first.aggregates.orders == ['ord1', 'ord2', 'ord3']
+        assert first.follower.applied == second.follower.applied == first.store.last_change()
+
+    asyncio.run(check())
+
+
+def test_another_workers_rebuild_replaces_what_was_logged_before_it(path):
+    async def check():
+        first, second = Worker(path, 'first'), Worker(path, 'second')
+        await second.follower.start_from_end()
+
+        first.write_orders([order(1)])
+        first.store.replace([category()], [], [order(1)], [], source='first')
+        first.write_orders([order(2)])
+
+        await second.follower.follow()
+        # the order before the rebuild is in the tables it rebuilt from, the one after is replayed
+        assert second.rebuilds == 1
+        assert second.aggregates.orders == ['ord2']
+        assert second.follower.applied == first.store.last_change()
+
+        # the first worker's own rebuild isn't repeated
+        await first.follower.follow()
+        assert first.rebuilds == 0
+
+    asyncio.run(check())
+
+
+def test_entries_a_rebuild_covered_while_a_pass_waited_are_skipped(path):
+    # the pass reads the log, then this worker's own rebuild finishes before the pass gets the lock
+    worker = None
+
+    class RebuildAfterRead(SnapshotStore):
+        def changes_since(self, seq, limit=1000):
+            changes = super().changes_since(seq, limit)
+            worker.follower.applied = self.last_change()
+            return changes
+
+    async def check():
+        nonlocal worker
+        first = Worker(path, 'first')
+        worker = Worker(path, 'second', store_class=RebuildAfterRead)
+        await worker.follower.start_from_end()
+
+        first.write_orders([order(1), order(2)])
+        await worker.follower.follow()
+        assert worker.aggregates.orders == []
+        assert worker.publishes == 0
+
+    asyncio.run(check())
@@ -0,0 +1,160 @@
+import asyncio
+import time
+
+from snapshot import SnapshotStore
+
+
+class SyncLease:
+    """
+    The lease saying which worker process keeps the snapshot in step with airtable.
+    - renew takes it while nobody else holds it, or the holder stopped renewing for longer than seconds
+    - step runs one sync while this worker holds it, or a take over the first time after another worker held it
+    Renewed on its own schedule, so a long build or sync doesn't let it lapse under the holder
+    (should it lapse anyway, two workers may sync at once until the next renewal, which is only wasted work).
+    """
+
+    def __init__(self, store: SnapshotStore, holder: str, seconds: float = 30, name: str = 'sync'):
+        self.store = store
+        self.holder = holder
+        self.seconds = seconds
+        self.name = name
+        self.leader = False     # whether this worker held the lease at the last renewal
+        self.leading = False    # whether the last step ran as the leader, so the next one doesn't take over again
+
+    async def renew(self, now: float = None) -> bool:
+        now = time.time() if now is None else now
+        self.leader = await asyncio.to_thread(self.store.claim, self.name, self.holder, self.seconds, now)
+        return self.leader
+
+    async def hold_forever(self):
+        while True:
+            try:
+                await self.renew()
+            except Exception as e:
+                self.leader = False
+                print(f"Error renewing the {self.name} lease: {e}")
+            await asyncio.sleep(self.seconds / 3)
+
+    async def step(self, sync, take_over):
+        """
+        Run sync while leading, or take_over on first becoming the leader, both coroutine functions.
+        A take over that fails is tried again at the next step.
+        """
+        if not self.leader:
+            self.leading = False
+            return
+        if self.leading:
+            await sync()
+        else:
+            await take_over()
+        self.leading = True
+
+    async def step_forever(self, interval: float, sync, take_over):
+        self.leading = self.leader
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await self.step(sync, take_over)
+            except Exception as e:
+                print(f"Error syncing: {e}")
+
+    def release(self):
+        # so another worker can take over without waiting out the lease
+        if self.leader:
+            self.store.release(self.name, self.holder)
+            self.leader = False
+
+
+class ChangeFollower:
+    """
+    Replays what the other worker processes wrote to the snapshot's log into this worker's aggregates.
+    - applied is the last entry of the log reflected in the aggregates, so each entry is applied once
+    - this worker's own entries are skipped, they went into the aggregates when it wrote them
+    - another worker's "rebuild" entry means rebuilding from the tables it just stored, which covers everything before it
+    - a rebuild that moves applied on while a pass waits for the aggregates' lock covers the entries it read
+    read_tables and rebuild are this worker's (rebuild takes what read_tables returned and sets applied),
+    publish pushes the result to open dashboards, and the table cache is invalidated for whatever changed.
+    """
+
+    def __init__(self, store: SnapshotStore, holder: str, aggregates, lock: asyncio.Lock, table_cache, tables: tuple,
+                 read_tables, rebuild, publish):
+        # tables is the (categories, products, orders, usages) table names
+        self.store = store
+        self.holder = holder
+        self.aggregates = aggregates
+        self.lock = lock
+        self.table_cache = table_cache
+        self.tables = tables
+        self.read_tables = read_tables
+        self.rebuild = rebuild
+        self.publish = publish
+        self.applied = 0
+        self.pending = None     # the pass in flight
+
+    async def start_from_end(self):
+        # a worker starting up builds from the tables, so only what's logged from here on is new to it
+        self.applied = await asyncio.to_thread(self.store.last_change)
+
+    async def follow(self):
+        """Apply what other workers wrote since this one last looked."""
+        # one pass at a time, with every request arriving meanwhile waiting on it rather than reading the tables again
+        if self.pending is None or self.pending.done():
+            self.pending = asyncio.ensure_future(self.replay())
+        await asyncio.shield(self.pending)
+
+    async def follow_forever(self, interval: float):
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await self.follow()
+            except Exception as e:
+                print(f"Error following changes: {e}")
+
+    async def replay(self):
+        _, _, orders_table, usages_table = self.tables
+        changes = await asyncio.to_thread(self.store.changes_since, self.applied)
+        if all(source == self.holder for _, _, source, _ in changes):
+            # nothing but this worker's own writes, already applied
+            self.applied = max([self.applied] + [seq for seq, _, _, _ in changes])
+            return
+        read = None
+        if self.aggregates.built and any(kind == 'rebuild' and source != self.holder for _, kind, source, _ in changes):
+            # the tables another worker just rebuilt from are in the shared cache, unless a write has expired them since,
+            # so they're read before taking the lock
+            self.table_cache.invalidate(*self.tables)
+            read = await self.read_tables()
+        async with self.lock:
+            orders, usages, rebuild = [], [], False
+            for seq, kind, source, record in changes:
+                if seq <= self.applied:
+                    continue  # a rebuild while this waited for the lock already covers it
+                self.applied = seq
+                if source == self.holder:
+                    continue
+                if kind == 'rebuild':
+                    orders, usages, rebuild = [], [], True
+                elif kind == 'order':
+                    orders.append(record)
+                else:
+                    usages.append(record)
+            # the frames engine only needs its tables refetched, the aggregates take the records themselves
+            if rebuild:
+                if read is None:
+                    self.table_cache.invalidate(*self.tables)
+                if self.aggregates.built:
+                    await self.rebuild(read)
+            if orders:
+                self.table_cache.invalidate(orders_table)
+                if self.aggregates.built:
+                    self.aggregates.apply_orders(orders)
+            if usages:
+                self.table_cache.invalidate(usages_table)
+                if self.aggregates.built:
+                    self.aggregates.apply_usages(usages)
+            if (orders or usages) and self.aggregates.built:
+                await self.publish()
+
+    async def close(self):
+        if self.pending is not None:
+            self.pending.cancel()
+            await asyncio.gather(self.pending, return_exceptions=True)